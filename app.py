@@ -15,9 +15,11 @@ from config import Config
 
 # Import database initialization
 from models.database import init_db
+from models.job import JobJSONProvider
 
 # Import utilities
 from utils.file_utils import truncate_filename
+from utils.upload_stream import UploadRequest
 
 # Import blueprints
 from routes.user_routes import user_bp
@@ -30,11 +32,19 @@ from websocket.events import register_socketio_events
 
 # Import CUPS monitor
 from services.cups_monitor import start_cups_monitor, stop_cups_monitor
+from services.print_dispatcher import start_print_dispatcher, stop_print_dispatcher
+from services.upload_analysis import start_upload_analysis, stop_upload_analysis
+
+# Import database pool shutdown
+from models.connection import close_all_pools
 
 
 def create_app():
     """Application factory"""
     app = Flask(__name__, static_folder='static', static_url_path='/static')
+    app.json = JobJSONProvider(app)
+    # Uploads are streamed straight into UPLOAD_FOLDER while being parsed
+    app.request_class = UploadRequest
     
     # Load configuration
     app.config['UPLOAD_FOLDER'] = str(Config.UPLOAD_FOLDER)
@@ -94,6 +104,9 @@ def setup_signal_handlers():
         print("⏳ Stopping CUPS monitor...")
         stop_cups_monitor()
         print("✅ CUPS monitor stopped")
+        stop_print_dispatcher()
+        stop_upload_analysis()
+        close_all_pools()
         print("⏳ Shutting down server...")
         print("="*60 + "\n")
         sys.exit(0)
@@ -119,12 +132,14 @@ if __name__ == '__main__':
     print(f"⚡ Async mode: {Config.SOCKETIO_ASYNC_MODE}")
     print("="*60 + "\n")
     
-    # Start CUPS monitoring background task ONLY in main process
+    # Start CUPS monitoring, print dispatch and upload analysis background tasks ONLY in main process
     # Flask debug mode spawns a reloader process - we only want monitor in the main worker
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         start_cups_monitor(socketio, app)
+        start_print_dispatcher(socketio, app)
+        start_upload_analysis(socketio)
     else:
-        print("ℹ️  Skipping CUPS monitor in reloader process")
+        print("ℹ️  Skipping CUPS monitor, print dispatcher and upload analysis in reloader process")
     
     try:
         socketio.run(app, host='0.0.0.0', port=5500, debug=True, allow_unsafe_werkzeug=True)
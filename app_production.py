@@ -23,6 +23,11 @@ from app import create_app
 
 # Import CUPS monitor
 from services.cups_monitor import start_cups_monitor, stop_cups_monitor
+from services.print_dispatcher import start_print_dispatcher, stop_print_dispatcher
+from services.upload_analysis import start_upload_analysis, stop_upload_analysis
+
+# Import database pool shutdown
+from models.connection import close_all_pools
 
 def setup_logging():
     """Configure production logging"""
@@ -66,6 +71,9 @@ def setup_signal_handlers():
         print("⏳ Stopping CUPS monitor...")
         stop_cups_monitor()
         print("✅ CUPS monitor stopped")
+        stop_print_dispatcher()
+        stop_upload_analysis()
+        close_all_pools()
         print("⏳ Shutting down server...")
         print("="*60 + "\n")
         sys.exit(0)
@@ -99,6 +107,14 @@ def main():
     print("🔄 Starting CUPS monitor...")
     start_cups_monitor(socketio, app)
     
+    # Start print dispatch workers
+    print("🖨️  Starting print dispatcher...")
+    start_print_dispatcher(socketio, app)
+    
+    # Start upload analysis workers (resumes uploads a restart interrupted)
+    print("🔎 Starting upload analysis...")
+    start_upload_analysis(socketio)
+    
     # Display configuration
     print(f"\n✅ Server Configuration:")
     print(f"   - Host: {ProductionConfig.HOST} (all interfaces)")
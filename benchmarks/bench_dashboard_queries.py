@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: admin dashboard queries as job history grows
+
+Builds synthetic jobs tables (10k, 100k and 1M rows by default) twice:
+once with the legacy schema (primary key only, ISO timestamps) and once
+fully migrated (status/time indexes, epoch columns, trigger-maintained
+status counters). Then times the queries one dashboard load runs.
+
+Usage: python3 benchmarks/bench_dashboard_queries.py [rows ...]
+"""
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.job_repository import DASHBOARD_STATS, local_day_bounds
+from models.migrations import run_migrations
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+REPEAT = 15
+HISTORY_DAYS = 730
+
+# Each entry is (label, [(sql, params), ...]); a label's time is the sum of its statements
+LEGACY_QUERIES = [
+    ("pending list", [("SELECT * FROM jobs WHERE status = 'pending_approval' ORDER BY submitted_at DESC", ())]),
+    ("completed list", [("SELECT * FROM jobs WHERE status IN ('completed', 'refunded') ORDER BY approved_at DESC LIMIT 50", ())]),
+    ("stats", [
+        ("SELECT COUNT(*) FROM jobs WHERE status = 'pending_approval'", ()),
+        ("SELECT COUNT(*) FROM jobs WHERE status = 'printing'", ()),
+        ("SELECT COUNT(*) FROM jobs WHERE status IN ('completed', 'refunded')", ()),
+        ("SELECT COUNT(*) FROM jobs WHERE DATE(submitted_at) = DATE('now')", ()),
+        ("SELECT COALESCE(SUM(cost), 0) FROM jobs WHERE DATE(submitted_at) = DATE('now') AND status IN ('printing', 'completed')", ()),
+    ]),
+]
+
+
+def indexed_queries():
+    return [
+        ("pending list", [("SELECT * FROM jobs WHERE status = 'pending_approval' ORDER BY submitted_ts DESC", ())]),
+        ("completed list", [("SELECT * FROM (SELECT * FROM jobs WHERE status = 'completed' ORDER BY approved_ts DESC LIMIT 50) "
+                             "UNION ALL SELECT * FROM (SELECT * FROM jobs WHERE status = 'refunded' ORDER BY approved_ts DESC LIMIT 50) "
+                             "ORDER BY approved_ts DESC LIMIT 50", ())]),
+        ("stats", [(DASHBOARD_STATS, local_day_bounds())]),
+    ]
+
+
+def synthetic_rows(count):
+    """Yield job rows: mostly finished history, a handful of live jobs today"""
+    rng = random.Random(42)
+    now = int(time.time())
+    for i in range(count):
+        if i % 5000 == 0:
+            status, age = rng.choice(['pending_approval', 'printing']), rng.randint(0, 3600)
+        else:
+            status = rng.choices(['completed', 'refunded', 'rejected'], [90, 3, 7])[0]
+            age = rng.randint(0, HISTORY_DAYS * 86400)
+        submitted = now - age
+        approved = submitted + 60
+        yield (f'{i:032x}', 'doc.pdf', f'uploads/{i:032x}_doc.pdf', 3, 15.0, status,
+               datetime.fromtimestamp(submitted).isoformat(), submitted,
+               datetime.fromtimestamp(approved).isoformat(), approved)
+
+
+def build(db_path, count, migrated):
+    con = sqlite3.connect(db_path)
+    if migrated:
+        run_migrations(con)
+        con.executemany('''INSERT INTO jobs (id, filename, stored_path, pages, cost, status,
+                                             submitted_at, submitted_ts, approved_at, approved_ts)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', synthetic_rows(count))
+    else:
+        # Schema version 1: the jobs table before the dashboard indexes
+        run_migrations(con, target=1)
+        con.executemany('''INSERT INTO jobs (id, filename, stored_path, pages, cost, status,
+                                             submitted_at, approved_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                        (row[:7] + (row[8],) for row in synthetic_rows(count)))
+    con.commit()
+    con.execute('ANALYZE')
+    return con
+
+
+def time_queries(con, queries):
+    """Median milliseconds per query and for the whole dashboard load"""
+    results = {}
+    for label, statements in queries:
+        samples = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            for sql, params in statements:
+                con.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[label] = statistics.median(samples)
+    results['total'] = sum(results.values())
+    return results
+
+
+def main():
+    labels = [label for label, _ in LEGACY_QUERIES] + ['total']
+    print("=" * 78)
+    print("📊 Dashboard query latency, median ms (legacy → indexed)")
+    print("=" * 78)
+    print(f"{'rows':>10}  " + "  ".join(f"{label:>18}" for label in labels))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in SIZES:
+            legacy = build(Path(tmp) / f'legacy_{count}.db', count, migrated=False)
+            indexed = build(Path(tmp) / f'indexed_{count}.db', count, migrated=True)
+            before = time_queries(legacy, LEGACY_QUERIES)
+            after = time_queries(indexed, indexed_queries())
+            legacy.close()
+            indexed.close()
+            print(f"{count:>10}  " + "  ".join(
+                f"{before[label]:>7.2f} → {after[label]:>7.2f}" for label in labels))
+
+    print("=" * 78)
+
+
+if __name__ == '__main__':
+    main()
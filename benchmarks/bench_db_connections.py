@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call sqlite3.connect() vs pooled connections
+
+Measures the latency of a job lookup the old way (open, probe, query, close)
+against the same lookup through models.connection.db_connection().
+
+Usage: python3 benchmarks/bench_db_connections.py [iterations]
+"""
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.connection import db_connection, get_pool
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def create_fixture(db_path, rows=500):
+    """Create a jobs table with some rows and return their IDs"""
+    con = sqlite3.connect(db_path)
+    con.execute('''CREATE TABLE jobs (
+        id TEXT PRIMARY KEY, filename TEXT, stored_path TEXT, pages INTEGER,
+        cost REAL, status TEXT, copies INTEGER DEFAULT 1,
+        orientation TEXT DEFAULT 'portrait', print_color TEXT DEFAULT 'bw',
+        payment_screenshot TEXT, submitted_at TEXT, approved_at TEXT,
+        approved_by TEXT, print_job_id TEXT, refunded_at TEXT, refunded_by TEXT)''')
+    ids = [uuid.uuid4().hex for _ in range(rows)]
+    con.executemany('INSERT INTO jobs (id, filename, stored_path, pages, cost, status) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(i, 'doc.pdf', f'uploads/{i}_doc.pdf', 3, 15.0, 'pending_approval') for i in ids])
+    con.commit()
+    con.close()
+    return ids
+
+
+def lookup_per_call(db_path, job_id):
+    """Old pattern: a fresh connection and a schema probe for each lookup"""
+    con = sqlite3.connect(db_path)
+    cur = con.cursor()
+    cur.execute("PRAGMA table_info(jobs)")
+    cur.fetchall()
+    cur.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+    row = cur.fetchone()
+    con.close()
+    return row
+
+
+def lookup_pooled(db_path, job_id):
+    """New pattern: borrow a long-lived connection from the pool"""
+    with db_connection(db_path) as con:
+        return con.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def run(label, fn, db_path, ids):
+    """Time ITERATIONS lookups and print a latency summary"""
+    samples = []
+    for i in range(ITERATIONS):
+        job_id = ids[i % len(ids)]
+        start = time.perf_counter()
+        fn(db_path, job_id)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    print(f"{label:<28} mean {statistics.mean(samples):8.1f} µs   "
+          f"p50 {samples[len(samples) // 2]:8.1f} µs   "
+          f"p99 {samples[int(len(samples) * 0.99)]:8.1f} µs")
+    return statistics.mean(samples)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'bench.db'
+        ids = create_fixture(db_path)
+
+        print("=" * 70)
+        print(f"📊 Job lookup latency ({ITERATIONS} iterations)")
+        print("=" * 70)
+        before = run('per-call connect + PRAGMA', lookup_per_call, db_path, ids)
+        after = run('pooled connection', lookup_pooled, db_path, ids)
+        print("=" * 70)
+        print(f"⚡ Speedup: {before / after:.1f}x")
+
+        get_pool(db_path).close()
+
+
+if __name__ == '__main__':
+    main()
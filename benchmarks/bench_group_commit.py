@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: commits per checkout, per-job writes vs group commit
+
+Runs the writes of one checkout + payment submission for carts of several
+sizes, first the old way (settings, cost and payment as separate
+statements, each its own transaction) and then through
+JobRepository.update_many(). Commits are counted with a SQLite trace
+callback.
+
+Connections use the app's own PRAGMAs (models/connection.py): WAL with
+synchronous=NORMAL, where a commit appends to the WAL without an fsync.
+Run with DB_SYNCHRONOUS=FULL to see the timings when every commit is also
+an fsync of the WAL, which is what costs time on an SD card.
+
+Usage: python3 benchmarks/bench_group_commit.py [cart sizes ...]
+       DB_SYNCHRONOUS=FULL python3 benchmarks/bench_group_commit.py [cart sizes ...]
+"""
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from models.connection import db_connection, get_pool, close_all_pools
+from models.job_repository import JobRepository
+from models.migrations import run_migrations
+
+CART_SIZES = [int(arg) for arg in sys.argv[1:]] or [1, 5, 20]
+REPEAT = 20
+
+
+class CommitCounter:
+    """Counts COMMIT statements on every connection the pool opens"""
+
+    def __init__(self, pool):
+        self.commits = 0
+        connect = pool._connect
+
+        def traced_connect():
+            con = connect()
+            con.set_trace_callback(self._trace)
+            return con
+
+        pool._connect = traced_connect
+
+    def _trace(self, statement):
+        if statement.strip().upper() == 'COMMIT':
+            self.commits += 1
+
+
+def insert_cart(repo, size):
+    job_ids = [uuid.uuid4().hex for _ in range(size)]
+    for job_id in job_ids:
+        repo.insert(job_id, 'doc.pdf', f'uploads/{job_id}_doc.pdf', 3, 15.0)
+    return job_ids
+
+
+def checkout_per_job(repo, job_ids):
+    """Old pattern: settings and cost committed separately per cart item, then
+    the payment as one UPDATE per job"""
+    for job_id in job_ids:
+        repo.update(job_id, copies=2, orientation='portrait', print_color='bw')
+        repo.update(job_id, cost=30.0)
+    with db_connection(repo.db_path) as con:
+        for job_id in job_ids:
+            con.execute("UPDATE jobs SET payment_screenshot = ?, status = 'pending_approval' WHERE id = ?",
+                        ('screenshots/pay.png', job_id))
+
+
+def checkout_grouped(repo, job_ids):
+    """New pattern: one transaction for checkout, one for payment"""
+    repo.update_many((job_id, {'copies': 2, 'orientation': 'portrait', 'print_color': 'bw', 'cost': 30.0})
+                     for job_id in job_ids)
+    repo.submit_payment(job_ids, 'screenshots/pay.png', datetime.now())
+
+
+def measure(repo, counter, size, checkout):
+    """(commits per checkout, median ms per checkout)"""
+    samples = []
+    commits = 0
+    for _ in range(REPEAT):
+        job_ids = insert_cart(repo, size)
+        before = counter.commits
+        start = time.perf_counter()
+        checkout(repo, job_ids)
+        samples.append((time.perf_counter() - start) * 1000)
+        commits = counter.commits - before
+    return commits, statistics.median(samples)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'jobs.db'
+        with db_connection(db_path) as con:
+            run_migrations(con)
+        close_all_pools()
+
+        print("=" * 70)
+        print(f"💾 Commits per checkout (journal_mode={Config.DB_JOURNAL_MODE}, "
+              f"synchronous={Config.DB_SYNCHRONOUS})")
+        print("=" * 70)
+        print(f"{'cart size':>10}  {'per-job commits':>16}  {'grouped commits':>16}  {'per-job ms':>11}  {'grouped ms':>11}")
+
+        counter = CommitCounter(get_pool(db_path))
+        repo = JobRepository(db_path, cache_size=0)
+
+        for size in CART_SIZES:
+            old_commits, old_ms = measure(repo, counter, size, checkout_per_job)
+            new_commits, new_ms = measure(repo, counter, size, checkout_grouped)
+            print(f"{size:>10}  {old_commits:>16}  {new_commits:>16}  {old_ms:>11.2f}  {new_ms:>11.2f}")
+
+        close_all_pools()
+
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
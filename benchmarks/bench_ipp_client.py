@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: job status lookups over IPP vs lpstat subprocesses
+
+Times check_print_job_status() with the 'lp' backend (forks lpstat) against
+the 'ipp' backend talking to the fakecups stub scheduler, plus IPP with a new
+connection per request to show what keep-alive saves.
+
+The lp path runs a small stand-in `lpstat` script printing a fixed queue
+listing, so the numbers are fork/exec + parsing cost only; the real lpstat
+also has to query cupsd and is slower.
+
+Usage: python3 benchmarks/bench_ipp_client.py [iterations]
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from fakecups import FakeCupsServer
+from utils import print_utils
+from utils.ipp_client import IPPClient
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PRINTER = 'Canon_G3000_W'
+
+FAKE_LPSTAT = f'''#!/bin/sh
+cat <<'EOF'
+{PRINTER}-1        pi          10240   Sat 17 Oct 2026 10:00:00 AM IST
+	Status: Printing page 1
+	Alerts: job-printing
+	queued for {PRINTER}
+EOF
+'''
+
+
+def median_ms(func):
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ITERATIONS):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, FakeCupsServer(printers=[PRINTER], seconds_per_job=3600) as cups:
+        # Stand-in lpstat first on PATH
+        lpstat = Path(tmp) / 'lpstat'
+        lpstat.write_text(FAKE_LPSTAT)
+        lpstat.chmod(0o755)
+        os.environ['PATH'] = f"{tmp}{os.pathsep}{os.environ['PATH']}"
+
+        document = Path(tmp) / 'doc.pdf'
+        document.write_bytes(b'%PDF-1.4\n' + b'0' * 10_000)
+
+        Config.CUPS_HOST, Config.CUPS_PORT = cups.host, cups.port
+        client = IPPClient(cups.host, cups.port)
+        job = client.print_job(PRINTER, document)
+        job_id = f"{PRINTER}-{job['job-id']}"
+
+        Config.PRINT_BACKEND = 'lp'
+        lp_ms = median_ms(lambda: print_utils.check_print_job_status(job_id))
+
+        Config.PRINT_BACKEND = 'ipp'
+        ipp_ms = median_ms(lambda: print_utils.check_print_job_status(job_id))
+
+        def fresh_connection():
+            fresh = IPPClient(cups.host, cups.port)
+            fresh.get_job_attributes(PRINTER, job['job-id'])
+            fresh.close()
+        fresh_ms = median_ms(fresh_connection)
+
+        submit_ms = median_ms(lambda: client.print_job(PRINTER, document))
+        client.close()
+
+    print("=" * 60)
+    print(f"🖨️  CUPS job status lookup, median of {ITERATIONS}")
+    print("=" * 60)
+    print(f"lpstat subprocess (lp backend):   {lp_ms:8.3f} ms")
+    print(f"IPP, new connection per request:  {fresh_ms:8.3f} ms")
+    print(f"IPP, keep-alive (ipp backend):    {ipp_ms:8.3f} ms   ({lp_ms / ipp_ms:.0f}x faster)")
+    print(f"IPP Print-Job, 10 KB document:    {submit_ms:8.3f} ms")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reading job statuses out of `lpstat -W completed -l` history
+
+Compares, for a history of N finished jobs:
+- the old lookup (substring test, then a line scan for the job's section)
+- parse_lpstat() indexing the whole history once
+- LpstatHistory.update() when one job finished since the last read
+
+No lpstat is run; the history text is generated in memory.
+
+Usage: python3 benchmarks/bench_lpstat_parser.py [history_jobs] [iterations]
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.lpstat_parser import parse_lpstat, LpstatHistory
+
+HISTORY_JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+PRINTER = 'Canon_G3000_W'
+
+
+def history(jobs):
+    alerts = ('job-completed-successfully', 'job-canceled-by-user', 'aborted-by-system')
+    return ''.join(
+        f"{PRINTER}-{n:<10} pi    10240   Sat 17 Oct 2026 10:00:00 AM IST\n"
+        f"\tAlerts: {alerts[n % 3]}\n"
+        f"\tqueued for {PRINTER}\n"
+        for n in range(1, jobs + 1)
+    )
+
+
+def old_lookup(output, job_id):
+    """check_print_job_status()'s previous scan of the completed history"""
+    if job_id not in output:
+        return 'unknown'
+    section = []
+    in_job = False
+    for line in output.split('\n'):
+        if job_id in line:
+            in_job = True
+            section.append(line)
+        elif in_job:
+            if line and not line[0].isspace() and '-' in line:
+                break
+            section.append(line)
+    details = '\n'.join(section).lower()
+    return 'canceled' if 'canceled' in details else 'aborted' if 'aborted' in details else 'completed'
+
+
+def median_ms(func):
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    output = history(HISTORY_JOBS)
+    newest = f"{PRINTER}-{HISTORY_JOBS}"
+
+    old_ms = median_ms(lambda: old_lookup(output, newest))
+    full_ms = median_ms(lambda: parse_lpstat(output, completed=True))
+
+    grown = output + history(HISTORY_JOBS + 1)[len(output):]
+
+    def incremental():
+        index = LpstatHistory()
+        index.jobs = dict(base.jobs)
+        start = time.perf_counter()
+        index.update(grown)
+        return (time.perf_counter() - start) * 1000
+
+    base = LpstatHistory()
+    base.update(output)
+    incremental_ms = statistics.median(incremental() for _ in range(ITERATIONS))
+
+    # Wrong answers the substring test gives: -1 also matches -10, -11, ...
+    short_id = f"{PRINTER}-1"
+    matches = sum(1 for line in output.splitlines() if short_id in line)
+
+    print("=" * 60)
+    print(f"🧾 lpstat completed history, {HISTORY_JOBS} jobs, median of {ITERATIONS}")
+    print("=" * 60)
+    print(f"Old substring scan, one lookup:   {old_ms:8.3f} ms")
+    print(f"parse_lpstat, every job indexed:  {full_ms:8.3f} ms")
+    print(f"LpstatHistory, 1 new job:         {incremental_ms:8.3f} ms")
+    print(f"Header lines containing {short_id!r}: {matches} (exact match: 1)")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
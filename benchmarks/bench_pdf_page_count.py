@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: counting the pages of uploaded PDFs
+
+Compares, on the corpus of benchmarks/pdf_corpus.py (1 to 5000 pages, up
+to 48 MB of scanned images, xref tables and streams, incremental updates):
+- PyPDF2: PdfReader + len(reader.pages), the previous count_pdf_pages()
+- read_pdf_page_count(): startxref, xref and /Root /Pages /Count only
+- count_pdf_pages(): the fast path with the PyPDF2 fallback
+
+Reports the best time of each and the peak Python memory allocated.
+
+Usage: python3 benchmarks/bench_pdf_page_count.py [iterations] [corpus_dir]
+"""
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PyPDF2 import PdfReader
+from utils.file_utils import count_pdf_pages
+from utils.pdf_pages import read_pdf_page_count
+from pdf_corpus import write_corpus
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+CORPUS_DIR = sys.argv[2] if len(sys.argv) > 2 else None
+
+# PyPDF2 warns about the deliberately broken file on every read
+logging.getLogger('PyPDF2').setLevel(logging.ERROR)
+
+
+def pypdf2_count(path):
+    return len(PdfReader(path).pages)
+
+
+def measure(count, path):
+    """(pages, best ms, peak KB of Python allocations)"""
+    best = float('inf')
+    for _ in range(ITERATIONS):
+        began = time.perf_counter()
+        pages = count(path)
+        best = min(best, time.perf_counter() - began)
+    tracemalloc.start()
+    count(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pages, best * 1000, peak / 1024
+
+
+def run(directory):
+    files = write_corpus(directory)
+    print("=" * 96)
+    print(f"📄 PDF page count: {len(files)} files, best of {ITERATIONS}")
+    print("=" * 96)
+    print(f"{'file':27} {'MB':>6} {'pages':>5}   {'PyPDF2':>18}   {'fast path':>18}   {'count_pdf_pages':>15}")
+    for path, expected in files:
+        slow_pages, slow_ms, slow_kb = measure(pypdf2_count, path)
+        fast_pages, fast_ms, fast_kb = measure(read_pdf_page_count, path)
+        pages, ms, _ = measure(count_pdf_pages, path)
+        mark = '✅' if pages == slow_pages == expected else '❌'
+        fast = f"{fast_ms:7.2f} ms {fast_kb:6.0f} KB" if fast_pages is not None else f"{'fallback':>18}"
+        print(f"{path.stem:27} {path.stat().st_size / 1e6:6.2f} {expected:5}   "
+              f"{slow_ms:7.2f} ms {slow_kb:6.0f} KB   {fast}   {ms:9.2f} ms {mark}")
+    print("=" * 96)
+
+
+if __name__ == '__main__':
+    if CORPUS_DIR:
+        run(CORPUS_DIR)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(tmp)
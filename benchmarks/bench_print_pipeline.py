@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the whole print pipeline against the fakecups simulator
+
+Submits a batch of PDFs (1-10 pages each) through print_file(), routed over
+a two-printer pool by choose_printer(), then follows them with
+check_print_job_statuses() snapshots until every job has finished. Runs
+once per backend: 'lp' forks the fake lp/lpstat commands, 'ipp' talks to
+the stub directly. A share of submissions is rejected (fail_rate) and
+retried, like the print dispatcher does.
+
+Reports submit latency, snapshot latency, throughput against what the
+printers could do at full speed, and how long finished jobs went unnoticed.
+
+Usage: python3 benchmarks/bench_print_pipeline.py [jobs] [ppm] [fail_rate]
+"""
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from fakecups import FakeCupsServer
+from services import printer_pool
+from utils import print_utils
+
+JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+PPM = float(sys.argv[2]) if len(sys.argv) > 2 else 600
+FAIL_RATE = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+PRINTERS = ('Canon_G3000_W', 'Brother_HL1110')
+POLL_SECONDS = 0.25
+MAX_ATTEMPTS = 5
+
+
+def make_pdf(path, pages):
+    """Just enough of a PDF for the simulator to count its pages"""
+    objects = b''.join(b'<< /Type /Page /Parent 2 0 R >>\n' for _ in range(pages))
+    path.write_bytes(b'%PDF-1.4\n' + f'<< /Type /Pages /Count {pages} >>\n'.encode() + objects + b'%%EOF\n')
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run(backend, documents):
+    rng = random.Random(1)
+    with FakeCupsServer(printers=PRINTERS, ppm=PPM, fail_rate=FAIL_RATE, seed=1) as cups:
+        Config.PRINT_BACKEND = backend
+        Config.CUPS_HOST, Config.CUPS_PORT = cups.host, cups.port
+        os.environ.update(cups.cli_env())
+        print_utils._ipp_client = None
+
+        submit_ms = []
+        retries = 0
+        loads = {}
+        pending = {}  # cups job id -> pages
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path, pages in documents:
+                printer = printer_pool.choose_printer(rng.choice(('bw', 'color')), pages, loads)
+                for attempt in range(1, MAX_ATTEMPTS + 1):
+                    began = time.perf_counter()
+                    result = print_utils.print_file(str(path), printer=printer)
+                    submit_ms.append((time.perf_counter() - began) * 1000)
+                    if result['success']:
+                        pending[result['job_id']] = pages
+                        break
+                    retries += 1
+            submitted = time.perf_counter() - start
+
+            poll_ms = []
+            detection_lag = []
+            while pending:
+                began = time.perf_counter()
+                statuses = print_utils.check_print_job_statuses(list(pending))
+                poll_ms.append((time.perf_counter() - began) * 1000)
+                for job_id, status in statuses.items():
+                    if status in ('completed', 'canceled', 'aborted', 'error'):
+                        # How long after the simulated printer finished it
+                        job = cups.jobs[int(job_id.rpartition('-')[2])]
+                        detection_lag.append((time.time() - job['end']) * 1000)
+                        del pending[job_id]
+                if pending:
+                    time.sleep(POLL_SECONDS)
+        elapsed = time.perf_counter() - start
+
+        total_pages = sum(pages for _, pages in documents)
+        ideal = total_pages / (PPM * len(PRINTERS)) * 60
+        print(f"\n🔧 Backend: {backend}")
+        print(f"   Submit latency:     p50 {statistics.median(submit_ms):7.2f} ms   "
+              f"p95 {percentile(submit_ms, 0.95):7.2f} ms   ({retries} rejected and retried)")
+        print(f"   Snapshot latency:   p50 {statistics.median(poll_ms):7.2f} ms   "
+              f"p95 {percentile(poll_ms, 0.95):7.2f} ms   ({len(poll_ms)} polls)")
+        print(f"   Finish noticed:     p50 {statistics.median(detection_lag):7.0f} ms   "
+              f"p95 {percentile(detection_lag, 0.95):7.0f} ms after the printer was done")
+        print(f"   Submitting {len(documents)} jobs:  {submitted:7.2f} s")
+        print(f"   All jobs finished:  {elapsed:7.2f} s   (printers alone: {ideal:.2f} s, "
+              f"{total_pages / elapsed * 60:.0f} pages/min)")
+        print(f"   CUPS requests:      {cups.requests}")
+
+
+def main():
+    Config.PRINTERS = ','.join(f'{name}:{mode}:{PPM:g}' for name, mode in zip(PRINTERS, ('color', 'bw')))
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        documents = []
+        for n in range(JOBS):
+            pages = rng.randint(1, 10)
+            path = Path(tmp) / f'doc{n}.pdf'
+            make_pdf(path, pages)
+            documents.append((path, pages))
+
+        print("=" * 60)
+        print(f"🖨️  Print pipeline: {JOBS} jobs, {len(PRINTERS)} printers at {PPM:g} ppm, "
+              f"{FAIL_RATE:.0%} submissions rejected")
+        print("=" * 60)
+        for backend in ('lp', 'ipp'):
+            run(backend, documents)
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark corpus: PDFs of different sizes and internal layouts
+
+Builds the documents bench_pdf_page_count.py measures: text-only files from
+1 to 5000 pages, scan-like files whose pages each carry a large
+incompressible image (up to about 48 MB, the upload limit), files with
+PDF 1.5 cross-reference and object streams, an incrementally updated file,
+one written by PyPDF2, a deep page tree and one with a broken xref offset
+(which has to fall back to the full parser).
+
+Nothing is committed: the files are generated, deterministically, when
+needed.
+
+Usage: python3 benchmarks/pdf_corpus.py DIRECTORY
+"""
+import io
+import random
+import sys
+import zlib
+from pathlib import Path
+
+# name -> (pages, image bytes per page, layout, page tree fan-out)
+CORPUS = {
+    'text-1p': (1, 0, 'table', None),
+    'text-50p': (50, 0, 'table', None),
+    'text-1000p': (1000, 0, 'table', None),
+    'text-5000p': (5000, 0, 'table', None),
+    'scan-10p-5mb': (10, 500_000, 'table', None),
+    'scan-40p-48mb': (40, 1_200_000, 'table', None),
+    'objstm-1000p': (1000, 0, 'objstm', None),
+    'objstm-scan-30p-30mb': (30, 1_000_000, 'objstm', None),
+    'tree-2000p': (2000, 0, 'table', 8),
+    'incremental-300p': (300, 0, 'incremental', None),
+    'pypdf2-300p': (300, 0, 'pypdf2', None),
+    'broken-xref-200p': (200, 0, 'broken', None),
+}
+
+
+class _Document:
+    """Objects of a PDF, numbered from 1, serialized by one of the writers below"""
+
+    def __init__(self):
+        self.objects = []  # (dictionary bytes, stream bytes or None)
+
+    def add(self, dictionary=b'', stream=None):
+        self.objects.append((dictionary, stream))
+        return len(self.objects)
+
+    def set(self, num, dictionary, stream=None):
+        self.objects[num - 1] = (dictionary, stream)
+
+
+def build_document(pages, image_bytes=0, fanout=None, seed=0):
+    """Catalog (1), page tree root (2), page tree nodes and pages"""
+    rng = random.Random(seed)
+    doc = _Document()
+    doc.add()  # catalog, filled in below
+    doc.add()  # page tree root
+
+    page_nums = []
+    for n in range(pages):
+        content = f'BT /F1 24 Tf 72 720 Td (Page {n + 1}) Tj ET'.encode()
+        resources = b'/Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >>'
+        if image_bytes:
+            # Incompressible pixels, like the JPEG of a scanned page
+            width = 1000
+            height = max(1, image_bytes // width)
+            image = doc.add(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray '
+                            b'/BitsPerComponent 8' % (width, height), rng.randbytes(width * height))
+            resources += b' /XObject << /Im0 %d 0 R >>' % image
+            content = b'q 595 0 0 842 0 0 cm /Im0 Do Q ' + content
+        contents = doc.add(b'<<', content)
+        page_nums.append(doc.add(b'<< /Type /Page /MediaBox [0 0 595 842] /Resources << %s >> /Contents %d 0 R'
+                                 % (resources, contents)))
+
+    def attach(parent, kids):
+        """Point each kid at parent; pages get their /Parent appended"""
+        for kid in kids:
+            dictionary, stream = doc.objects[kid - 1]
+            doc.set(kid, dictionary + b' /Parent %d 0 R >>' % parent, stream)
+
+    def build_tree(parent, kids_pages):
+        if fanout is None or len(kids_pages) <= fanout:
+            attach(parent, kids_pages)
+            return kids_pages, len(kids_pages)
+        size = -(-len(kids_pages) // fanout)
+        nodes = []
+        for start in range(0, len(kids_pages), size):
+            node = doc.add()
+            kids, count = build_tree(node, kids_pages[start:start + size])
+            doc.set(node, b'<< /Type /Pages /Parent %d 0 R /Kids [%s] /Count %d >>'
+                    % (parent, b' '.join(b'%d 0 R' % kid for kid in kids), count))
+            nodes.append(node)
+        return nodes, len(kids_pages)
+
+    kids, count = build_tree(2, page_nums)
+    doc.set(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), count))
+    doc.set(1, b'<< /Type /Catalog /Pages 2 0 R /PageLayout /OneColumn >>')
+    return doc
+
+
+def _object_bytes(num, dictionary, stream):
+    if stream is None:
+        return b'%d 0 obj\n%s\nendobj\n' % (num, dictionary)
+    return b'%d 0 obj\n%s /Length %d >>\nstream\n%s\nendstream\nendobj\n' % (num, dictionary, len(stream), stream)
+
+
+def write_with_table(doc, out):
+    """Classic layout: objects, an 'xref' table and a trailer"""
+    out.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for num, (dictionary, stream) in enumerate(doc.objects, 1):
+        offsets.append(out.tell())
+        out.write(_object_bytes(num, dictionary, stream))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f\r\n' % (len(offsets) + 1))
+    out.write(b''.join(b'%010d 00000 n\r\n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(offsets) + 1, xref))
+    return xref
+
+
+def append_update(doc, out, previous_xref):
+    """Incremental update: a new catalog version and an xref section with /Prev"""
+    num = 1
+    offset = out.tell()
+    out.write(_object_bytes(num, b'<< /Type /Catalog /Pages 2 0 R /PageMode /UseOutlines >>', None))
+    xref = out.tell()
+    out.write(b'xref\n1 1\n%010d 00000 n\r\n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n'
+              % (len(doc.objects) + 1, previous_xref, xref))
+
+
+def write_with_object_streams(doc, out, per_stream=100):
+    """PDF 1.5 layout: dictionaries packed into object streams, a compressed
+    cross-reference stream with the PNG Up predictor"""
+    out.write(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+    entries = {}  # num -> (type, field 2, field 3)
+    packed = [num for num, (_, stream) in enumerate(doc.objects, 1) if stream is None]
+    next_num = len(doc.objects) + 1
+
+    for num, (dictionary, stream) in enumerate(doc.objects, 1):
+        if stream is not None:
+            entries[num] = (1, out.tell(), 0)
+            out.write(_object_bytes(num, dictionary, stream))
+
+    for start in range(0, len(packed), per_stream):
+        group = packed[start:start + per_stream]
+        header, body = [], io.BytesIO()
+        for index, num in enumerate(group):
+            header.append(b'%d %d' % (num, body.tell()))
+            body.write(doc.objects[num - 1][0] + b'\n')
+            entries[num] = (2, next_num, index)
+        header = b' '.join(header) + b'\n'
+        data = zlib.compress(header + body.getvalue())
+        entries[next_num] = (1, out.tell(), 0)
+        out.write(_object_bytes(next_num, b'<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode'
+                                % (len(group), len(header)), data))
+        next_num += 1
+
+    xref_num = next_num
+    entries[xref_num] = (1, out.tell(), 0)
+    rows, previous = [], bytes(7)
+    for num in range(xref_num + 1):
+        kind, field2, field3 = entries.get(num, (0, 0, 65535))
+        row = bytes([kind]) + field2.to_bytes(4, 'big') + field3.to_bytes(2, 'big')
+        rows.append(b'\x02' + bytes((a - b) & 0xff for a, b in zip(row, previous)))
+        previous = row
+    out.write(_object_bytes(xref_num, b'<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Filter /FlateDecode '
+                            b'/DecodeParms << /Predictor 12 /Columns 7 >>' % (xref_num + 1),
+                            zlib.compress(b''.join(rows))))
+    out.write(b'startxref\n%d\n%%%%EOF\n' % entries[xref_num][1])
+
+
+def write_with_pypdf2(pages, out):
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(595, 842)
+    writer.write(out)
+
+
+def build(name):
+    """Bytes of one corpus file"""
+    pages, image_bytes, layout, fanout = CORPUS[name]
+    out = io.BytesIO()
+    if layout == 'pypdf2':
+        write_with_pypdf2(pages, out)
+        return out.getvalue()
+    doc = build_document(pages, image_bytes, fanout)
+    if layout == 'objstm':
+        write_with_object_streams(doc, out)
+    else:
+        xref = write_with_table(doc, out)
+        if layout == 'incremental':
+            append_update(doc, out, xref)
+        elif layout == 'broken':
+            # Offsets shifted by an editor that did not rewrite the xref
+            return out.getvalue().replace(b'%PDF-1.4\n', b'%PDF-1.4\n% edited\n', 1)
+    return out.getvalue()
+
+
+def write_corpus(directory):
+    """Write every corpus file to directory; returns [(path, pages)]"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = []
+    for name, (pages, _, _, _) in CORPUS.items():
+        path = directory / f'{name}.pdf'
+        if not path.exists():
+            path.write_bytes(build(name))
+        files.append((path, pages))
+    return files
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    for path, pages in write_corpus(sys.argv[1]):
+        print(f"📄 {path.name:28} {pages:5} pages  {path.stat().st_size / 1e6:7.2f} MB")
@@ -8,7 +8,13 @@ import sys
 import time
 from pathlib import Path
 from datetime import datetime, timedelta
-import sqlite3
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from models.blob_store import BlobStore
+from models.job import preview_image_path
+from models.job_repository import JobRepository
 
 # Configuration
 DAYS_TO_KEEP_COMPLETED = int(os.getenv('CLEANUP_DAYS_COMPLETED', '14'))  # Keep completed jobs for 14 days
@@ -22,25 +28,29 @@ UPLOADS_DIR = BASE_DIR / 'uploads'
 SCREENSHOTS_DIR = BASE_DIR / 'screenshots'
 DB_PATH = BASE_DIR / 'jobs.db'
 
-def get_old_jobs(cursor, status, days):
+# One-shot script: no point caching rows
+jobs = JobRepository(DB_PATH, cache_size=0)
+blobs = BlobStore(DB_PATH)
+
+def get_old_jobs(status, days):
     """Get jobs older than specified days with given status"""
-    cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-    cursor.execute("""
-        SELECT id, filename, stored_path, payment_screenshot, status
-        FROM jobs 
-        WHERE status = ? AND submitted_at < ?
-    """, (status, cutoff_date))
-    return cursor.fetchall()
+    # Uses the (status, submitted_ts) index; submitted_ts = 0 means never submitted
+    cutoff_ts = int((datetime.now() - timedelta(days=days)).timestamp())
+    return jobs.old_jobs(status, cutoff_ts)
 
-def get_all_job_files(cursor):
+def get_all_job_files():
     """Get set of all files referenced in database"""
-    cursor.execute("SELECT stored_path, payment_screenshot FROM jobs")
     files = set()
-    for row in cursor.fetchall():
+    for row in jobs.referenced_files():
         if row[0]:  # stored_path
             files.add(Path(row[0]).name)
         if row[1]:  # payment_screenshot
             files.add(Path(row[1]).name)
+    # Shared uploads are deleted by cleanup_unreferenced_blobs() only; their
+    # previews become orphans then
+    for path in blobs.paths():
+        files.add(Path(path).name)
+        files.add(Path(preview_image_path(path)).name)
     return files
 
 def format_size(bytes):
@@ -67,17 +77,21 @@ def delete_file(filepath, dry_run=False):
 def delete_job_files(job, dry_run=False):
     """Delete all files associated with a job"""
     deleted_size = 0
-    job_id, filename, stored_path, screenshot, status = job
+    job_id, filename, stored_path, screenshot, status, blob_sha256 = job
     
-    # Delete uploaded file
-    if stored_path:
+    # Delete uploaded file; a shared upload only loses this job's reference
+    # and is deleted by cleanup_unreferenced_blobs() once no job is left
+    if stored_path and not blob_sha256:
         file_path = BASE_DIR / stored_path
         size = delete_file(file_path, dry_run)
         if size > 0:
             deleted_size += size
             action = "Would delete" if dry_run else "Deleted"
             print(f"  {action}: {file_path.name} ({format_size(size)})")
-    
+    elif stored_path:
+        action = "Would release" if dry_run else "Released"
+        print(f"  {action} shared upload: {Path(stored_path).name}")
+
     # Delete screenshot
     if screenshot:
         screenshot_path = BASE_DIR / screenshot
@@ -89,10 +103,10 @@ def delete_job_files(job, dry_run=False):
     
     return deleted_size
 
-def delete_job_from_db(cursor, job_id, dry_run=False):
+def delete_job_from_db(job_id, dry_run=False):
     """Delete job record from database"""
     if not dry_run:
-        cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        jobs.delete(job_id)
 
 def cleanup_old_jobs():
     """Clean up old completed and rejected jobs"""
@@ -111,22 +125,19 @@ def cleanup_old_jobs():
     print()
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         total_deleted = 0
         total_jobs = 0
         
         # Clean up completed jobs
         print("🔍 Checking completed jobs...")
-        completed_jobs = get_old_jobs(cursor, 'completed', DAYS_TO_KEEP_COMPLETED)
+        completed_jobs = get_old_jobs('completed', DAYS_TO_KEEP_COMPLETED)
         if completed_jobs:
             print(f"   Found {len(completed_jobs)} old completed job(s)")
             for job in completed_jobs:
                 job_id, filename = job[0], job[1]
                 print(f"\n   Job: {job_id[:8]}... - {filename}")
                 deleted = delete_job_files(job, DRY_RUN)
-                delete_job_from_db(cursor, job_id, DRY_RUN)
+                delete_job_from_db(job_id, DRY_RUN)
                 total_deleted += deleted
                 total_jobs += 1
         else:
@@ -134,14 +145,14 @@ def cleanup_old_jobs():
         
         # Clean up rejected jobs
         print("\n🔍 Checking rejected jobs...")
-        rejected_jobs = get_old_jobs(cursor, 'rejected', DAYS_TO_KEEP_REJECTED)
+        rejected_jobs = get_old_jobs('rejected', DAYS_TO_KEEP_REJECTED)
         if rejected_jobs:
             print(f"   Found {len(rejected_jobs)} old rejected job(s)")
             for job in rejected_jobs:
                 job_id, filename = job[0], job[1]
                 print(f"\n   Job: {job_id[:8]}... - {filename}")
                 deleted = delete_job_files(job, DRY_RUN)
-                delete_job_from_db(cursor, job_id, DRY_RUN)
+                delete_job_from_db(job_id, DRY_RUN)
                 total_deleted += deleted
                 total_jobs += 1
         else:
@@ -149,23 +160,19 @@ def cleanup_old_jobs():
         
         # Clean up refunded jobs (older than completed)
         print("\n🔍 Checking refunded jobs...")
-        refunded_jobs = get_old_jobs(cursor, 'refunded', DAYS_TO_KEEP_COMPLETED)
+        refunded_jobs = get_old_jobs('refunded', DAYS_TO_KEEP_COMPLETED)
         if refunded_jobs:
             print(f"   Found {len(refunded_jobs)} old refunded job(s)")
             for job in refunded_jobs:
                 job_id, filename = job[0], job[1]
                 print(f"\n   Job: {job_id[:8]}... - {filename}")
                 deleted = delete_job_files(job, DRY_RUN)
-                delete_job_from_db(cursor, job_id, DRY_RUN)
+                delete_job_from_db(job_id, DRY_RUN)
                 total_deleted += deleted
                 total_jobs += 1
         else:
             print("   ✓ No old refunded jobs to clean")
         
-        if not DRY_RUN:
-            conn.commit()
-        conn.close()
-        
         print("\n" + "=" * 70)
         print(f"📊 Job Cleanup Summary:")
         print(f"   - Jobs processed: {total_jobs}")
@@ -178,17 +185,45 @@ def cleanup_old_jobs():
     
     return 0
 
+def cleanup_unreferenced_blobs():
+    """Delete stored uploads whose last job went away"""
+    print("\n🔍 Checking for unreferenced uploads...")
+    
+    if DRY_RUN:
+        # No job was deleted, so no reference was dropped either
+        print("   ✓ Skipped in dry run (uploads of the jobs above are freed once they are deleted)")
+        return 0
+    
+    try:
+        total_deleted = 0
+        total_files = 0
+        for sha256, path, size in blobs.unreferenced():
+            # Skipped if an upload of the same file took it again meanwhile
+            if blobs.remove(sha256, lambda path: delete_file(BASE_DIR / path)):
+                total_deleted += size
+                total_files += 1
+                print(f"   Deleted unreferenced upload: {Path(path).name} ({format_size(size)})")
+        
+        if total_files == 0:
+            print("   ✓ No unreferenced uploads found")
+        else:
+            print(f"\n📊 Unreferenced Uploads Summary:")
+            print(f"   - Files removed: {total_files}")
+            print(f"   - Space freed: {format_size(total_deleted)}")
+        
+    except Exception as e:
+        print(f"\n❌ Error during upload cleanup: {e}")
+        return 1
+    
+    return 0
+
 def cleanup_orphaned_files():
     """Clean up files not referenced in database"""
     print("\n🔍 Checking for orphaned files...")
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         # Get all files referenced in database
-        db_files = get_all_job_files(cursor)
-        conn.close()
+        db_files = get_all_job_files()
         
         total_deleted = 0
         total_files = 0
@@ -245,7 +280,8 @@ def main():
     
     # Run cleanup
     result1 = cleanup_old_jobs()
-    result2 = cleanup_orphaned_files()
+    result2 = cleanup_unreferenced_blobs()
+    result3 = cleanup_orphaned_files()
     
     print("\n" + "=" * 70)
     if DRY_RUN:
@@ -257,7 +293,7 @@ def main():
     print("=" * 70)
     print()
     
-    return result1 or result2
+    return result1 or result2 or result3
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -15,6 +15,7 @@ class Config:
     # Admin credentials
     ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', '25'))  # Jobs per dashboard page / scroll step
     
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -24,14 +25,42 @@ class Config:
     
     # File upload settings
     UPLOAD_FOLDER = Path(os.getenv('UPLOAD_FOLDER', 'uploads'))
+    MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))  # per uploaded file
+    UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_BYTES', str(1024 * 1024)))  # resumable upload chunk size
+    UPLOAD_ANALYSIS_WORKERS = int(os.getenv('UPLOAD_ANALYSIS_WORKERS', '2'))  # threads counting pages / rendering previews
+    UPLOAD_PREVIEW_PIXELS = int(os.getenv('UPLOAD_PREVIEW_PIXELS', '400'))  # longest side of first-page previews
     SCREENSHOTS_FOLDER = Path(os.getenv('SCREENSHOTS_FOLDER', 'screenshots'))
     STATIC_FOLDER = Path('static')
     
     # Database settings
     DB_PATH = Path(os.getenv('DB_PATH', 'jobs.db'))
-    
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # Safe with WAL, far fewer fsyncs than FULL
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+    JOB_CACHE_SIZE = int(os.getenv('JOB_CACHE_SIZE', '256'))  # In-process LRU of job rows, 0 disables
+    JOB_CACHE_TTL_SECONDS = float(os.getenv('JOB_CACHE_TTL_SECONDS', '30'))  # Bounds staleness from other processes' writes
+
     # Printer settings
     PRINTER_NAME = os.getenv('PRINTER_NAME', 'Canon_G3000_W')
+    PRINTERS = os.getenv('PRINTERS', '')  # "name:color|bw:ppm,..." pool; empty = PRINTER_NAME alone
+    PRINT_BACKEND = os.getenv('PRINT_BACKEND', 'lp')  # 'lp' (lp/lpstat commands) or 'ipp' (direct to cupsd)
+    CUPS_HOST = os.getenv('CUPS_HOST', 'localhost')
+    CUPS_PORT = int(os.getenv('CUPS_PORT', '631'))
+    CUPS_EVENTS = os.getenv('CUPS_EVENTS', 'true').lower() == 'true'  # notify-pull job events (ipp backend)
+    CUPS_EVENT_LEASE_SECONDS = int(os.getenv('CUPS_EVENT_LEASE_SECONDS', '3600'))
+    CUPS_ACTIVE_POLL_SECONDS = float(os.getenv('CUPS_ACTIVE_POLL_SECONDS', '1.5'))  # while jobs are printing
+    CUPS_IDLE_POLL_SECONDS = float(os.getenv('CUPS_IDLE_POLL_SECONDS', '120'))  # backoff ceiling when idle
+    CUPS_ACTIVE_GRACE_SECONDS = float(os.getenv('CUPS_ACTIVE_GRACE_SECONDS', '10'))  # stay fast after a wake
+    CUPS_FALLBACK_POLL_SECONDS = float(os.getenv('CUPS_FALLBACK_POLL_SECONDS', '300'))  # while events flow
+    CUPS_STATUS_CACHE_SECONDS = float(os.getenv('CUPS_STATUS_CACHE_SECONDS', '3'))  # reuse job status lookups
+    PRINT_WORKERS = int(os.getenv('PRINT_WORKERS', '2'))  # threads sending queued jobs to CUPS
+    PRINT_HOLD_ON_PAYMENT = os.getenv('PRINT_HOLD_ON_PAYMENT', 'true').lower() == 'true'  # spool held, release on approve
+    PRINT_MAX_ATTEMPTS = int(os.getenv('PRINT_MAX_ATTEMPTS', '5'))
+    PRINT_RETRY_BASE_SECONDS = float(os.getenv('PRINT_RETRY_BASE_SECONDS', '5'))  # doubles per attempt
+    PRINT_RETRY_MAX_SECONDS = float(os.getenv('PRINT_RETRY_MAX_SECONDS', '300'))
     COST_PER_PAGE = float(os.getenv('COST_PER_PAGE', '5.0'))
     
     # Allowed file extensions
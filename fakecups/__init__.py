@@ -0,0 +1,6 @@
+"""
+Simulated CUPS scheduler for exercising the print pipeline without a printer
+"""
+from .ipp_server import FakeCupsServer, BIN_DIR
+
+__all__ = ['FakeCupsServer', 'BIN_DIR']
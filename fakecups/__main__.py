@@ -0,0 +1,45 @@
+"""
+Run the simulated CUPS scheduler on its own
+
+    python -m fakecups --port 8631 --printer Canon_G3000_W --ppm 10 --fail-rate 0.05
+
+then start the app against it with the printed environment (PRINT_BACKEND=ipp
+for the IPP stub, or the PATH line for the fake lp/lpstat commands).
+"""
+import argparse
+import time
+
+from .ipp_server import FakeCupsServer
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m fakecups', description='Simulated CUPS scheduler')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8631)
+    parser.add_argument('--printer', action='append', help='printer name (repeatable)')
+    parser.add_argument('--ppm', type=float, help='pages per minute (default: --seconds-per-job per job)')
+    parser.add_argument('--seconds-per-job', type=float, default=5.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of submissions rejected')
+    parser.add_argument('--abort-rate', type=float, default=0.0, help='fraction of jobs aborted')
+    parser.add_argument('--history-size', type=int, help='finished jobs remembered (default: all)')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    printers = args.printer or ['Canon_G3000_W']
+    cups = FakeCupsServer(args.host, args.port, printers, seconds_per_job=args.seconds_per_job,
+                          ppm=args.ppm, fail_rate=args.fail_rate, abort_rate=args.abort_rate,
+                          history_size=args.history_size, seed=args.seed)
+    with cups:
+        env = cups.cli_env()
+        print(f"🖨️  Fake CUPS listening on {cups.host}:{cups.port} ({', '.join(printers)})")
+        print(f"   IPP backend: PRINT_BACKEND=ipp CUPS_HOST={cups.host} CUPS_PORT={cups.port}")
+        print(f"   lp backend:  FAKECUPS_SERVER={env['FAKECUPS_SERVER']} PATH={env['PATH'].split(':', 1)[0]}:$PATH")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("\n🛑 Fake CUPS stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Shared code of the fake lp, lpstat and cancel commands
+
+They forward to a running FakeCupsServer named by $FAKECUPS_SERVER
+(host:port) and print what the real commands would. Standard library only,
+so each call costs about as much as forking the real tool.
+"""
+import http.client
+import os
+import sys
+from urllib.parse import urlencode
+
+
+def _call(method, command, params, body=b''):
+    """(HTTP status, text) from the fake scheduler; exits like CUPS if it is down"""
+    host, _, port = os.environ.get('FAKECUPS_SERVER', '127.0.0.1:8631').rpartition(':')
+    try:
+        connection = http.client.HTTPConnection(host, int(port), timeout=30)
+        connection.request(method, f'/fake/{command}?{urlencode(params)}', body=body)
+        response = connection.getresponse()
+        return response.status, response.read().decode()
+    except OSError:
+        print(f'{os.path.basename(sys.argv[0])}: Scheduler is not running.', file=sys.stderr)
+        sys.exit(1)
+
+
+def _fail(tool, message):
+    print(f'{tool}: {message}', file=sys.stderr)
+    sys.exit(1)
+
+
+def lp(args):
+    """lp [-d printer] [-n copies] [-o option] [-t title] [-H hold] [-i job-id -H resume] [file]"""
+    params = {'user': os.environ.get('USER', 'anonymous')}
+    job_id = hold = None
+    files = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ('-d', '-n', '-o', '-t', '-H', '-i', '-q', '-P') and args:
+            value = args.pop(0)
+            if arg == '-d':
+                params['printer'] = value
+            elif arg == '-n':
+                params['copies'] = value
+            elif arg == '-t':
+                params['title'] = value
+            elif arg == '-H':
+                hold = value
+            elif arg == '-i':
+                job_id = value
+        elif arg.startswith('-') and arg != '-':
+            _fail('lp', f"Unknown option \"{arg}\".")
+        else:
+            files.append(arg)
+
+    if job_id is not None:
+        if hold != 'resume':
+            _fail('lp', 'Only -H resume is supported for existing jobs.')
+        status, text = _call('POST', 'release', {'job': job_id})
+        if status != 200:
+            _fail('lp', text)
+        return
+
+    if len(files) > 1:
+        _fail('lp', 'Only one file per job is supported.')
+    if files and files[0] != '-':
+        try:
+            with open(files[0], 'rb') as document:
+                body = document.read()
+        except OSError as e:
+            _fail('lp', f'Unable to access "{files[0]}" - {e.strerror}')
+        params.setdefault('title', os.path.basename(files[0]))
+    else:
+        body = sys.stdin.buffer.read()
+    if hold == 'hold':
+        params['hold'] = '1'
+
+    status, text = _call('POST', 'lp', params, body)
+    if status != 200:
+        _fail('lp', f'Error - {text}')
+    print(text)
+
+
+def lpstat(args):
+    """lpstat [-l] [-W completed|not-completed|all] -o [destination]"""
+    params = {}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == '-l':
+            params['long'] = '1'
+        elif arg == '-W' and args:
+            params['which'] = args.pop(0)
+        elif arg == '-o':
+            if args and not args[0].startswith('-'):
+                params['dest'] = args.pop(0)
+        else:
+            _fail('lpstat', f"Unknown option \"{arg}\".")
+    status, text = _call('GET', 'lpstat', params)
+    if status != 200:
+        _fail('lpstat', text)
+    sys.stdout.write(text)
+
+
+def cancel(args):
+    """cancel job-id [job-id ...]"""
+    for job_id in args:
+        status, text = _call('POST', 'cancel', {'job': job_id})
+        if status != 200:
+            _fail('cancel', text)
@@ -0,0 +1,535 @@
+"""
+In-process IPP scheduler stub
+
+Speaks enough IPP/1.1 over HTTP for utils/ipp_client.py: Print-Job,
+Cancel-Job, Release-Job, Get-Jobs, Get-Job-Attributes and ippget notify-pull
+subscriptions. Jobs on a printer run one after another, each taking
+`seconds_per_job`, so their state moves from pending through processing to
+completed the way a real queue does (held jobs wait for Release-Job first),
+and every state change is queued as an event for matching subscriptions.
+With `ppm` a job takes as long as its pages and copies would at that speed.
+
+Failures can be injected: `fail_rate` rejects that fraction of submissions
+(fail_next() rejects the next few), `abort_rate` aborts that fraction of
+jobs when they finish printing. `history_size` caps how many finished jobs
+are remembered, like CUPS's MaxJobs.
+
+The same queue also backs the fake lp, lpstat and cancel commands in
+fakecups/bin (see cli_env()), so the 'lp' print backend can run against it.
+
+    with FakeCupsServer(seconds_per_job=2) as cups:
+        client = IPPClient('127.0.0.1', cups.port)
+"""
+import os
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from utils.ipp_client import (
+    decode_message, encode_message,
+    PRINT_JOB, CANCEL_JOB, RELEASE_JOB, GET_JOB_ATTRIBUTES, GET_JOBS,
+    CREATE_PRINTER_SUBSCRIPTIONS, CREATE_JOB_SUBSCRIPTIONS,
+    RENEW_SUBSCRIPTION, CANCEL_SUBSCRIPTION, GET_NOTIFICATIONS,
+    OPERATION_ATTRIBUTES, JOB_ATTRIBUTES, SUBSCRIPTION_ATTRIBUTES, EVENT_NOTIFICATION_ATTRIBUTES,
+    TAG_CHARSET, TAG_LANGUAGE, TAG_INTEGER, TAG_ENUM, TAG_KEYWORD, TAG_NAME,
+    TAG_URI, TAG_TEXT, TAG_NO_VALUE,
+    STATUS_OK, STATUS_NOT_FOUND, STATUS_NOT_POSSIBLE, STATUS_BAD_REQUEST, STATUS_OPERATION_NOT_SUPPORTED,
+    STATUS_SERVICE_UNAVAILABLE,
+    JOB_PENDING, JOB_HELD, JOB_PROCESSING, JOB_CANCELED, JOB_ABORTED, JOB_COMPLETED,
+)
+
+_DONE_STATES = (7, 8, 9)  # canceled, aborted, completed
+_TICK_SECONDS = 0.02
+
+# Directory holding the fake lp, lpstat and cancel commands
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+
+# Page objects in a PDF ('/Type /Pages' is the page tree, not a page)
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+_STATE_REASONS = {
+    JOB_PENDING: 'none',
+    JOB_HELD: 'job-hold-until-specified',
+    JOB_PROCESSING: 'job-printing',
+    JOB_ABORTED: 'aborted-by-system',
+    JOB_COMPLETED: 'job-completed-successfully',
+}
+
+
+def count_pages(document):
+    """Pages the simulated printer will print (1 for anything but a PDF)"""
+    return max(1, len(_PDF_PAGE.findall(document)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like cupsd
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.fake._connections.add(self.connection)
+
+    def finish(self):
+        super().finish()
+        self.server.fake._connections.discard(self.connection)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.path.startswith('/fake/'):
+            return self._reply(*self.server.fake.handle_command(self.path, body))
+        self._reply(200, self.server.fake.handle(self.path, body), 'application/ipp')
+
+    def do_GET(self):
+        if self.path.startswith('/fake/'):
+            return self._reply(*self.server.fake.handle_command(self.path, b''))
+        self._reply(404, b'Not found')
+
+    def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCupsServer:
+    """Threaded IPP server with a simulated job queue per printer"""
+
+    def __init__(self, host='127.0.0.1', port=0, printers=('Canon_G3000_W',), seconds_per_job=0.0,
+                 notify_wait=10.0, ppm=None, fail_rate=0.0, abort_rate=0.0, history_size=None, seed=None):
+        self.printers = set(printers)
+        self.default_printer = list(printers)[0]  # what lp uses without -d
+        self.seconds_per_job = seconds_per_job
+        self.ppm = ppm  # pages per minute; overrides seconds_per_job
+        self.notify_wait = notify_wait  # how long Get-Notifications with notify-wait blocks
+        self.fail_rate = fail_rate
+        self.abort_rate = abort_rate
+        self.history_size = history_size
+        self.rejected = 0
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self.jobs = {}
+        self.subscriptions = {}
+        self.requests = 0
+        self._next_job_id = 1
+        self._next_subscription_id = 1
+        self._queue_free_at = {}
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+        self._running = False
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+        self._ticker = None
+        self._connections = set()
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self._ticker = threading.Thread(target=self._tick, daemon=True)
+        self._ticker.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._lock:
+            self._events_changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        # Drop keep-alive connections too, as a cupsd restart would
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def fail_next(self, count=1):
+        """Reject the next `count` submissions as if the printer were unreachable"""
+        with self._lock:
+            self._fail_next += count
+
+    def expire_subscriptions(self):
+        """Drop every subscription, as when their leases run out or cupsd restarts"""
+        with self._lock:
+            self.subscriptions.clear()
+            self._events_changed.notify_all()
+
+    def cli_env(self):
+        """Environment for subprocesses: fake lp/lpstat/cancel first on PATH, aimed here"""
+        return {
+            'PATH': f"{BIN_DIR}{os.pathsep}{os.environ.get('PATH', '')}",
+            'FAKECUPS_SERVER': f'{self.host}:{self.port}',
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- job model ----------
+
+    def _job_state(self, job, now):
+        if job.get('final_state'):
+            return job['final_state']
+        if job.get('held'):
+            return JOB_HELD
+        if now < job['start']:
+            return JOB_PENDING
+        if now < job['end']:
+            return JOB_PROCESSING
+        return JOB_ABORTED if job['aborts'] else JOB_COMPLETED
+
+    def _job_reason(self, job, state):
+        return job.get('reason') or _STATE_REASONS.get(state, 'none')
+
+    def _job_attributes(self, job, now):
+        state = self._job_state(job, now)
+        completed_at = int(job.get('finished_at') or job['end']) if state in _DONE_STATES else None
+        reasons = self._job_reason(job, state)
+        return [
+            ('job-id', TAG_INTEGER, job['id']),
+            ('job-uri', TAG_URI, f"ipp://{self.host}:{self.port}/jobs/{job['id']}"),
+            ('job-printer-uri', TAG_URI, f"ipp://{self.host}:{self.port}/printers/{job['printer']}"),
+            ('job-name', TAG_NAME, job['name']),
+            ('job-originating-user-name', TAG_NAME, job['user']),
+            ('job-k-octets', TAG_INTEGER, (job['size'] + 1023) // 1024),
+            ('job-impressions', TAG_INTEGER, job['pages'] * job['copies']),
+            ('job-state', TAG_ENUM, state),
+            ('job-state-reasons', TAG_KEYWORD, [reasons]),
+            ('time-at-creation', TAG_INTEGER, int(job['created'])),
+            ('time-at-processing', TAG_INTEGER, int(job['start'])) if job['start'] is not None and now >= job['start']
+            else ('time-at-processing', TAG_NO_VALUE, None),
+            ('time-at-completed', TAG_INTEGER, completed_at) if completed_at
+            else ('time-at-completed', TAG_NO_VALUE, None),
+        ]
+
+    # ---------- events ----------
+
+    def _tick(self):
+        """Turn time-driven job state changes into subscription events"""
+        while self._running:
+            now = time.time()
+            with self._lock:
+                for job in self.jobs.values():
+                    state = self._job_state(job, now)
+                    if state != job.get('last_state'):
+                        job['last_state'] = state
+                        self._queue_event(job, now, 'job-completed' if state in _DONE_STATES else 'job-state-changed')
+                if self.history_size is not None:
+                    self._trim_history(now)
+            time.sleep(_TICK_SECONDS)
+
+    def _trim_history(self, now):
+        """Forget the oldest finished jobs beyond history_size (lock held)"""
+        finished = [job_id for job_id, job in self.jobs.items() if self._job_state(job, now) in _DONE_STATES]
+        for job_id in sorted(finished)[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job_id]
+
+    def _queue_event(self, job, now, event):
+        """Append an event to every subscription covering job (lock held)"""
+        queued = False
+        for subscription in self.subscriptions.values():
+            if subscription['printer'] != job['printer'] or event not in subscription['events']:
+                continue
+            if subscription['job_id'] not in (None, job['id']):
+                continue
+            subscription['queue'].append((subscription['next_sequence'], event, self._job_attributes(job, now)))
+            subscription['next_sequence'] += 1
+            queued = True
+        if queued:
+            self._events_changed.notify_all()
+
+    # ---------- request handling ----------
+
+    def handle(self, path, body):
+        """Answer one IPP request (called from the HTTP handler threads)"""
+        try:
+            _, operation, request_id, groups, document = decode_message(body)
+        except ValueError:
+            return self._response(STATUS_BAD_REQUEST, 0, 'Malformed request')
+
+        operation_attributes = {}
+        job_attributes = {}
+        for tag, group in groups:
+            if tag == OPERATION_ATTRIBUTES:
+                operation_attributes.update(group)
+            elif tag in (JOB_ATTRIBUTES, SUBSCRIPTION_ATTRIBUTES):
+                job_attributes.update(group)
+
+        printer = path.rsplit('/', 1)[-1]
+        handler = {
+            PRINT_JOB: self._print_job,
+            CANCEL_JOB: self._cancel_job,
+            RELEASE_JOB: self._release_job,
+            GET_JOB_ATTRIBUTES: self._get_job_attributes,
+            GET_JOBS: self._get_jobs,
+            CREATE_PRINTER_SUBSCRIPTIONS: self._create_subscription,
+            CREATE_JOB_SUBSCRIPTIONS: self._create_subscription,
+            RENEW_SUBSCRIPTION: self._renew_subscription,
+            CANCEL_SUBSCRIPTION: self._cancel_subscription,
+            GET_NOTIFICATIONS: self._get_notifications,
+        }.get(operation)
+        with self._lock:
+            self.requests += 1
+            if handler is None:
+                return self._response(STATUS_OPERATION_NOT_SUPPORTED, request_id, 'Operation not supported')
+            if printer not in self.printers:
+                return self._response(STATUS_NOT_FOUND, request_id, 'Printer not found')
+            return handler(request_id, printer, operation_attributes, job_attributes, document)
+
+    def _response(self, status, request_id, message='', job_groups=(), groups=(), operation_extra=()):
+        operation = [
+            ('attributes-charset', TAG_CHARSET, 'utf-8'),
+            ('attributes-natural-language', TAG_LANGUAGE, 'en'),
+            *operation_extra,
+        ]
+        if message:
+            operation.append(('status-message', TAG_TEXT, message))
+        return encode_message(status, request_id, [(OPERATION_ATTRIBUTES, operation),
+                                                   *[(JOB_ATTRIBUTES, group) for group in job_groups],
+                                                   *groups])
+
+    def _schedule(self, job, now):
+        """Queue a job behind whatever the printer is already doing"""
+        if self.ppm:
+            duration = job['pages'] * job['copies'] * 60.0 / self.ppm
+        else:
+            duration = self.seconds_per_job
+        job['start'] = max(now, self._queue_free_at.get(job['printer'], 0))
+        job['end'] = job['start'] + duration
+        self._queue_free_at[job['printer']] = job['end']
+
+    def _submit(self, printer, name, user, copies, document, held):
+        """Create a job (lock held); None when a failure is injected"""
+        if self._fail_next:
+            self._fail_next -= 1
+            self.rejected += 1
+            return None
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            self.rejected += 1
+            return None
+        now = time.time()
+        job = {
+            'id': self._next_job_id,
+            'printer': printer,
+            'name': name,
+            'user': user,
+            'copies': copies,
+            'size': len(document),
+            'pages': count_pages(document),
+            'created': now,
+            'held': held,
+            'aborts': bool(self.abort_rate) and self._random.random() < self.abort_rate,
+            'start': None,
+            'end': None,
+        }
+        self._next_job_id += 1
+        if not job['held']:
+            self._schedule(job, now)
+        self.jobs[job['id']] = job
+        return job
+
+    def _print_job(self, request_id, printer, operation, attributes, document):
+        job = self._submit(printer,
+                           (operation.get('job-name') or ['untitled'])[0],
+                           (operation.get('requesting-user-name') or ['anonymous'])[0],
+                           (attributes.get('copies') or [1])[0],
+                           document,
+                           (attributes.get('job-hold-until') or ['no-hold'])[0] != 'no-hold')
+        if job is None:
+            return self._response(STATUS_SERVICE_UNAVAILABLE, request_id, 'Printer is not responding')
+        return self._response(STATUS_OK, request_id, job_groups=[self._job_attributes(job, time.time())])
+
+    def _job_for(self, printer, operation):
+        job = self.jobs.get((operation.get('job-id') or [None])[0])
+        return job if job is not None and job['printer'] == printer else None
+
+    def _release(self, job):
+        """Start a held job; returns an error message if it is not held"""
+        if self._job_state(job, time.time()) != JOB_HELD:
+            return 'Job is not held'
+        job['held'] = False
+        self._schedule(job, time.time())
+        return None
+
+    def _cancel(self, job):
+        """Cancel an unfinished job; returns an error message if it already finished"""
+        now = time.time()
+        if self._job_state(job, now) in _DONE_STATES:
+            return 'Job is already finished'
+        job.update(final_state=JOB_CANCELED, finished_at=now, reason='job-canceled-by-user')
+        return None
+
+    def _release_job(self, request_id, printer, operation, attributes, document):
+        job = self._job_for(printer, operation)
+        if job is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Job not found')
+        error = self._release(job)
+        return self._response(STATUS_NOT_POSSIBLE if error else STATUS_OK, request_id, error or '')
+
+    def _cancel_job(self, request_id, printer, operation, attributes, document):
+        job = self._job_for(printer, operation)
+        if job is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Job not found')
+        error = self._cancel(job)
+        return self._response(STATUS_NOT_POSSIBLE if error else STATUS_OK, request_id, error or '')
+
+    def _get_job_attributes(self, request_id, printer, operation, attributes, document):
+        job = self._job_for(printer, operation)
+        if job is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Job not found')
+        return self._response(STATUS_OK, request_id, job_groups=[self._job_attributes(job, time.time())])
+
+    def _get_jobs(self, request_id, printer, operation, attributes, document):
+        now = time.time()
+        completed = (operation.get('which-jobs') or ['not-completed'])[0] == 'completed'
+        limit = (operation.get('limit') or [0])[0]
+        groups = []
+        # Newest first, like cupsd
+        for job in sorted(self.jobs.values(), key=lambda job: job['id'], reverse=True):
+            if job['printer'] != printer:
+                continue
+            if (self._job_state(job, now) in _DONE_STATES) != completed:
+                continue
+            groups.append(self._job_attributes(job, now))
+            if limit and len(groups) >= limit:
+                break
+        return self._response(STATUS_OK, request_id, job_groups=groups)
+
+    def _create_subscription(self, request_id, printer, operation, attributes, document):
+        if (attributes.get('notify-pull-method') or [None])[0] != 'ippget':
+            return self._response(STATUS_BAD_REQUEST, request_id, 'Only ippget is supported')
+        job_id = (attributes.get('notify-job-id') or [None])[0]
+        if job_id is not None and self.jobs.get(job_id, {}).get('printer') != printer:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Job not found')
+        subscription = {
+            'id': self._next_subscription_id,
+            'printer': printer,
+            'job_id': job_id,
+            'events': set(attributes.get('notify-events') or ['job-completed']),
+            'lease': (attributes.get('notify-lease-duration') or [0])[0],
+            'queue': [],
+            'next_sequence': 1,
+        }
+        self._next_subscription_id += 1
+        self.subscriptions[subscription['id']] = subscription
+        return self._response(STATUS_OK, request_id, groups=[(SUBSCRIPTION_ATTRIBUTES, [
+            ('notify-subscription-id', TAG_INTEGER, subscription['id']),
+            ('notify-lease-duration', TAG_INTEGER, subscription['lease']),
+        ])])
+
+    def _subscription(self, operation, name='notify-subscription-id'):
+        return self.subscriptions.get((operation.get(name) or [None])[0])
+
+    def _renew_subscription(self, request_id, printer, operation, attributes, document):
+        subscription = self._subscription(operation)
+        if subscription is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Subscription not found')
+        subscription['lease'] = (attributes.get('notify-lease-duration') or [subscription['lease']])[0]
+        return self._response(STATUS_OK, request_id)
+
+    def _cancel_subscription(self, request_id, printer, operation, attributes, document):
+        subscription = self._subscription(operation)
+        if subscription is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Subscription not found')
+        del self.subscriptions[subscription['id']]
+        return self._response(STATUS_OK, request_id)
+
+    def _get_notifications(self, request_id, printer, operation, attributes, document):
+        subscription = self._subscription(operation, 'notify-subscription-ids')
+        if subscription is None:
+            return self._response(STATUS_NOT_FOUND, request_id, 'Subscription not found')
+        sequence = (operation.get('notify-sequence-numbers') or [1])[0]
+        # Events below the requested sequence number have been seen; drop them
+        subscription['queue'] = [entry for entry in subscription['queue'] if entry[0] >= sequence]
+
+        if not subscription['queue'] and (operation.get('notify-wait') or [False])[0]:
+            # Long poll: the lock is released while waiting for _tick()
+            deadline = time.time() + self.notify_wait
+            while (self._running and not subscription['queue']
+                   and subscription['id'] in self.subscriptions and time.time() < deadline):
+                self._events_changed.wait(deadline - time.time())
+
+        groups = []
+        for number, event, job_attributes in subscription['queue']:
+            groups.append((EVENT_NOTIFICATION_ATTRIBUTES, [
+                ('notify-subscription-id', TAG_INTEGER, subscription['id']),
+                ('notify-sequence-number', TAG_INTEGER, number),
+                ('notify-subscribed-event', TAG_KEYWORD, event),
+                ('notify-printer-uri', TAG_URI, f"ipp://{self.host}:{self.port}/printers/{printer}"),
+                *job_attributes,
+            ]))
+        return self._response(STATUS_OK, request_id, groups=groups,
+                              operation_extra=[('notify-get-interval', TAG_INTEGER, 5)])
+
+    # ---------- lp / lpstat / cancel (fakecups/bin) ----------
+
+    def handle_command(self, path, body):
+        """Answer a request from the fake command-line tools; returns (HTTP status, text)"""
+        url = urlsplit(path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        command = url.path[len('/fake/'):]
+        with self._lock:
+            self.requests += 1
+            if command == 'lpstat':
+                return 200, self.lpstat(query.get('which', 'not-completed'), query.get('long') == '1',
+                                        query.get('dest'))
+            if command == 'lp':
+                printer = query.get('printer') or self.default_printer
+                if printer not in self.printers:
+                    return 404, 'The printer or class does not exist.'
+                job = self._submit(printer, query.get('title') or 'untitled', query.get('user') or 'anonymous',
+                                   int(query.get('copies', 1)), body, query.get('hold') == '1')
+                if job is None:
+                    return 503, 'Printer is not responding'
+                return 200, f"request id is {printer}-{job['id']} (1 file(s))"
+            if command in ('release', 'cancel'):
+                printer, _, number = query.get('job', '').rpartition('-')
+                job = self.jobs.get(int(number)) if number.isdigit() else None
+                if job is None or job['printer'] != printer:
+                    return 404, f"{query.get('job')} is not a valid job ID"
+                error = self._release(job) if command == 'release' else self._cancel(job)
+                return (409, error) if error else (200, '')
+        return 404, 'Unknown command'
+
+    def lpstat(self, which='not-completed', long=False, dest=None):
+        """Job listing in the format of `lpstat [-W which] [-l] -o [dest]` (lock held)"""
+        now = time.time()
+        lines = []
+        for job in sorted(self.jobs.values(), key=lambda job: job['id']):
+            state = self._job_state(job, now)
+            if which != 'all' and (state in _DONE_STATES) != (which == 'completed'):
+                continue
+            job_id = f"{job['printer']}-{job['id']}"
+            if dest and dest not in (job_id, job['printer']):
+                continue
+            submitted = time.strftime('%a %d %b %Y %I:%M:%S %p %Z', time.localtime(job['created']))
+            lines.append(f"{job_id:<23} {job['user']:<12} {job['size']:>9}   {submitted}")
+            if long:
+                if state == JOB_PROCESSING:
+                    progress = (now - job['start']) / (job['end'] - job['start'])
+                    lines.append(f"\tStatus: Printing page {int(job['pages'] * job['copies'] * progress) + 1}")
+                lines.append(f"\tAlerts: {self._job_reason(job, state)}")
+                lines.append(f"\tqueued for {job['printer']}")
+        return ''.join(line + '\n' for line in lines)
@@ -1,20 +1,80 @@
 """
 Models module initialization
 """
+from .connection import db_connection, get_pool, close_all_pools
+from .job import Job
+from .job_repository import JobRepository
+from .print_queue import PrintQueue
+from .blob_store import BlobStore
 from .database import (
     init_db,
     save_job,
     get_job,
+    get_jobs,
+    get_analyzing_uploads,
+    delete_job,
+    count_blob_jobs,
+    update_job,
+    update_jobs,
+    job_batch,
     update_job_status,
     update_job_settings,
-    update_job_print_id
+    update_job_cost,
+    update_job_print_id,
+    mark_jobs_submitted,
+    mark_job_approved,
+    mark_job_rejected,
+    mark_job_reprinted,
+    mark_job_refunded,
+    queue_print_jobs,
+    get_print_queue,
+    acquire_upload_blob,
+    add_upload_blob,
+    release_upload_blob,
+    get_printer_loads,
+    get_job_cache_stats,
+    get_db_statement_stats,
+    invalidate_job_cache,
+    get_dashboard_stats,
+    list_jobs
 )
 
 __all__ = [
+    'db_connection',
+    'get_pool',
+    'close_all_pools',
+    'Job',
+    'JobRepository',
+    'PrintQueue',
+    'BlobStore',
     'init_db',
     'save_job',
     'get_job',
+    'get_jobs',
+    'get_analyzing_uploads',
+    'delete_job',
+    'count_blob_jobs',
+    'update_job',
+    'update_jobs',
+    'job_batch',
     'update_job_status',
     'update_job_settings',
-    'update_job_print_id'
+    'update_job_cost',
+    'update_job_print_id',
+    'mark_jobs_submitted',
+    'mark_job_approved',
+    'mark_job_rejected',
+    'mark_job_reprinted',
+    'mark_job_refunded',
+    'queue_print_jobs',
+    'get_print_queue',
+    'acquire_upload_blob',
+    'add_upload_blob',
+    'release_upload_blob',
+    'get_printer_loads',
+    'get_job_cache_stats',
+    'get_db_statement_stats',
+    'invalidate_job_cache',
+    'get_dashboard_stats',
+    'list_jobs'
 ]
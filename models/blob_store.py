@@ -0,0 +1,76 @@
+"""
+Blob store - uploaded files kept once per distinct content
+
+Each row is one file in the upload folder, named by the SHA-256 of its
+bytes, with the page count worked out when it was first stored. refcount is
+the number of jobs pointing at it: an upload takes a reference (acquire() or
+add()) and a trigger drops it when the job row is deleted. Files whose count
+reached zero are removed by cleanup_old_files.py.
+"""
+import time
+from .connection import db_connection
+
+
+class BlobStore:
+    """Reference-counted registry of the files in the upload folder"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+
+    def acquire(self, sha256):
+        """Take a reference to a stored blob; returns its row, or None if unknown"""
+        with db_connection(self.db_path) as con:
+            # The write lock keeps remove() from deleting it in between
+            con.execute('BEGIN IMMEDIATE')
+            row = con.execute('SELECT sha256, path, size, kind, pages FROM blobs WHERE sha256 = ?',
+                              (sha256,)).fetchone()
+            if row is None:
+                return None
+            con.execute('UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?', (sha256,))
+            return dict(row)
+
+    def add(self, sha256, path, size, kind, pages):
+        """Register a newly stored blob holding one reference
+
+        Two uploads of the same new file may both get here; the second one
+        just takes another reference (both wrote the same bytes to the same
+        content-named path).
+        """
+        with db_connection(self.db_path) as con:
+            con.execute('''INSERT INTO blobs (sha256, path, size, kind, pages, refcount, created_ts)
+                           VALUES (?, ?, ?, ?, ?, 1, ?)
+                           ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1''',
+                        (sha256, path, size, kind, pages, time.time()))
+
+    def release(self, sha256):
+        """Drop a reference taken by an upload that never became a job"""
+        with db_connection(self.db_path) as con:
+            con.execute('UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?', (sha256,))
+
+    def unreferenced(self):
+        """(sha256, path, size) of every blob no job points at any more"""
+        with db_connection(self.db_path) as con:
+            return [tuple(row) for row in con.execute(
+                'SELECT sha256, path, size FROM blobs WHERE refcount <= 0 ORDER BY created_ts')]
+
+    def remove(self, sha256, delete_file):
+        """Forget an unreferenced blob, calling delete_file(path) for its file
+
+        Returns False (and deletes nothing) if an upload took the blob again
+        since unreferenced() listed it.
+        """
+        with db_connection(self.db_path) as con:
+            con.execute('BEGIN IMMEDIATE')
+            row = con.execute('SELECT path FROM blobs WHERE sha256 = ? AND refcount <= 0',
+                              (sha256,)).fetchone()
+            if row is None:
+                return False
+            # Deleted while holding the lock, so acquire() cannot hand it out
+            delete_file(row['path'])
+            con.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+            return True
+
+    def paths(self):
+        """Path of every registered blob (cleanup never treats these as orphans)"""
+        with db_connection(self.db_path) as con:
+            return [row[0] for row in con.execute('SELECT path FROM blobs')]
@@ -0,0 +1,128 @@
+"""
+Pooled SQLite connections
+
+Opening a connection on the Pi's SD card costs a file open, a schema read and
+lock setup. Connections are opened once, configured in one place and reused.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from config import Config
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections for a single database file"""
+
+    def __init__(self, db_path, size=None):
+        self.db_path = Path(db_path)
+        self.size = size or Config.DB_POOL_SIZE
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open a new connection and apply the shared PRAGMA settings"""
+        con = sqlite3.connect(
+            self.db_path,
+            timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # Connections move between request threads
+            cached_statements=256
+        )
+        con.row_factory = sqlite3.Row
+        con.execute(f'PRAGMA journal_mode = {Config.DB_JOURNAL_MODE}')
+        con.execute(f'PRAGMA synchronous = {Config.DB_SYNCHRONOUS}')
+        con.execute(f'PRAGMA cache_size = -{Config.DB_CACHE_SIZE_KB}')
+        con.execute(f'PRAGMA mmap_size = {Config.DB_MMAP_SIZE}')
+        con.execute(f'PRAGMA busy_timeout = {Config.DB_BUSY_TIMEOUT_MS}')
+        con.execute('PRAGMA temp_store = MEMORY')
+        return con
+
+    def acquire(self):
+        """Take an idle connection, opening a new one while under the pool size"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool exhausted - wait for another thread to hand one back
+        return self._idle.get()
+
+    def release(self, con):
+        """Return a connection to the pool"""
+        if con.in_transaction:
+            con.rollback()
+        self._idle.put_nowait(con)
+
+    def close(self):
+        """Close every idle connection (used on shutdown and in benchmarks)"""
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None):
+    """Get (or lazily create) the pool for a database file"""
+    key = str(Path(db_path or Config.DB_PATH).absolute())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key)
+                _pools[key] = pool
+    return pool
+
+
+@contextmanager
+def db_connection(db_path=None):
+    """Borrow a pooled connection
+
+    Commits when the block finishes cleanly and rolls back if it raises, so
+    every block is exactly one transaction.
+    """
+    pool = get_pool(db_path)
+    con = pool.acquire()
+    try:
+        yield con
+        if con.in_transaction:
+            con.commit()
+    except Exception:
+        if con.in_transaction:
+            con.rollback()
+        raise
+    finally:
+        pool.release(con)
+
+
+def close_all_pools():
+    """Close all pooled connections"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
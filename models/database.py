@@ -1,153 +1,216 @@
 """
 Database initialization and helper functions
 """
-import sqlite3
-from pathlib import Path
-from flask import url_for, has_request_context
-from config import Config
+from .blob_store import BlobStore
+from .connection import db_connection
+from .job import Job
+from .job_repository import JobRepository, JOB_LIST_FILTERS, local_day_bounds
+from .migrations import run_migrations
+from .print_queue import PrintQueue
+
+# Shared repository for the app; every helper below goes through it
+jobs = JobRepository()
+print_queue = PrintQueue()
+blobs = BlobStore()
 
 
 def init_db():
-    """Initialize the database with the jobs table"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id TEXT PRIMARY KEY,
-            filename TEXT,
-            stored_path TEXT,
-            pages INTEGER,
-            cost REAL,
-            status TEXT,
-            copies INTEGER DEFAULT 1,
-            orientation TEXT DEFAULT 'portrait',
-            print_color TEXT DEFAULT 'bw',
-            payment_screenshot TEXT,
-            submitted_at TEXT,
-            approved_at TEXT,
-            approved_by TEXT,
-            print_job_id TEXT,
-            refunded_at TEXT,
-            refunded_by TEXT
-        )
-    ''')
-    con.commit()
-    con.close()
-
-
-def save_job(job_id, filename, stored_path, pages, cost, status='pending', copies=1, orientation='portrait', print_color='bw'):
-    """Save a new job to the database"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('''INSERT INTO jobs 
-                   (id, filename, stored_path, pages, cost, status, copies, orientation, print_color) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                (job_id, filename, stored_path, pages, cost, status, copies, orientation, print_color))
-    con.commit()
-    con.close()
+    """Initialize the database and bring its schema up to date"""
+    with db_connection() as con:
+        run_migrations(con)
 
 
-def get_job(job_id):
-    """Get a job by ID"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    
-    # Check if print_job_id, payment_screenshot, and print_color columns exist
-    cur.execute("PRAGMA table_info(jobs)")
-    columns = [col[1] for col in cur.fetchall()]
-    
-    # Build SELECT query based on available columns
-    base_fields = 'id, filename, stored_path, pages, cost, status, copies, orientation'
-    has_print_job_id = 'print_job_id' in columns
-    has_payment_screenshot = 'payment_screenshot' in columns
-    has_print_color = 'print_color' in columns
+def get_dashboard_stats():
+    """Get the admin dashboard counters in a single statement"""
+    row = jobs.dashboard_stats(local_day_bounds())
     
-    # Build the query dynamically
-    select_fields = base_fields
-    if has_print_job_id:
-        select_fields += ', print_job_id'
-    if has_payment_screenshot:
-        select_fields += ', payment_screenshot'
-    if has_print_color:
-        select_fields += ', print_color'
-    
-    cur.execute(f'''SELECT {select_fields} FROM jobs WHERE id = ?''', (job_id,))
-    row = cur.fetchone()
-    
-    con.close()
-    if not row:
-        return None
-    
-    # Parse row based on what columns exist
-    base_idx = 8
-    print_job_id = None
-    payment_screenshot = None
-    print_color = 'bw'  # default
+    return {
+        'pending': row[0],
+        'printing': row[1],
+        'completed': row[2],
+        'today': row[3],
+        'revenue': int(row[4])
+    }
+
+
+def encode_job_cursor(sort_value, job_id):
+    """Build an opaque keyset cursor from the last row of a page"""
+    return f'{sort_value}:{job_id}'
+
+
+def decode_job_cursor(cursor):
+    """Split a cursor into (sort value, job id); raises ValueError if malformed"""
+    sort_value, _, job_id = cursor.partition(':')
+    if not job_id:
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+    return int(sort_value), job_id
+
+
+def list_jobs(status_filter='all', cursor=None, limit=25):
+    """Get one page of jobs for a dashboard filter, newest first
+
+    Pages are keyset-paginated on (sort column, id): each page is an index seek
+    past the cursor, so page 100 costs the same as page 1. Returns
+    (jobs, next_cursor); next_cursor is None on the last page.
+    """
+    _, sort_column = JOB_LIST_FILTERS.get(status_filter, JOB_LIST_FILTERS['all'])
+    after = decode_job_cursor(cursor) if cursor else None
     
-    if has_print_job_id:
-        print_job_id = row[base_idx] if len(row) > base_idx else None
-        base_idx += 1
-    if has_payment_screenshot:
-        payment_screenshot = row[base_idx] if len(row) > base_idx else None
-        base_idx += 1
-    if has_print_color:
-        print_color = row[base_idx] if len(row) > base_idx else 'bw'
+    # Fetch one extra row to know whether another page exists
+    rows = jobs.list_page(status_filter, after, limit + 1)
     
-    # Generate preview_url from stored_path (only if within request context)
-    filename = Path(row[2]).name if row[2] else None
-    preview_url = None
-    if filename and has_request_context():
-        try:
-            preview_url = url_for('user.serve_upload', filename=filename)
-        except Exception:
-            # If url_for fails (e.g., no application context), use relative path
-            preview_url = f'/uploads/{filename}'
+    page = [Job(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_job_cursor(last[sort_column], last['id'])
+    return page, next_cursor
+
+
+def save_job(job_id, filename, stored_path, pages, cost, status='pending', copies=1, orientation='portrait', print_color='bw',
+             blob_sha256=None):
+    """Save a new job to the database (blob_sha256: the upload blob it holds a reference to)"""
+    jobs.insert(job_id, filename, stored_path, pages, cost, status, copies, orientation, print_color, blob_sha256)
+
+
+def get_job(job_id):
+    """Get a job by ID (served from the in-process cache when possible)"""
+    row = jobs.get(job_id)
+    return Job(row) if row else None
+
+
+def get_jobs(job_ids):
+    """Get several jobs, fetching every uncached one in a single query per 500 IDs
+
+    Returns the jobs in the order the IDs were given, skipping IDs that do not
+    exist.
+    """
+    job_ids = list(job_ids)
+    if not job_ids:
+        return []
     
-    return dict(
-        id=row[0], 
-        filename=row[1], 
-        stored_path=row[2], 
-        pages=row[3], 
-        cost=row[4], 
-        status=row[5],
-        copies=row[6] or 1,
-        orientation=row[7] or 'portrait',
-        print_color=print_color,
-        print_job_id=print_job_id,
-        payment_screenshot=payment_screenshot,
-        preview_url=preview_url,
-        file_number=1
-    )
+    rows_by_id = jobs.get_many(job_ids)
+    return [Job(rows_by_id[job_id]) for job_id in job_ids if job_id in rows_by_id]
+
+
+def get_job_cache_stats():
+    """Hit/miss counters of the job cache"""
+    return jobs.cache.stats()
+
+
+def get_printer_loads():
+    """{printer: (jobs, pages)} currently printing, from the jobs table"""
+    return jobs.printer_loads()
+
+
+def get_db_statement_stats():
+    """Per-statement call counts and timings of the job repository"""
+    return jobs.statement_stats()
+
+
+def invalidate_job_cache(*job_ids):
+    """Drop cached jobs; with no IDs, drop everything"""
+    if job_ids:
+        jobs.cache.invalidate(*job_ids)
+    else:
+        jobs.cache.clear()
+
+
+def get_analyzing_uploads():
+    """(id, stored_path, blob_sha256) of uploads the analysis pool has not finished"""
+    return jobs.analyzing_uploads()
+
+
+def count_blob_jobs(sha256):
+    """Jobs holding the upload blob with this content hash (analyzed or not)"""
+    return jobs.blob_job_count(sha256)
+
+
+def delete_job(job_id):
+    """Delete a job row (an upload that failed analysis)"""
+    jobs.delete(job_id)
+
+
+def update_job(job_id, **fields):
+    """Write several job columns at once in a single UPDATE"""
+    jobs.update(job_id, **fields)
+
+
+def update_jobs(updates):
+    """Write [(job_id, {column: value}), ...] in one transaction (group commit)"""
+    jobs.update_many(updates)
+
+
+def job_batch():
+    """Context manager collecting job updates into a single commit"""
+    return jobs.batch()
 
 
 def update_job_status(job_id, status):
     """Update job status"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('UPDATE jobs SET status = ? WHERE id = ?', (status, job_id))
-    con.commit()
-    con.close()
+    jobs.set_status(job_id, status)
 
 
 def update_job_settings(job_id, copies, orientation, print_color='bw'):
     """Update job copies, orientation, and color settings"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('UPDATE jobs SET copies = ?, orientation = ?, print_color = ? WHERE id = ?', 
-               (copies, orientation, print_color, job_id))
-    con.commit()
-    con.close()
+    jobs.update(job_id, copies=copies, orientation=orientation, print_color=print_color)
+
+
+def update_job_cost(job_id, cost):
+    """Update the total cost of a job"""
+    jobs.update(job_id, cost=cost)
 
 
 def update_job_print_id(job_id, print_job_id):
     """Store the CUPS print job ID for status tracking"""
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    # Check if column exists, if not add it
-    cur.execute("PRAGMA table_info(jobs)")
-    columns = [col[1] for col in cur.fetchall()]
-    if 'print_job_id' not in columns:
-        cur.execute('ALTER TABLE jobs ADD COLUMN print_job_id TEXT')
-    cur.execute('UPDATE jobs SET print_job_id = ? WHERE id = ?', (print_job_id, job_id))
-    con.commit()
-    con.close()
+    jobs.update(job_id, print_job_id=print_job_id)
+
+
+def mark_jobs_submitted(job_ids, payment_screenshot, submitted_at):
+    """Attach the payment screenshot and move jobs to pending_approval"""
+    jobs.submit_payment(job_ids, payment_screenshot, submitted_at)
+
+
+def mark_job_approved(job_id, status, approved_by, approved_at, print_job_id=None, printer=None):
+    """Record an approval, the resulting status ('printing' or 'error'), the CUPS job ID and printer"""
+    jobs.approve(job_id, status, approved_by, approved_at, print_job_id, printer)
+
+
+def mark_job_rejected(job_id, rejected_by):
+    """Mark a job as rejected"""
+    jobs.reject(job_id, rejected_by)
+
+
+def mark_job_reprinted(job_id, approved_at, print_job_id=None, printer=None):
+    """Put a resent job back into printing"""
+    jobs.reprint(job_id, approved_at, print_job_id, printer)
+
+
+def mark_job_refunded(job_id, refunded_by, refunded_at):
+    """Mark a job as refunded"""
+    jobs.refund(job_id, refunded_by, refunded_at)
+
+
+def queue_print_jobs(job_ids, action='print'):
+    """Add jobs to the persistent print queue ('print' or 'reprint')"""
+    print_queue.enqueue(job_ids, action)
+
+
+def get_print_queue():
+    """Jobs waiting to be sent to CUPS, with their retry state"""
+    return print_queue.pending()
+
+
+def acquire_upload_blob(sha256):
+    """Reference an already stored upload by content hash; its row, or None"""
+    return blobs.acquire(sha256)
+
+
+def add_upload_blob(sha256, path, size, kind, pages):
+    """Register a newly stored upload, holding one reference"""
+    blobs.add(sha256, path, size, kind, pages)
+
+
+def release_upload_blob(sha256):
+    """Give back a reference that did not end up in a job"""
+    blobs.release(sha256)
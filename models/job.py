@@ -0,0 +1,151 @@
+"""
+Job record returned by the database helpers
+
+Jobs used to be plain dicts rebuilt on every lookup. A slotted record has no
+per-instance __dict__ and derives preview_url / thumbnail_url / time_ago only
+when a template actually reads them. Dict-style access (job['id'],
+job.get(...)) still works.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from flask import url_for, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+# Column order of JOB_COLUMNS in models/job_repository.py
+JOB_FIELDS = (
+    'id', 'filename', 'stored_path', 'pages', 'cost', 'status', 'copies',
+    'orientation', 'print_color', 'print_job_id', 'payment_screenshot',
+    'submitted_at', 'submitted_ts', 'approved_at', 'approved_ts', 'approved_by',
+    'refunded_at', 'refunded_by', 'printer'
+)
+
+# Derived keys readable through job['...'] as well
+_DERIVED_FIELDS = ('preview_url', 'thumbnail_url', 'time_ago')
+
+_UNSET = object()
+
+
+def preview_image_path(stored_path):
+    """Where the first-page preview of an upload is rendered ('<sha256>.preview.png')"""
+    return str(Path(stored_path).with_suffix('.preview.png'))
+
+
+def get_time_ago(timestamp_str):
+    """Convert timestamp to human-readable 'time ago' format"""
+    if not timestamp_str:
+        return "Just now"
+
+    try:
+        timestamp = datetime.fromisoformat(timestamp_str)
+        now = datetime.now()
+        diff = now - timestamp
+
+        seconds = diff.total_seconds()
+        if seconds < 60:
+            return f"{int(seconds)} seconds ago"
+        elif seconds < 3600:
+            return f"{int(seconds / 60)} minutes ago"
+        elif seconds < 86400:
+            return f"{int(seconds / 3600)} hours ago"
+        else:
+            return f"{int(seconds / 86400)} days ago"
+    except:
+        return "Recently"
+
+
+class Job:
+    """One row of the jobs table"""
+
+    __slots__ = JOB_FIELDS + ('_preview_url', '_thumbnail_url', '_time_ago')
+
+    def __init__(self, row):
+        """Build from a row selected with JOB_COLUMNS"""
+        (self.id, self.filename, self.stored_path, self.pages, self.cost,
+         self.status, copies, orientation, print_color, self.print_job_id,
+         self.payment_screenshot, self.submitted_at, self.submitted_ts,
+         self.approved_at, self.approved_ts, self.approved_by,
+         self.refunded_at, self.refunded_by, self.printer) = row
+        self.copies = copies or 1
+        self.orientation = orientation or 'portrait'
+        self.print_color = print_color or 'bw'
+        self._preview_url = _UNSET
+        self._thumbnail_url = _UNSET
+        self._time_ago = _UNSET
+
+    @property
+    def preview_url(self):
+        """URL of the uploaded file (None outside a request)"""
+        if self._preview_url is _UNSET:
+            filename = Path(self.stored_path).name if self.stored_path else None
+            if not filename or not has_request_context():
+                # Not cached: a later access inside a request can still build it
+                return None
+            try:
+                self._preview_url = url_for('user.serve_upload', filename=filename)
+            except Exception:
+                # If url_for fails (e.g., no application context), use relative path
+                self._preview_url = f'/uploads/{filename}'
+        return self._preview_url
+
+    @property
+    def thumbnail_url(self):
+        """URL of the rendered first-page preview, None until one exists"""
+        if self._thumbnail_url is _UNSET:
+            self._thumbnail_url = None
+            if self.stored_path:
+                preview = preview_image_path(self.stored_path)
+                if os.path.exists(preview):
+                    filename = Path(preview).name
+                    try:
+                        self._thumbnail_url = url_for('user.serve_upload', filename=filename)
+                    except Exception:
+                        # Outside a request (e.g. the analysis workers), use the relative path
+                        self._thumbnail_url = f'/uploads/{filename}'
+        return self._thumbnail_url
+
+    @property
+    def time_ago(self):
+        """How long ago the job was submitted, for the dashboard"""
+        if self._time_ago is _UNSET:
+            self._time_ago = get_time_ago(self.submitted_at)
+        return self._time_ago
+
+    # ---------- dict-style access ----------
+
+    def __getitem__(self, key):
+        if key in JOB_FIELDS or key in _DERIVED_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in JOB_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in JOB_FIELDS or key in _DERIVED_FIELDS
+
+    def get(self, key, default=None):
+        if key in self:
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return JOB_FIELDS + _DERIVED_FIELDS
+
+    def to_dict(self):
+        """Plain dict for JSON responses"""
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.status}>'
+
+
+class JobJSONProvider(DefaultJSONProvider):
+    """Lets jsonify() and the |tojson filter serialize Job records"""
+
+    def default(self, o):
+        if isinstance(o, Job):
+            return o.to_dict()
+        return super().default(o)
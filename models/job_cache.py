@@ -0,0 +1,98 @@
+"""
+Bounded in-process LRU cache of job rows
+
+Most lookups are for the same handful of in-flight jobs, so rows are kept in
+memory and every write in models/job_repository.py invalidates the entries it
+touches.
+
+Writes from other processes (cleanup_old_files.py deleting old jobs, a second
+app worker) are not seen by these invalidations, so entries also expire
+after Config.JOB_CACHE_TTL_SECONDS: a row changed elsewhere is served at
+most that long.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class JobCache:
+    """Thread-safe LRU cache of job rows keyed by job ID, with hit/miss counters
+
+    Entries live for at most `ttl` seconds (None: until evicted or
+    invalidated), bounding how stale a row written by another process can be.
+    """
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._rows = OrderedDict()  # job_id -> (row, time.monotonic() deadline or None)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a lookup that raced a write cannot
+        # put a row it read before the write back into the cache
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, job_id):
+        """Return the cached row or None, counting the hit or miss"""
+        with self._lock:
+            entry = self._rows.get(job_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            row, expires = entry
+            if expires is not None and time.monotonic() >= expires:
+                del self._rows[job_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._rows.move_to_end(job_id)
+            self.hits += 1
+            return row
+
+    def generation(self):
+        """Token to take before reading from the database, passed to put()"""
+        return self._generation
+
+    def put(self, job_id, row, generation):
+        """Cache a row unless a write happened since `generation` was taken"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self._rows[job_id] = (row, expires)
+            self._rows.move_to_end(job_id)
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *job_ids):
+        """Drop cached rows after they were written"""
+        with self._lock:
+            self._generation += 1
+            for job_id in job_ids:
+                self._rows.pop(job_id, None)
+
+    def clear(self):
+        """Drop every cached row"""
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+
+    def stats(self):
+        """Hit/miss counters for measuring how much the cache saves"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._rows),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
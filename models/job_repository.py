@@ -0,0 +1,444 @@
+"""
+Job repository - the single owner of every SQL statement on the jobs table
+
+Keeping the statements in one place lets the job cache, batching and
+per-statement timing apply to all database access.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from config import Config
+from .connection import db_connection
+from .job_cache import JobCache
+
+
+def local_day_bounds(day=None):
+    """Epoch range [start, end) covering one local calendar day (default: today)
+
+    Used for range scans on the indexed submitted_ts column instead of
+    DATE(submitted_at), which cannot use an index.
+    """
+    start = datetime.combine(day or datetime.now().date(), datetime.min.time())
+    end = start + timedelta(days=1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+# Fixed column layout guaranteed by the migrations, so the statement text never
+# changes and sqlite3's statement cache can reuse the compiled query
+JOB_COLUMNS = (
+    'id, filename, stored_path, pages, cost, status, copies, orientation, '
+    'print_color, print_job_id, payment_screenshot, submitted_at, submitted_ts, '
+    'approved_at, approved_ts, approved_by, refunded_at, refunded_by, printer'
+)
+_SELECT_JOB = f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?'
+
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+_MAX_IDS_PER_QUERY = 500
+
+# Status counts come from the trigger-maintained job_status_counts table and the
+# "today" figures from one range scan on submitted_ts, so the cost of loading
+# the dashboard does not grow with the size of jobs
+DASHBOARD_STATS = '''
+    WITH today AS (
+        SELECT COUNT(*) AS jobs,
+               COALESCE(SUM(CASE WHEN status IN ('printing', 'completed') THEN cost END), 0) AS revenue
+        FROM jobs
+        WHERE submitted_ts >= ? AND submitted_ts < ?
+    )
+    SELECT
+        (SELECT COALESCE(SUM(job_count), 0) FROM job_status_counts
+         WHERE status = 'pending_approval'),
+        (SELECT COALESCE(SUM(job_count), 0) FROM job_status_counts
+         WHERE status = 'printing'),
+        (SELECT COALESCE(SUM(job_count), 0) FROM job_status_counts
+         WHERE status IN ('completed', 'refunded')),
+        today.jobs,
+        today.revenue
+    FROM today
+'''
+
+# Dashboard filter -> (statuses or None for every job, sort column)
+JOB_LIST_FILTERS = {
+    'pending': (('pending_approval',), 'submitted_ts'),
+    'printing': (('printing',), 'approved_ts'),
+    'completed': (('completed', 'refunded'), 'approved_ts'),
+    'all': (None, 'submitted_ts'),
+}
+
+
+class JobRepository:
+    """Typed operations on the jobs table with caching and statement timing"""
+
+    # Columns update() may write; anything else is rejected
+    UPDATABLE_COLUMNS = frozenset({
+        'filename', 'stored_path', 'pages', 'cost', 'status', 'copies',
+        'orientation', 'print_color', 'payment_screenshot', 'submitted_at',
+        'submitted_ts', 'approved_at', 'approved_ts', 'approved_by',
+        'print_job_id', 'refunded_at', 'refunded_by', 'printer'
+    })
+
+    def __init__(self, db_path=None, cache_size=None):
+        self.db_path = db_path
+        self.cache = JobCache(Config.JOB_CACHE_SIZE if cache_size is None else cache_size,
+                              Config.JOB_CACHE_TTL_SECONDS)
+        self._timings = {}
+        self._timings_lock = threading.Lock()
+
+    # ---------- plumbing ----------
+
+    @contextmanager
+    def transaction(self):
+        """One pooled connection, committed as one transaction"""
+        with db_connection(self.db_path) as con:
+            yield con
+
+    def _run(self, con, name, sql, params=(), fetch=None):
+        """Execute one statement and record its wall time under `name`"""
+        start = time.perf_counter()
+        cur = con.execute(sql, params)
+        if fetch == 'one':
+            result = cur.fetchone()
+        elif fetch == 'all':
+            result = cur.fetchall()
+        else:
+            result = cur
+        self._record(name, time.perf_counter() - start)
+        return result
+
+    def _run_many(self, con, name, sql, seq_of_params):
+        """executemany() one statement over several parameter sets, timed under `name`"""
+        start = time.perf_counter()
+        con.executemany(sql, seq_of_params)
+        self._record(name, time.perf_counter() - start)
+
+    def _record(self, name, elapsed):
+        with self._timings_lock:
+            stats = self._timings.get(name)
+            if stats is None:
+                stats = self._timings[name] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            elapsed_ms = elapsed * 1000
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    def statement_stats(self):
+        """Per-statement call counts and timings (milliseconds)"""
+        with self._timings_lock:
+            return {
+                name: {
+                    'count': stats['count'],
+                    'total_ms': round(stats['total_ms'], 3),
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                    'max_ms': round(stats['max_ms'], 3)
+                }
+                for name, stats in sorted(self._timings.items())
+            }
+
+    def reset_statement_stats(self):
+        with self._timings_lock:
+            self._timings.clear()
+
+    # ---------- reads ----------
+
+    def get(self, job_id):
+        """Row tuple in JOB_COLUMNS order, or None"""
+        row = self.cache.get(job_id)
+        if row is None:
+            generation = self.cache.generation()
+            with self.transaction() as con:
+                row = self._run(con, 'get', _SELECT_JOB, (job_id,), fetch='one')
+            if not row:
+                return None
+            row = tuple(row)
+            self.cache.put(job_id, row, generation)
+        return row
+
+    def get_many(self, job_ids):
+        """{job_id: row tuple} for the IDs that exist, one query per 500 misses"""
+        rows_by_id = {}
+        missing = []
+        for job_id in dict.fromkeys(job_ids):
+            row = self.cache.get(job_id)
+            if row is None:
+                missing.append(job_id)
+            else:
+                rows_by_id[job_id] = row
+
+        if missing:
+            generation = self.cache.generation()
+            with self.transaction() as con:
+                for start in range(0, len(missing), _MAX_IDS_PER_QUERY):
+                    chunk = missing[start:start + _MAX_IDS_PER_QUERY]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = self._run(con, 'get_many',
+                                     f'SELECT {JOB_COLUMNS} FROM jobs WHERE id IN ({placeholders})',
+                                     chunk, fetch='all')
+                    for row in rows:
+                        rows_by_id[row[0]] = tuple(row)
+            for job_id in missing:
+                if job_id in rows_by_id:
+                    self.cache.put(job_id, rows_by_id[job_id], generation)
+        return rows_by_id
+
+    def printing_jobs(self):
+        """Jobs the CUPS monitor should poll"""
+        with self.transaction() as con:
+            return self._run(con, 'printing_jobs',
+                             '''SELECT id, print_job_id, status, filename FROM jobs
+                                WHERE status = 'printing' AND print_job_id IS NOT NULL''',
+                             fetch='all')
+
+    def printer_loads(self):
+        """{printer: (jobs, pages)} still printing on each printer, copies included"""
+        with self.transaction() as con:
+            rows = self._run(con, 'printer_loads',
+                             '''SELECT printer, COUNT(*), COALESCE(SUM(pages * copies), 0) FROM jobs
+                                WHERE status = 'printing' GROUP BY printer''',
+                             fetch='all')
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def dashboard_stats(self, day_bounds=None):
+        """(pending, printing, completed, today_count, today_revenue)"""
+        with self.transaction() as con:
+            return tuple(self._run(con, 'dashboard_stats', DASHBOARD_STATS,
+                                   day_bounds or local_day_bounds(), fetch='one'))
+
+    def list_page(self, status_filter, after=None, limit=25):
+        """Up to `limit` rows of a dashboard filter past the (sort value, id) keyset `after`"""
+        statuses, sort_column = JOB_LIST_FILTERS.get(status_filter, JOB_LIST_FILTERS['all'])
+        keyset = f'AND ({sort_column}, id) < (?, ?)' if after else ''
+        after = tuple(after or ())
+
+        if statuses is None:
+            sql = f'''SELECT {JOB_COLUMNS} FROM jobs WHERE 1 {keyset}
+                      ORDER BY {sort_column} DESC, id DESC LIMIT ?'''
+            params = [*after, limit]
+        else:
+            # One index seek per status, merged - an IN (...) would sort every match
+            branches = []
+            params = []
+            for status in statuses:
+                branches.append(f'''SELECT * FROM (SELECT {JOB_COLUMNS} FROM jobs WHERE status = ? {keyset}
+                                                    ORDER BY {sort_column} DESC, id DESC LIMIT ?)''')
+                params.extend([status, *after, limit])
+            sql = f'''{' UNION ALL '.join(branches)}
+                      ORDER BY {sort_column} DESC, id DESC LIMIT ?'''
+            params.append(limit)
+
+        with self.transaction() as con:
+            return self._run(con, f'list_page:{status_filter}', sql, params, fetch='all')
+
+    def old_jobs(self, status, cutoff_ts):
+        """Submitted jobs in `status` older than cutoff_ts (used by cleanup)"""
+        with self.transaction() as con:
+            return self._run(con, 'old_jobs',
+                             '''SELECT id, filename, stored_path, payment_screenshot, status, blob_sha256
+                                FROM jobs
+                                WHERE status = ? AND submitted_ts > 0 AND submitted_ts < ?''',
+                             (status, cutoff_ts), fetch='all')
+
+    def analyzing_uploads(self):
+        """(id, stored_path, blob_sha256) of uploads still waiting for analysis"""
+        with self.transaction() as con:
+            return self._run(con, 'analyzing_uploads',
+                             "SELECT id, stored_path, blob_sha256 FROM jobs WHERE status = 'analyzing'",
+                             fetch='all')
+
+    def blob_job_count(self, blob_sha256):
+        """How many jobs reference an upload blob"""
+        with self.transaction() as con:
+            return self._run(con, 'blob_job_count', 'SELECT COUNT(*) FROM jobs WHERE blob_sha256 = ?',
+                             (blob_sha256,), fetch='one')[0]
+
+    def referenced_files(self):
+        """(stored_path, payment_screenshot) of every job (used by cleanup)"""
+        with self.transaction() as con:
+            return self._run(con, 'referenced_files',
+                             'SELECT stored_path, payment_screenshot FROM jobs', fetch='all')
+
+    # ---------- writes ----------
+    # Every write invalidates the rows it touched once the transaction commits
+
+    def insert(self, job_id, filename, stored_path, pages, cost, status='pending',
+               copies=1, orientation='portrait', print_color='bw', blob_sha256=None):
+        with self.transaction() as con:
+            self._run(con, 'insert',
+                      '''INSERT INTO jobs
+                         (id, filename, stored_path, pages, cost, status, copies, orientation, print_color,
+                          blob_sha256)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                      (job_id, filename, stored_path, pages, cost, status, copies, orientation, print_color,
+                       blob_sha256))
+        self.cache.invalidate(job_id)
+
+    def _check_columns(self, fields):
+        unknown = set(fields) - self.UPDATABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot update job columns: {', '.join(sorted(unknown))}")
+
+    def update(self, job_id, **fields):
+        """Write any combination of columns in a single UPDATE statement"""
+        if not fields:
+            return
+        self._check_columns(fields)
+
+        columns = sorted(fields)
+        assignments = ', '.join(f'{column} = ?' for column in columns)
+        with self.transaction() as con:
+            self._run(con, f"update:{','.join(columns)}",
+                      f'UPDATE jobs SET {assignments} WHERE id = ?',
+                      [fields[column] for column in columns] + [job_id])
+        self.cache.invalidate(job_id)
+
+    def update_many(self, updates):
+        """Apply [(job_id, {column: value}), ...] in a single transaction
+
+        Updates that write the same columns share one executemany(), so a
+        whole cart or bulk admin action costs one commit instead of one per job.
+        """
+        groups = {}
+        job_ids = []
+        for job_id, fields in updates:
+            if not fields:
+                continue
+            self._check_columns(fields)
+            columns = tuple(sorted(fields))
+            groups.setdefault(columns, []).append([fields[column] for column in columns] + [job_id])
+            job_ids.append(job_id)
+        if not groups:
+            return
+
+        with self.transaction() as con:
+            for columns, rows in groups.items():
+                assignments = ', '.join(f'{column} = ?' for column in columns)
+                self._run_many(con, f"update_many:{','.join(columns)}",
+                               f'UPDATE jobs SET {assignments} WHERE id = ?', rows)
+        self.cache.invalidate(*job_ids)
+
+    def batch(self):
+        """Collect updates and write them in one transaction, see JobBatch"""
+        return JobBatch(self)
+
+    def set_status(self, job_id, status):
+        self.update(job_id, status=status)
+
+    def submit_payment(self, job_ids, payment_screenshot, submitted_at):
+        """Attach the payment screenshot and move jobs to pending_approval"""
+        fields = _submitted_fields(payment_screenshot, submitted_at)
+        self.update_many((job_id, fields) for job_id in job_ids)
+
+    def approve(self, job_id, status, approved_by, approved_at, print_job_id=None, printer=None):
+        """Record an approval and the resulting status ('printing' or 'error')"""
+        self.update(job_id, **_approved_fields(status, approved_by, approved_at, print_job_id, printer))
+
+    def reject(self, job_id, rejected_by):
+        self.update(job_id, **_rejected_fields(rejected_by))
+
+    def reprint(self, job_id, approved_at, print_job_id=None, printer=None):
+        """Put a resent job back into printing"""
+        self.update(job_id, **_reprinted_fields(approved_at, print_job_id, printer))
+
+    def refund(self, job_id, refunded_by, refunded_at):
+        self.update(job_id, **_refunded_fields(refunded_by, refunded_at))
+
+    def delete(self, job_id):
+        with self.transaction() as con:
+            self._run(con, 'delete', 'DELETE FROM jobs WHERE id = ?', (job_id,))
+        self.cache.invalidate(job_id)
+
+
+# Column values written by each typed operation, shared by JobRepository and JobBatch
+
+def _submitted_fields(payment_screenshot, submitted_at):
+    return {
+        'payment_screenshot': payment_screenshot,
+        'submitted_at': submitted_at.isoformat(),
+        'submitted_ts': int(submitted_at.timestamp()),
+        'status': 'pending_approval'
+    }
+
+
+def _approved_fields(status, approved_by, approved_at, print_job_id=None, printer=None):
+    fields = {
+        'status': status,
+        'approved_by': approved_by,
+        'approved_at': approved_at.isoformat(),
+        'approved_ts': int(approved_at.timestamp())
+    }
+    if print_job_id:
+        fields['print_job_id'] = print_job_id
+    if printer:
+        fields['printer'] = printer
+    return fields
+
+
+def _rejected_fields(rejected_by):
+    return {'status': 'rejected', 'approved_by': rejected_by}
+
+
+def _reprinted_fields(approved_at, print_job_id=None, printer=None):
+    # The previous CUPS job ID is always replaced, so the monitor never polls
+    # the old job while the new one waits in the print queue
+    fields = {
+        'status': 'printing',
+        'approved_at': approved_at.isoformat(),
+        'approved_ts': int(approved_at.timestamp()),
+        'print_job_id': print_job_id
+    }
+    if printer:
+        fields['printer'] = printer
+    return fields
+
+
+def _refunded_fields(refunded_by, refunded_at):
+    return {'status': 'refunded', 'refunded_by': refunded_by, 'refunded_at': refunded_at.isoformat()}
+
+
+class JobBatch:
+    """Group commit: collects job updates and writes them in one transaction
+
+        with jobs.batch() as batch:
+            for job_id in job_ids:
+                batch.set_status(job_id, 'printing')
+
+    Nothing is written if the block raises.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.updates = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def __len__(self):
+        return len(self.updates)
+
+    def flush(self):
+        """Write everything collected so far"""
+        updates, self.updates = self.updates, []
+        self.repository.update_many(updates)
+
+    def update(self, job_id, **fields):
+        self.updates.append((job_id, fields))
+
+    def set_status(self, job_id, status):
+        self.update(job_id, status=status)
+
+    def approve(self, job_id, status, approved_by, approved_at, print_job_id=None, printer=None):
+        self.update(job_id, **_approved_fields(status, approved_by, approved_at, print_job_id, printer))
+
+    def reject(self, job_id, rejected_by):
+        self.update(job_id, **_rejected_fields(rejected_by))
+
+    def reprint(self, job_id, approved_at, print_job_id=None, printer=None):
+        self.update(job_id, **_reprinted_fields(approved_at, print_job_id, printer))
+
+    def refund(self, job_id, refunded_by, refunded_at):
+        self.update(job_id, **_refunded_fields(refunded_by, refunded_at))
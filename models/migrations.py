@@ -0,0 +1,213 @@
+"""
+Versioned schema migrations tracked with PRAGMA user_version
+
+Migrations run once from init_db(). Request handlers can then rely on a fixed
+column layout instead of probing the table with PRAGMA table_info.
+"""
+
+
+def _add_missing_columns(con, table, columns):
+    """Add columns that older databases were created without"""
+    existing = {row[1] for row in con.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns:
+        if name not in existing:
+            con.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def _migration_001_baseline(con):
+    """Create the jobs table and backfill columns that used to be added lazily"""
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            stored_path TEXT,
+            pages INTEGER,
+            cost REAL,
+            status TEXT,
+            copies INTEGER DEFAULT 1,
+            orientation TEXT DEFAULT 'portrait',
+            print_color TEXT DEFAULT 'bw',
+            payment_screenshot TEXT,
+            submitted_at TEXT,
+            approved_at TEXT,
+            approved_by TEXT,
+            print_job_id TEXT,
+            refunded_at TEXT,
+            refunded_by TEXT
+        )
+    ''')
+    # Databases created by early versions of the app are missing these
+    _add_missing_columns(con, 'jobs', [
+        ('copies', 'INTEGER DEFAULT 1'),
+        ('orientation', "TEXT DEFAULT 'portrait'"),
+        ('print_color', "TEXT DEFAULT 'bw'"),
+        ('payment_screenshot', 'TEXT'),
+        ('submitted_at', 'TEXT'),
+        ('approved_at', 'TEXT'),
+        ('approved_by', 'TEXT'),
+        ('print_job_id', 'TEXT'),
+        ('refunded_at', 'TEXT'),
+        ('refunded_by', 'TEXT'),
+    ])
+
+
+def _migration_002_time_indexes(con):
+    """Add epoch timestamp columns and status/time indexes for the dashboard"""
+    # 0 means "not yet submitted/approved" so keyset ordering never sees NULLs
+    _add_missing_columns(con, 'jobs', [
+        ('submitted_ts', 'INTEGER NOT NULL DEFAULT 0'),
+        ('approved_ts', 'INTEGER NOT NULL DEFAULT 0'),
+    ])
+    # The ISO strings are naive local times; the 'utc' modifier converts them to real epochs
+    con.execute('''UPDATE jobs SET submitted_ts = CAST(strftime('%s', submitted_at, 'utc') AS INTEGER)
+                   WHERE submitted_at IS NOT NULL AND submitted_ts = 0''')
+    con.execute('''UPDATE jobs SET approved_ts = CAST(strftime('%s', approved_at, 'utc') AS INTEGER)
+                   WHERE approved_at IS NOT NULL AND approved_ts = 0''')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_submitted ON jobs (status, submitted_ts)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_approved ON jobs (status, approved_ts)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_submitted ON jobs (submitted_ts)')
+
+
+def _migration_003_status_counters(con):
+    """Keep per-status job counts in job_status_counts, maintained by triggers"""
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS job_status_counts (
+            status TEXT PRIMARY KEY,
+            job_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    con.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_insert AFTER INSERT ON jobs
+        BEGIN
+            INSERT INTO job_status_counts (status, job_count) VALUES (IFNULL(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET job_count = job_count + 1;
+        END
+    ''')
+    con.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_update AFTER UPDATE OF status ON jobs
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE job_status_counts SET job_count = job_count - 1 WHERE status = IFNULL(OLD.status, '');
+            INSERT INTO job_status_counts (status, job_count) VALUES (IFNULL(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET job_count = job_count + 1;
+        END
+    ''')
+    con.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_count_delete AFTER DELETE ON jobs
+        BEGIN
+            UPDATE job_status_counts SET job_count = job_count - 1 WHERE status = IFNULL(OLD.status, '');
+        END
+    ''')
+    # Seed the counters from the existing rows (one last full scan)
+    con.execute('DELETE FROM job_status_counts')
+    con.execute('''INSERT INTO job_status_counts (status, job_count)
+                   SELECT IFNULL(status, ''), COUNT(*) FROM jobs GROUP BY IFNULL(status, '')''')
+
+
+def _migration_004_keyset_indexes(con):
+    """Extend the status/time indexes with id so keyset pages are index-only seeks"""
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_submitted_id ON jobs (status, submitted_ts, id)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_approved_id ON jobs (status, approved_ts, id)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_jobs_submitted_id ON jobs (submitted_ts, id)')
+    # Superseded by the wider indexes above (same leading columns)
+    con.execute('DROP INDEX IF EXISTS idx_jobs_status_submitted')
+    con.execute('DROP INDEX IF EXISTS idx_jobs_status_approved')
+    con.execute('DROP INDEX IF EXISTS idx_jobs_submitted')
+
+
+def _migration_005_print_queue(con):
+    """Add the print_queue table drained by the print dispatch workers"""
+    # One row per job waiting to be sent to CUPS; deleted once dispatched.
+    # claimed_ts is set while a worker has the row, next_attempt_ts holds the
+    # retry backoff
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS print_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL UNIQUE,
+            action TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_ts REAL NOT NULL,
+            claimed_ts REAL,
+            last_error TEXT,
+            created_ts REAL NOT NULL
+        )
+    ''')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_print_queue_due ON print_queue (claimed_ts, next_attempt_ts)')
+
+
+def _migration_006_job_printer(con):
+    """Record which printer each job was routed to"""
+    _add_missing_columns(con, 'jobs', [('printer', 'TEXT')])
+    # CUPS job IDs are "<printer>-<number>", so sent jobs already name theirs
+    con.execute('''
+        UPDATE jobs SET printer = rtrim(rtrim(print_job_id, '0123456789'), '-')
+        WHERE printer IS NULL AND print_job_id LIKE '%-%'
+    ''')
+
+
+def _migration_007_upload_blobs(con):
+    """Store uploads once per content hash, shared by every job that uploaded it"""
+    # refcount = jobs pointing at the blob. Uploads take references
+    # (models/blob_store.py); deleting a job gives its reference back
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            pages INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_ts REAL NOT NULL
+        )
+    ''')
+    # Jobs from before this have no blob and keep their own file
+    _add_missing_columns(con, 'jobs', [('blob_sha256', 'TEXT')])
+    con.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_blob_release AFTER DELETE ON jobs
+        WHEN OLD.blob_sha256 IS NOT NULL
+        BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.blob_sha256;
+        END
+    ''')
+
+
+# Ordered list of (version, migration). Append new entries, never edit old ones.
+MIGRATIONS = [
+    (1, _migration_001_baseline),
+    (2, _migration_002_time_indexes),
+    (3, _migration_003_status_counters),
+    (4, _migration_004_keyset_indexes),
+    (5, _migration_005_print_queue),
+    (6, _migration_006_job_printer),
+    (7, _migration_007_upload_blobs),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(con):
+    """Read the schema version stored in the database header"""
+    return con.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(con, target=SCHEMA_VERSION):
+    """Apply every pending migration up to `target`, each in its own transaction
+
+    Returns the list of versions that were applied.
+    """
+    current = get_schema_version(con)
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            migration(con)
+            con.execute(f'PRAGMA user_version = {version}')
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        print(f"🗄️  Applied database migration {version}: {migration.__doc__}")
+        applied.append(version)
+    return applied
@@ -0,0 +1,86 @@
+"""
+Print queue - jobs waiting to be sent to CUPS
+
+Rows live in SQLite so approvals made just before a restart still get
+printed. Workers claim one row at a time, delete it once CUPS accepted the
+job and push next_attempt_ts back when it did not.
+"""
+import time
+from .connection import db_connection
+
+
+class PrintQueue:
+    """Persistent FIFO of print dispatches with per-row retry state"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+
+    def enqueue(self, job_ids, action='print'):
+        """Queue jobs for dispatch
+
+        A job has at most one row: queuing it again replaces the action and
+        makes the row due now (e.g. an approval arriving while the job's hold
+        is waiting out a retry backoff).
+        """
+        now = time.time()
+        with db_connection(self.db_path) as con:
+            con.executemany('''INSERT INTO print_queue (job_id, action, next_attempt_ts, created_ts)
+                               VALUES (?, ?, ?, ?)
+                               ON CONFLICT (job_id) DO UPDATE SET
+                                   attempts = CASE WHEN action = excluded.action THEN attempts ELSE 0 END,
+                                   action = excluded.action,
+                                   next_attempt_ts = MIN(next_attempt_ts, excluded.next_attempt_ts)''',
+                            [(job_id, action, now, now) for job_id in job_ids])
+
+    def claim(self):
+        """Take the oldest due row, or None; returns the row with attempts counted"""
+        now = time.time()
+        with db_connection(self.db_path) as con:
+            # IMMEDIATE takes the write lock up front, so two workers can
+            # never claim the same row
+            con.execute('BEGIN IMMEDIATE')
+            row = con.execute('''SELECT id, job_id, action, attempts FROM print_queue
+                                 WHERE claimed_ts IS NULL AND next_attempt_ts <= ?
+                                 ORDER BY next_attempt_ts, id LIMIT 1''', (now,)).fetchone()
+            if row is None:
+                return None
+            con.execute('UPDATE print_queue SET claimed_ts = ?, attempts = attempts + 1 WHERE id = ?',
+                        (now, row['id']))
+            return {'id': row['id'], 'job_id': row['job_id'], 'action': row['action'],
+                    'attempts': row['attempts'] + 1}
+
+    def next_due(self):
+        """Epoch of the next unclaimed row, or None when the queue is empty"""
+        with db_connection(self.db_path) as con:
+            return con.execute('SELECT MIN(next_attempt_ts) FROM print_queue WHERE claimed_ts IS NULL').fetchone()[0]
+
+    def complete(self, entry_id, action=None):
+        """Drop a row once its job was dispatched (or given up on)
+
+        With `action`, a row whose action was replaced while claimed is kept
+        and released instead, so the newer request still gets carried out.
+        """
+        with db_connection(self.db_path) as con:
+            if action is None:
+                con.execute('DELETE FROM print_queue WHERE id = ?', (entry_id,))
+            elif not con.execute('DELETE FROM print_queue WHERE id = ? AND action = ?',
+                                 (entry_id, action)).rowcount:
+                con.execute('UPDATE print_queue SET claimed_ts = NULL WHERE id = ?', (entry_id,))
+
+    def retry(self, entry_id, delay, error):
+        """Release a claimed row to be tried again after `delay` seconds"""
+        with db_connection(self.db_path) as con:
+            con.execute('''UPDATE print_queue SET claimed_ts = NULL, next_attempt_ts = ?, last_error = ?
+                           WHERE id = ?''', (time.time() + delay, error, entry_id))
+
+    def release_claimed(self):
+        """Requeue rows claimed by workers that died (e.g. the app restarted)"""
+        with db_connection(self.db_path) as con:
+            return con.execute('UPDATE print_queue SET claimed_ts = NULL WHERE claimed_ts IS NOT NULL').rowcount
+
+    def pending(self):
+        """Every queued row, oldest first (for the admin stats endpoint)"""
+        with db_connection(self.db_path) as con:
+            return [dict(row) for row in con.execute(
+                '''SELECT job_id, action, attempts, next_attempt_ts, claimed_ts, last_error
+                   FROM print_queue ORDER BY id''')]
@@ -1,19 +1,39 @@
 """
 Admin routes for dashboard, approval, rejection, and management
 """
-import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import Blueprint, request, redirect, url_for, render_template, session, jsonify
 
 from config import Config
-from models.database import get_job, update_job_status
-from utils.print_utils import print_file, check_print_job_status
-from models.database import update_job_print_id
+from models.database import (
+    get_job, get_jobs, job_batch, update_job_status, get_dashboard_stats, list_jobs, get_job_cache_stats, get_db_statement_stats, get_print_queue, get_printer_loads,
+    mark_job_approved, mark_job_rejected, mark_job_reprinted, mark_job_refunded
+)
+from utils.print_utils import cached_print_job_status
+from services.print_dispatcher import enqueue_print_jobs
+from services.printer_pool import choose_printer, get_printer_status
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 
+def _job_pages(job):
+    """Sheets a job will print (pages x copies), for printer routing"""
+    return (job['pages'] or 0) * (job.get('copies') or 1)
+
+
+def _is_held(job):
+    """Spooled in CUPS at payment and still waiting for a decision"""
+    return bool(job['print_job_id']) and job['status'] == 'pending_approval'
+
+
+def _print_action(job, loads=None):
+    """(queue action, printer) for approving a job"""
+    if _is_held(job):
+        return 'release', job['printer']
+    return 'print', choose_printer(job.get('print_color', 'bw'), _job_pages(job), loads)
+
+
 def admin_required(f):
     """Decorator to require admin authentication"""
     @wraps(f)
@@ -24,29 +44,6 @@ def admin_required(f):
     return decorated_function
 
 
-def get_time_ago(timestamp_str):
-    """Convert timestamp to human-readable 'time ago' format"""
-    if not timestamp_str:
-        return "Just now"
-    
-    try:
-        timestamp = datetime.fromisoformat(timestamp_str)
-        now = datetime.now()
-        diff = now - timestamp
-        
-        seconds = diff.total_seconds()
-        if seconds < 60:
-            return f"{int(seconds)} seconds ago"
-        elif seconds < 3600:
-            return f"{int(seconds / 60)} minutes ago"
-        elif seconds < 86400:
-            return f"{int(seconds / 3600)} hours ago"
-        else:
-            return f"{int(seconds / 86400)} days ago"
-    except:
-        return "Recently"
-
-
 @admin_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Admin login page"""
@@ -88,71 +85,42 @@ def dashboard():
     # Get filter status from query parameter
     status_filter = request.args.get('status', 'pending')
     
-    con = sqlite3.connect(Config.DB_PATH)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    
-    # Build query based on filter
-    if status_filter == 'pending':
-        cur.execute('''SELECT * FROM jobs 
-                       WHERE status = 'pending_approval' 
-                       ORDER BY submitted_at DESC''')
-    elif status_filter == 'printing':
-        cur.execute('''SELECT * FROM jobs 
-                       WHERE status = 'printing' 
-                       ORDER BY approved_at DESC''')
-    elif status_filter == 'completed':
-        cur.execute('''SELECT * FROM jobs 
-                       WHERE status IN ('completed', 'refunded') 
-                       ORDER BY approved_at DESC 
-                       LIMIT 50''')
-    else:  # all
-        cur.execute('''SELECT * FROM jobs 
-                       ORDER BY submitted_at DESC 
-                       LIMIT 100''')
-    
-    rows = cur.fetchall()
-    
-    jobs = []
-    for row in rows:
-        job_dict = dict(row)
-        job_dict['time_ago'] = get_time_ago(job_dict.get('submitted_at'))
-        jobs.append(job_dict)
-    
-    # Get statistics
-    cur.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending_approval'")
-    pending_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM jobs WHERE status = 'printing'")
-    printing_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('completed', 'refunded')")
-    completed_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM jobs WHERE DATE(submitted_at) = DATE('now')")
-    today_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COALESCE(SUM(cost), 0) FROM jobs WHERE DATE(submitted_at) = DATE('now') AND status IN ('printing', 'completed')")
-    today_revenue = cur.fetchone()[0]
-    
-    con.close()
-    
-    stats = {
-        'pending': pending_count,
-        'printing': printing_count,
-        'completed': completed_count,
-        'today': today_count,
-        'revenue': int(today_revenue)
-    }
+    # First keyset page; the rest is fetched by infinite scroll from /admin/jobs
+    jobs, next_cursor = list_jobs(status_filter, limit=Config.ADMIN_PAGE_SIZE)
+    
+    stats = get_dashboard_stats()
     
     return render_template('admin_dashboard.jinja', 
                          jobs=jobs, 
                          stats=stats,
+                         printers=get_printer_status(),
+                         next_cursor=next_cursor,
                          current_filter=status_filter,
                          admin_username=session.get('admin_username'),
                          vapid_public_key=Config.VAPID_PUBLIC_KEY)
 
 
+@admin_bp.route('/jobs', methods=['GET'])
+@admin_required
+def jobs_page():
+    """JSON endpoint for dashboard infinite scroll (keyset-paginated)"""
+    status_filter = request.args.get('status', 'pending')
+    cursor = request.args.get('cursor') or None
+    limit = max(1, min(100, request.args.get('limit', Config.ADMIN_PAGE_SIZE, type=int)))
+    
+    try:
+        jobs, next_cursor = list_jobs(status_filter, cursor=cursor, limit=limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    html = ''.join(render_template('admin_job_card.jinja', job=job) for job in jobs)
+    return jsonify({
+        'jobs': jobs,
+        'next_cursor': next_cursor,
+        'html': html
+    })
+
+
 @admin_bp.route('/approve/<job_id>', methods=['POST'])
 @admin_required
 def approve(job_id):
@@ -166,56 +134,19 @@ def approve(job_id):
         from flask import abort
         abort(404)
     
-    # Send to printer
-    print(f"\n{'='*60}")
-    print(f"🖨️  PRINTING JOB")
-    print(f"{'='*60}")
-    print(f"Job ID: {job_id}")
-    print(f"File: {job['filename']}")
-    print(f"Path: {job['stored_path']}")
-    print(f"Pages: {job['pages']}")
-    print(f"Copies: {job.get('copies', 1)}")
-    print(f"Orientation: {job.get('orientation', 'portrait')}")
-    print(f"Color Mode: {job.get('print_color', 'bw')}")
-    print(f"Printer: {Config.PRINTER_NAME}")
-    print(f"{'='*60}")
-    
-    result = print_file(job['stored_path'], 
-                        printer=Config.PRINTER_NAME,
-                        copies=job.get('copies', 1),
-                        orientation=job.get('orientation', 'portrait'),
-                        color_mode=job.get('print_color', 'bw'))
-    
-    if result['success']:
-        print(f"✅ Print job sent successfully!")
-        if result['job_id']:
-            print(f"📋 CUPS Job ID: {result['job_id']}")
-            # Store the CUPS job ID for status tracking
-            update_job_print_id(job_id, result['job_id'])
-        status = 'printing'
-    else:
-        print(f"❌ Print job failed!")
-        if 'error' in result:
-            print(f"Error: {result['error']}")
-        status = 'error'
-    print(f"{'='*60}\n")
-    
-    # Update job status
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('''UPDATE jobs 
-                   SET status = ?,
-                       approved_at = ?,
-                       approved_by = ?
-                   WHERE id = ?''',
-                (status, datetime.now().isoformat(), session.get('admin_username'), job_id))
-    con.commit()
-    con.close()
+    # Queue for the print workers, which release the job held in CUPS since
+    # payment or, if there is none, send it to the least loaded printer;
+    # CUPS is contacted outside this request
+    action, printer = _print_action(job)
+    mark_job_approved(job_id, 'printing', session.get('admin_username'), datetime.now(), printer=printer)
+    enqueue_print_jobs([job_id], action)
+    print(f"🖨️  Queued {job['filename']} to {action} on {printer} ({job.get('copies', 1)} copies, "
+          f"{job.get('orientation', 'portrait')}, {job.get('print_color', 'bw')})")
     
     # Broadcast job status update via WebSocket
     socketio = current_app.extensions.get('socketio')
     if socketio:
-        broadcast_job_update(socketio, job_id, status, 'approved')
+        broadcast_job_update(socketio, job_id, 'printing', 'approved')
     
     return redirect(url_for('admin.dashboard'))
 
@@ -228,15 +159,10 @@ def reject(job_id):
     from websocket.events import broadcast_job_update
     from flask import current_app
     
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    cur.execute('''UPDATE jobs 
-                   SET status = 'rejected',
-                       approved_by = ?
-                   WHERE id = ?''',
-                (session.get('admin_username'), job_id))
-    con.commit()
-    con.close()
+    job = get_job(job_id)
+    mark_job_rejected(job_id, session.get('admin_username'))
+    if job and _is_held(job):
+        enqueue_print_jobs([job_id], 'cancel')
     
     # Broadcast job status update via WebSocket
     socketio = current_app.extensions.get('socketio')
@@ -254,50 +180,15 @@ def resend_print(job_id):
     if not job:
         return jsonify({'error': 'Job not found'}), 404
     
-    print(f"\n{'='*60}")
-    print(f"🔄 RESENDING PRINT JOB")
-    print(f"{'='*60}")
-    print(f"Job ID: {job_id}")
-    print(f"Previous Status: {job['status']}")
-    print(f"Previous CUPS Job ID: {job.get('print_job_id', 'None')}")
-    print(f"{'='*60}")
+    print(f"🔄 Resending {job['filename']} (was {job['status']}, CUPS job {job.get('print_job_id') or 'None'})")
     
-    # Resend to printer
-    result = print_file(job['stored_path'], 
-                        printer=Config.PRINTER_NAME,
-                        copies=job.get('copies', 1),
-                        orientation=job.get('orientation', 'portrait'),
-                        color_mode=job.get('print_color', 'bw'))
-    
-    if result['success']:
-        print(f"✅ Print job resent successfully!")
-        if result['job_id']:
-            print(f"📋 New CUPS Job ID: {result['job_id']}")
-            # Update with new CUPS job ID
-            update_job_print_id(job_id, result['job_id'])
-        
-        # Update status to printing
-        con = sqlite3.connect(Config.DB_PATH)
-        cur = con.cursor()
-        cur.execute('''UPDATE jobs 
-                       SET status = 'printing',
-                           approved_at = ?
-                       WHERE id = ?''',
-                    (datetime.now().isoformat(), job_id))
-        con.commit()
-        con.close()
-        
-        print(f"✅ Status updated to 'printing'")
-        print(f"{'='*60}\n")
-        
-        return jsonify({'success': True, 'message': 'Print job resent successfully'})
-    else:
-        print(f"❌ Resend failed!")
-        if 'error' in result:
-            print(f"Error: {result['error']}")
-        print(f"{'='*60}\n")
-        
-        return jsonify({'success': False, 'error': result.get('error', 'Print failed')}), 500
+    # Back to printing with the old CUPS job ID cleared, then queue it again
+    # (re-routed, in case its printer was the problem)
+    printer = choose_printer(job.get('print_color', 'bw'), _job_pages(job))
+    mark_job_reprinted(job_id, datetime.now(), printer=printer)
+    enqueue_print_jobs([job_id], 'reprint')
+    
+    return jsonify({'success': True, 'message': 'Print job queued for resending'})
 
 
 @admin_bp.route('/refund/<job_id>', methods=['POST'])
@@ -322,27 +213,10 @@ def refund(job_id):
     print(f"Refunded by: {session.get('admin_username')}")
     print(f"{'='*60}")
     
-    # Update job status to refunded
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    
-    # Add refunded_at and refunded_by columns if they don't exist
-    cur.execute("PRAGMA table_info(jobs)")
-    columns = [col[1] for col in cur.fetchall()]
-    
-    if 'refunded_at' not in columns:
-        cur.execute('ALTER TABLE jobs ADD COLUMN refunded_at TEXT')
-    if 'refunded_by' not in columns:
-        cur.execute('ALTER TABLE jobs ADD COLUMN refunded_by TEXT')
-    
-    cur.execute('''UPDATE jobs 
-                   SET status = 'refunded',
-                       refunded_at = ?,
-                       refunded_by = ?
-                   WHERE id = ?''',
-                (datetime.now().isoformat(), session.get('admin_username'), job_id))
-    con.commit()
-    con.close()
+    # Update job status to refunded (and drop its held copy from CUPS)
+    mark_job_refunded(job_id, session.get('admin_username'), datetime.now())
+    if _is_held(job):
+        enqueue_print_jobs([job_id], 'cancel')
     
     print(f"✅ Job marked as refunded")
     print(f"{'='*60}\n")
@@ -355,6 +229,53 @@ def refund(job_id):
     return jsonify({'success': True, 'message': 'Job marked as refunded'})
 
 
+@admin_bp.route('/bulk/<action>', methods=['POST'])
+@admin_required
+def bulk_action(action):
+    """Approve or reject several pending jobs, written in a single commit"""
+    # Import here to avoid circular dependency
+    from websocket.events import broadcast_job_update
+    from flask import current_app
+    
+    if action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'error': 'Unknown action'}), 400
+    
+    job_ids = (request.json or {}).get('job_ids') or []
+    pending = [job for job in get_jobs(job_ids) if job['status'] == 'pending_approval']
+    admin_username = session.get('admin_username')
+    now = datetime.now()
+    
+    print(f"\n📦 Bulk {action}: {len(pending)} pending job(s)")
+    
+    statuses = {}
+    queue = {}  # queue action -> job IDs
+    loads = get_printer_loads()
+    with job_batch() as batch:
+        for job in pending:
+            if action == 'approve':
+                status = 'printing'
+                queue_action, printer = _print_action(job, loads)
+                batch.approve(job['id'], status, admin_username, now, printer=printer)
+                queue.setdefault(queue_action, []).append(job['id'])
+            else:
+                status = 'rejected'
+                batch.reject(job['id'], admin_username)
+                if _is_held(job):
+                    queue.setdefault('cancel', []).append(job['id'])
+            statuses[job['id']] = status
+    
+    for queue_action, job_ids in queue.items():
+        enqueue_print_jobs(job_ids, queue_action)
+    
+    # Broadcast job status updates via WebSocket
+    socketio = current_app.extensions.get('socketio')
+    if socketio:
+        for job_id, status in statuses.items():
+            broadcast_job_update(socketio, job_id, status, 'approved' if action == 'approve' else 'rejected')
+    
+    return jsonify({'success': True, 'jobs': statuses})
+
+
 @admin_bp.route('/subscribe', methods=['POST'])
 @admin_required
 def subscribe():
@@ -383,6 +304,34 @@ def subscribe():
     return jsonify({'success': True, 'message': 'Subscribed' if is_new else 'Already subscribed'})
 
 
+@admin_bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def cache_stats():
+    """Job cache hit/miss counters"""
+    return jsonify(get_job_cache_stats())
+
+
+@admin_bp.route('/db-stats', methods=['GET'])
+@admin_required
+def db_stats():
+    """Per-statement database call counts and timings"""
+    return jsonify(get_db_statement_stats())
+
+
+@admin_bp.route('/printers', methods=['GET'])
+@admin_required
+def printers_status():
+    """Per-printer jobs and pages still printing, with estimated wait"""
+    return jsonify(get_printer_status())
+
+
+@admin_bp.route('/print-queue', methods=['GET'])
+@admin_required
+def print_queue_status():
+    """Jobs waiting for the print workers, with attempts and last error"""
+    return jsonify(get_print_queue())
+
+
 @admin_bp.route('/update-print-status/<job_id>', methods=['POST'])
 @admin_required
 def update_print_status(job_id):
@@ -395,8 +344,8 @@ def update_print_status(job_id):
     if not print_job_id:
         return jsonify({'status': job['status'], 'message': 'No print job ID found'})
     
-    # Check actual status from CUPS
-    actual_status = check_print_job_status(print_job_id)
+    # Check actual status from CUPS (or a lookup from the last few seconds)
+    actual_status = cached_print_job_status(print_job_id)
     
     print(f"📊 Status check for {job_id}: CUPS={actual_status}, DB={job['status']}")
     
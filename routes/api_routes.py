@@ -1,13 +1,12 @@
 """
 API endpoints for cart management, job status, notifications, etc.
 """
-import sqlite3
 from flask import Blueprint, request, jsonify, url_for
 
 from config import Config
-from models.database import get_job, update_job_settings
+from models.database import get_job, get_jobs, update_job
 from services.cart_service import get_cart_summary
-from utils.print_utils import check_print_job_status
+from utils.print_utils import cached_print_job_status
 from utils.notification_utils import send_push_notification, push_subscriptions
 from models.database import update_job_status
 
@@ -63,35 +62,25 @@ def update_cart_item():
     if not job:
         return jsonify({'error': 'Job not found'}), 404
     
-    # Get current values
-    current_copies = job.get('copies', 1)
-    current_orientation = job.get('orientation', 'portrait')
-    current_color = job.get('print_color', 'bw')
+    # Only the fields that were sent are written, all in one UPDATE
+    fields = {}
     
     # Update copies if provided
     if copies is not None:
-        current_copies = max(1, min(99, int(copies)))  # Clamp between 1-99
+        fields['copies'] = max(1, min(99, int(copies)))  # Clamp between 1-99
         
         # Recalculate cost (same price for both B&W and Color)
-        base_cost = job['pages'] * Config.COST_PER_PAGE
-        new_cost = base_cost * current_copies
-        
-        con = sqlite3.connect(Config.DB_PATH)
-        cur = con.cursor()
-        cur.execute('UPDATE jobs SET cost = ? WHERE id = ?', (new_cost, job_id))
-        con.commit()
-        con.close()
+        fields['cost'] = job['pages'] * Config.COST_PER_PAGE * fields['copies']
     
     # Update orientation if provided
     if orientation is not None:
-        current_orientation = orientation
+        fields['orientation'] = orientation
     
     # Update print color if provided
     if print_color is not None:
-        current_color = print_color
+        fields['print_color'] = print_color
     
-    # Update all settings
-    update_job_settings(job_id, current_copies, current_orientation, current_color)
+    update_job(job_id, **fields)
     
     # Return updated cart summary
     summary = get_cart_summary()
@@ -112,9 +101,8 @@ def get_screenshot():
         return jsonify({'has_screenshot': False})
     
     # Check if any job has a screenshot
-    for job_id in job_ids:
-        job = get_job(job_id)
-        if job and job.get('payment_screenshot'):
+    for job in get_jobs(job_ids):
+        if job.get('payment_screenshot'):
             return jsonify({
                 'has_screenshot': True,
                 'screenshot_url': url_for('user.serve_screenshot', filename=job['payment_screenshot'])
@@ -131,8 +119,9 @@ def job_status(job_id):
         return jsonify({'error': 'Job not found'}), 404
     
     # If job has a CUPS job ID and is marked as printing, check actual status
+    # (shared with every other page polling the same job for a few seconds)
     if job.get('print_job_id') and job['status'] == 'printing':
-        actual_status = check_print_job_status(job['print_job_id'])
+        actual_status = cached_print_job_status(job['print_job_id'])
         if actual_status != job['status']:
             # Update status in database
             update_job_status(job_id, actual_status)
@@ -147,6 +136,20 @@ def job_status(job_id):
     })
 
 
+@api_bp.route('/check-all-printing-jobs', methods=['GET'])
+def check_all_printing_jobs():
+    """API endpoint to refresh every printing job from one CUPS snapshot"""
+    # Import here to avoid circular dependency
+    from flask import current_app
+    from services.cups_monitor import sync_printing_jobs
+    
+    results = sync_printing_jobs(current_app.extensions.get('socketio'), verbose=False)
+    return jsonify({
+        'updated': len(results),
+        'results': results
+    })
+
+
 @api_bp.route('/test-notification', methods=['POST'])
 def test_notification():
     """API endpoint to send a test notification"""
@@ -186,7 +189,7 @@ def resend_notification():
     print(f"Job IDs: {job_ids}")
     
     # Calculate total cost
-    total_cost = sum([get_job(jid)['cost'] for jid in job_ids if get_job(jid)])
+    total_cost = sum([job['cost'] for job in get_jobs(job_ids)])
     print(f"Total cost: ₹{total_cost}")
     print(f"Active subscriptions: {len(push_subscriptions)}")
     
@@ -2,18 +2,24 @@
 User-facing routes for file upload, checkout, payment, and status
 """
 import uuid
-import sqlite3
 from datetime import datetime
 from pathlib import Path
-from flask import Blueprint, request, redirect, url_for, render_template, abort, send_from_directory
+from flask import Blueprint, request, redirect, url_for, render_template, abort, send_from_directory, jsonify
 from werkzeug.utils import secure_filename
 
 from config import Config
-from models.database import save_job, get_job, update_job_settings, update_job_status
+from models.database import (
+    save_job, get_job, get_jobs, update_jobs, update_job_status, mark_jobs_submitted,
+    release_upload_blob
+)
 from services.cart_service import (
     get_cart_jobs, add_to_cart, remove_from_cart, clear_cart, get_cart_summary
 )
-from utils import allowed_file, count_pdf_pages, print_file
+from services.print_dispatcher import enqueue_print_jobs
+from services.upload_analysis import analyze_upload
+from services.upload_store import store_upload, store_spooled
+from utils import allowed_file, print_file
+from utils.upload_sessions import UploadSession
 from utils.notification_utils import push_subscriptions, send_push_notification
 
 user_bp = Blueprint('user', __name__)
@@ -38,6 +44,33 @@ def service_worker():
     return send_from_directory('.', 'sw.js', mimetype='application/javascript')
 
 
+def _add_upload_to_cart(filename, stored):
+    """Create the job for a stored upload and put it in the cart; returns its ID
+
+    New content enters the cart as 'analyzing' and is counted in the
+    background (services/upload_analysis.py); content already stored is
+    payable at once.
+    """
+    job_id = uuid.uuid4().hex
+    
+    if stored.reused:
+        print(f"♻️  {filename}: same content already stored, reusing it ({stored.pages} pages)")
+        cost = stored.pages * Config.COST_PER_PAGE
+        try:
+            save_job(job_id, filename, stored.path, stored.pages, cost,
+                     status='awaiting_payment', blob_sha256=stored.sha256)
+        except Exception:
+            release_upload_blob(stored.sha256)
+            raise
+    else:
+        save_job(job_id, filename, stored.path, 0, 0,
+                 status='analyzing', blob_sha256=stored.sha256)
+        analyze_upload(job_id, stored.path, stored.sha256)
+    
+    add_to_cart(job_id)
+    return job_id
+
+
 @user_bp.route('/upload', methods=['POST'])
 def upload():
     """Handle file upload"""
@@ -54,31 +87,16 @@ def upload():
             continue
         
         filename = secure_filename(file.filename)
-        unique_id = uuid.uuid4().hex
-        saved_name = f"{unique_id}_{filename}"
-        saved_path = Config.UPLOAD_FOLDER / saved_name
-        file.save(saved_path)
-
-        # Determine page count
-        ext = filename.rsplit('.', 1)[1].lower()
-        pages = 0
-        stored_for_print = str(saved_path)
-
-        if ext == 'pdf':
-            pages = count_pdf_pages(str(saved_path))
-        else:
-            # Images: treat as single-page documents
-            pages = 1
-
-        cost = pages * Config.COST_PER_PAGE
-
-        job_id = unique_id
-        
-        save_job(job_id, filename, stored_for_print, pages, cost, 
-                 status='awaiting_payment')
+        # Written while the request was parsed; a file already stored is
+        # only referenced, not written or counted again, and new files are
+        # counted after the redirect
+        stored = store_upload(file)
         
-        # Add to cart
-        add_to_cart(job_id)
+        # Trust the content, not the extension
+        if stored is None:
+            print(f"⚠️  Skipping {filename}: not a PDF or a supported image")
+            continue
+        _add_upload_to_cart(filename, stored)
         uploaded_count += 1
     
     if uploaded_count == 0:
@@ -87,6 +105,87 @@ def upload():
     return redirect(url_for('user.checkout'))
 
 
+def _upload_session_or_404(session_id):
+    """The resumable upload session, or a 404"""
+    upload_session = UploadSession.load(Config.UPLOAD_FOLDER, session_id)
+    if upload_session is None:
+        abort(404, 'unknown upload session')
+    return upload_session
+
+
+def _upload_session_state(upload_session):
+    """JSON body of every upload session response"""
+    return {
+        'session_id': upload_session.id,
+        'url': url_for('user.upload_session_status', session_id=upload_session.id),
+        'offset': upload_session.offset,
+        'size': upload_session.size,
+        'chunk_size': Config.UPLOAD_CHUNK_BYTES
+    }
+
+
+@user_bp.route('/upload/sessions', methods=['POST'])
+def create_upload_session():
+    """Start a resumable upload: JSON {filename, size}"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename', '')))
+    size = data.get('size')
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size required'}), 400
+    if size > Config.MAX_UPLOAD_BYTES:
+        return jsonify({'error': f'File is larger than {Config.MAX_UPLOAD_BYTES // (1024 * 1024)} MB'}), 413
+    
+    upload_session = UploadSession.create(Config.UPLOAD_FOLDER, filename, size)
+    return jsonify(_upload_session_state(upload_session)), 201
+
+
+@user_bp.route('/upload/sessions/<session_id>', methods=['GET'])
+def upload_session_status(session_id):
+    """Bytes received so far, to resume from after a dropped connection"""
+    return jsonify(_upload_session_state(_upload_session_or_404(session_id)))
+
+
+@user_bp.route('/upload/sessions/<session_id>', methods=['PUT'])
+def upload_session_chunk(session_id):
+    """Append the request body at ?offset= (must be the received offset)"""
+    upload_session = _upload_session_or_404(session_id)
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset required'}), 400
+    
+    received = upload_session.append(offset, request.stream)
+    if received is None:
+        # Out of step (e.g. a retried chunk that had arrived): resume from here
+        return jsonify(_upload_session_state(upload_session)), 409
+    return jsonify(_upload_session_state(upload_session))
+
+
+@user_bp.route('/upload/sessions/<session_id>/finalize', methods=['POST'])
+def finalize_upload_session(session_id):
+    """Turn a completely received upload into a job in the cart"""
+    upload_session = _upload_session_or_404(session_id)
+    if not upload_session.acquire():
+        return jsonify(_upload_session_state(upload_session)), 409
+    try:
+        if not upload_session.complete:
+            return jsonify(_upload_session_state(upload_session)), 409
+        stored = store_spooled(upload_session)
+    finally:
+        upload_session.release()
+    
+    # Trust the content, not the extension
+    if stored is None:
+        print(f"⚠️  Skipping {upload_session.filename}: not a PDF or a supported image")
+        return jsonify({'error': 'Not a PDF or a supported image'}), 415
+    
+    job_id = _add_upload_to_cart(upload_session.filename, stored)
+    return jsonify({'job_id': job_id, 'status': 'awaiting_payment' if stored.reused else 'analyzing',
+                    'pages': stored.pages, 'redirect': url_for('user.checkout')})
+
+
 @user_bp.route('/checkout')
 def checkout():
     """Checkout page with cart"""
@@ -110,6 +209,11 @@ def remove_from_cart_route(job_id):
     return redirect(url_for('user.checkout'))
 
 
+def _still_analyzing(jobs):
+    """True while a job's pages (and so its cost) are still being counted"""
+    return any(job['status'] == 'analyzing' for job in jobs)
+
+
 @user_bp.route('/checkout/process', methods=['POST'])
 def process_checkout():
     """Process all jobs in cart with their settings"""
@@ -117,28 +221,24 @@ def process_checkout():
     if not cart_job_ids:
         return redirect(url_for('user.index'))
     
-    # Update settings for each job based on form data
-    for job_id in cart_job_ids:
+    cart_jobs = get_jobs(cart_job_ids)
+    if _still_analyzing(cart_jobs):
+        return redirect(url_for('user.checkout'))
+    
+    # Settings and cost for the whole cart, written in a single commit
+    updates = []
+    for job in cart_jobs:
+        job_id = job['id']
         copies = int(request.form.get(f'copies_{job_id}', 1))
         orientation = request.form.get(f'orientation_{job_id}', 'portrait')
         print_color = request.form.get(f'print_color_{job_id}', 'bw')
         
-        # Update job settings
-        update_job_settings(job_id, copies, orientation, print_color)
+        # Cost is pages * copies - same price for both B&W and Color
+        new_cost = job['pages'] * Config.COST_PER_PAGE * copies
         
-        # Recalculate cost based on copies
-        job = get_job(job_id)
-        if job:
-            # Get base cost (cost per page * pages) - same price for both B&W and Color
-            base_cost = job['pages'] * Config.COST_PER_PAGE
-            new_cost = base_cost * copies
-            
-            # Update cost in database
-            con = sqlite3.connect(Config.DB_PATH)
-            cur = con.cursor()
-            cur.execute('UPDATE jobs SET cost = ? WHERE id = ?', (new_cost, job_id))
-            con.commit()
-            con.close()
+        updates.append((job_id, {'copies': copies, 'orientation': orientation,
+                                 'print_color': print_color, 'cost': new_cost}))
+    update_jobs(updates)
     
     # Redirect to payment page with QR code
     return redirect(url_for('user.payment_page'))
@@ -156,6 +256,8 @@ def payment_page():
     cart_summary = get_cart_summary()
     if cart_summary['count'] == 0:
         return redirect(url_for('user.index'))
+    if _still_analyzing(cart_summary['jobs']):
+        return redirect(url_for('user.checkout'))
     
     cart_job_ids = get_cart_jobs()
     jobs = cart_summary['jobs']
@@ -176,6 +278,8 @@ def submit_payment():
     
     if not job_ids:
         return redirect(url_for('user.index'))
+    if _still_analyzing(get_jobs(job_ids)):
+        return redirect(url_for('user.checkout'))
     
     # Handle screenshot upload
     screenshot = request.files.get('screenshot')
@@ -188,20 +292,13 @@ def submit_payment():
         screenshot.save(screenshot_path)
     
     # Update all jobs with screenshot and status
-    current_time = datetime.now().isoformat()
-    con = sqlite3.connect(Config.DB_PATH)
-    cur = con.cursor()
-    
-    for job_id in job_ids:
-        cur.execute('''UPDATE jobs 
-                       SET payment_screenshot = ?, 
-                           submitted_at = ?,
-                           status = 'pending_approval'
-                       WHERE id = ?''',
-                    (str(screenshot_path.name) if screenshot_path else None, current_time, job_id))
+    mark_jobs_submitted(job_ids,
+                        str(screenshot_path.name) if screenshot_path else None,
+                        datetime.now())
     
-    con.commit()
-    con.close()
+    # Spool the files in CUPS now, held, so approving only has to release them
+    if Config.PRINT_HOLD_ON_PAYMENT:
+        enqueue_print_jobs(job_ids, 'hold')
     
     # Send push notification to admin
     print(f"\n{'='*60}")
@@ -210,7 +307,7 @@ def submit_payment():
     print(f"Job IDs: {job_ids}")
     print(f"Screenshot: {screenshot_path.name if screenshot_path else 'None'}")
     
-    total_cost = sum([get_job(jid)['cost'] for jid in job_ids if get_job(jid)])
+    total_cost = sum([job['cost'] for job in get_jobs(job_ids)])
     print(f"Total cost: ₹{total_cost}")
     print(f"Sending notification to {len(push_subscriptions)} admin(s)...")
     
@@ -236,7 +333,7 @@ def waiting_page():
     if not job_ids:
         return redirect(url_for('user.index'))
     
-    jobs = [get_job(jid) for jid in job_ids if get_job(jid)]
+    jobs = get_jobs(job_ids)
     if not jobs:
         return redirect(url_for('user.index'))
     
@@ -256,7 +353,7 @@ def success_page():
     if not job_ids:
         return redirect(url_for('user.index'))
     
-    jobs = [get_job(jid) for jid in job_ids if get_job(jid)]
+    jobs = get_jobs(job_ids)
     if not jobs:
         return redirect(url_for('user.index'))
     
@@ -8,7 +8,8 @@ from .cart_service import (
     clear_cart,
     get_cart_summary
 )
-from .cups_monitor import start_cups_monitor, stop_cups_monitor
+from .cups_monitor import start_cups_monitor, stop_cups_monitor, wake_cups_monitor
+from .print_dispatcher import start_print_dispatcher, stop_print_dispatcher, enqueue_print_jobs
 
 __all__ = [
     'get_cart_jobs',
@@ -17,5 +18,9 @@ __all__ = [
     'clear_cart',
     'get_cart_summary',
     'start_cups_monitor',
-    'stop_cups_monitor'
+    'stop_cups_monitor',
+    'wake_cups_monitor',
+    'start_print_dispatcher',
+    'stop_print_dispatcher',
+    'enqueue_print_jobs'
 ]
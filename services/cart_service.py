@@ -1,10 +1,8 @@
 """
 Shopping cart service for managing user sessions
 """
-import sqlite3
 from flask import session
-from models.database import get_job
-from config import Config
+from models.database import get_jobs
 
 
 def get_cart_jobs():
@@ -40,14 +38,12 @@ def get_cart_summary():
     total_pages = 0
     total_cost = 0
     
-    for job_id in cart_job_ids:
-        job = get_job(job_id)
-        if job:
-            jobs.append(job)
-            copies = job.get('copies', 1)
-            total_pages += job['pages'] * copies
-            # job['cost'] already includes copies, so don't multiply again
-            total_cost += job['cost']
+    for job in get_jobs(cart_job_ids):
+        jobs.append(job)
+        copies = job.get('copies', 1)
+        total_pages += job['pages'] * copies
+        # job['cost'] already includes copies, so don't multiply again
+        total_cost += job['cost']
     
     return {
         'jobs': jobs,
@@ -0,0 +1,136 @@
+"""
+CUPS job event listener (IPP notify-pull)
+
+Holds a job-event subscription on each pooled printer and long-polls
+Get-Notifications, so a job finishing reaches customers within a moment
+instead of at the next monitor pass. Only used with the 'ipp' print backend;
+the polling monitor keeps running as a slower fallback.
+"""
+import threading
+import time
+from config import Config
+from utils.ipp_client import IPPClient, IPPError, STATUS_NOT_FOUND
+from utils.print_utils import prime_print_job_statuses
+from services.printer_pool import printer_names
+
+# Global flag to control the listener threads
+cups_events_running = False
+listener_threads = []
+
+# Printers whose subscription is currently live
+_connected = set()
+
+
+def events_connected():
+    """True while every listener holds a subscription (monitor can poll less)"""
+    return bool(listener_threads) and len(_connected) == len(listener_threads)
+
+
+def _sleep(seconds):
+    """Sleep, waking every second to check the shutdown flag"""
+    for _ in range(int(seconds)):
+        if not cups_events_running:
+            break
+        time.sleep(1)
+
+
+def _relay(socketio, app, statuses):
+    """Store and broadcast the statuses carried by a batch of events"""
+    # Import here to avoid circular dependency
+    from services.cups_monitor import sync_printing_jobs
+    if statuses:
+        prime_print_job_statuses(statuses)
+    with app.app_context():
+        sync_printing_jobs(socketio, verbose=False, statuses=statuses)
+
+
+def listen_for_cups_events(socketio, app, printer):
+    """Background task relaying one printer's CUPS job state changes as they happen"""
+    lease = Config.CUPS_EVENT_LEASE_SECONDS
+    # Dedicated connection: a waiting Get-Notifications holds it for a while
+    client = IPPClient(Config.CUPS_HOST, Config.CUPS_PORT, timeout=120)
+    subscription_id = None
+    sequence = 1
+    renew_at = 0
+    backoff = 1
+
+    print(f"📡 CUPS event listener started for {printer}")
+
+    while cups_events_running:
+        try:
+            if subscription_id is None:
+                subscription_id = client.create_printer_subscription(printer, lease_seconds=lease)
+                sequence = 1
+                renew_at = time.time() + lease / 2
+                _connected.add(printer)
+                print(f"✅ Subscribed to CUPS job events on {printer} (subscription {subscription_id})")
+                # Catch up on anything that changed while unsubscribed
+                _relay(socketio, app, None)
+            elif time.time() >= renew_at:
+                client.renew_subscription(printer, subscription_id, lease)
+                renew_at = time.time() + lease / 2
+
+            events, interval = client.get_notifications(printer, subscription_id, sequence, wait=True)
+            statuses = {}
+            for event in events:
+                sequence = max(sequence, event.get('notify-sequence-number', 0) + 1)
+                if event.get('job-id') is not None:
+                    # Later events for the same job win
+                    statuses[f"{printer}-{event['job-id']}"] = event['status']
+            if statuses:
+                _relay(socketio, app, statuses)
+            backoff = 1
+            # Pull again when the scheduler asks (notify-get-interval), renewing in time
+            if interval:
+                _sleep(min(interval, lease / 4) if lease else interval)
+
+        except IPPError as e:
+            if e.status_code == STATUS_NOT_FOUND and subscription_id is not None:
+                # Lease ran out or cupsd restarted; subscribe again
+                subscription_id = None
+                continue
+            # Anything else, including a printer CUPS does not know: back off
+            print(f"❌ CUPS event listener error: {e}")
+            _connected.discard(printer)
+            subscription_id = None
+            _sleep(backoff)
+            backoff = min(backoff * 2, 60)
+        except Exception as e:
+            print(f"❌ CUPS event listener error: {e}")
+            _connected.discard(printer)
+            subscription_id = None
+            client.close()
+            _sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    if subscription_id is not None:
+        try:
+            client.cancel_subscription(printer, subscription_id)
+        except Exception:
+            pass
+    client.close()
+    _connected.discard(printer)
+    print(f"🛑 CUPS event listener for {printer} stopped")
+
+
+def start_cups_event_listener(socketio, app):
+    """Start one event listener thread per printer if the ipp backend is in use"""
+    global cups_events_running, listener_threads
+
+    if Config.PRINT_BACKEND != 'ipp' or not Config.CUPS_EVENTS:
+        return False
+    if not cups_events_running:
+        cups_events_running = True
+        listener_threads = [
+            threading.Thread(target=listen_for_cups_events, args=(socketio, app, printer), daemon=True)
+            for printer in printer_names()
+        ]
+        for thread in listener_threads:
+            thread.start()
+    return True
+
+
+def stop_cups_event_listener():
+    """Stop the event listener threads"""
+    global cups_events_running
+    cups_events_running = False
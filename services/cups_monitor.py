@@ -2,111 +2,132 @@
 Background task for monitoring CUPS print jobs
 """
 import os
-import sqlite3
 import time
 import threading
 from datetime import datetime
 from config import Config
-from utils.print_utils import check_print_job_status
+from utils.print_utils import check_print_job_statuses
+from services import cups_events
 
 # Global flag to control background task
 cups_monitor_running = False
 monitor_thread = None
 
+# Set to make the monitor poll now (new print job, shutdown)
+_wake = threading.Event()
 
-def monitor_cups_jobs(socketio, app):
-    """Background task to monitor CUPS job status and broadcast updates via WebSocket"""
-    global cups_monitor_running
-    
+
+def sync_printing_jobs(socketio=None, verbose=True, statuses=None, printing_jobs=None):
+    """Resolve every 'printing' job against one CUPS snapshot and store changes
+
+    Shared by the monitor thread, the CUPS event listener (which passes the
+    statuses its events carried instead of a snapshot) and
+    /api/check-all-printing-jobs. Returns a list of {'job_id', 'old_status',
+    'new_status'} for the jobs that changed. Must run inside an app context
+    when socketio is given (for broadcasts).
+    """
     # Import here to avoid circular dependency
     from websocket.events import broadcast_job_update
-    from models.database import update_job_status
+    from models.database import jobs, update_jobs
+    
+    # Get all jobs currently marked as 'printing'
+    if printing_jobs is None:
+        printing_jobs = jobs.printing_jobs()
+    if not printing_jobs:
+        return []
+    
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"🔍 CUPS Monitor Check - {datetime.now().strftime('%H:%M:%S')}")
+        print(f"{'='*60}")
+        print(f"📋 Found {len(printing_jobs)} job(s) in 'printing' status")
+    
+    if statuses is None:
+        # One lpstat pass for all of them instead of up to three per job
+        statuses = check_print_job_statuses([job['print_job_id'] for job in printing_jobs])
+    
+    changes = []
+    for job in printing_jobs:
+        old_status = job['status']
+        actual_status = statuses.get(job['print_job_id'], 'unknown')
+        
+        if verbose:
+            print(f"\n📄 {job['filename']} (Job ID: {job['id'][:8]}...)")
+            print(f"   CUPS Job: {job['print_job_id']} → {actual_status}")
+        
+        # 'unknown' means CUPS has forgotten the job, not that it changed;
+        # 'pending' is still queued behind another job, i.e. still printing
+        # from the shop's side (and 'pending' here means awaiting approval)
+        if actual_status != old_status and actual_status not in ('unknown', 'pending'):
+            changes.append({'job_id': job['id'], 'old_status': old_status, 'new_status': actual_status})
+    
+    if changes:
+        # All status changes found this pass, written together in one commit
+        update_jobs((change['job_id'], {'status': change['new_status']}) for change in changes)
+        
+        if socketio:
+            print(f"📡 Broadcasting {len(changes)} update(s) to all connected clients...")
+            for change in changes:
+                status = change['new_status']
+                broadcast_job_update(socketio, change['job_id'], status, f'status_changed_to_{status}')
+    
+    if verbose:
+        print(f"✅ {len(changes)} status change(s)")
+        print(f"{'='*60}\n")
+    
+    return changes
+
+
+def wake_cups_monitor():
+    """Poll CUPS now and keep polling quickly for a while (a job was just sent)"""
+    _wake.set()
+
+
+def _next_interval(interval, active):
+    """Seconds until the next poll
+
+    Fast while jobs are printing (or one was just sent), doubling towards the
+    idle ceiling once nothing is. While CUPS events are flowing the listener
+    reports changes itself and polling is only a safety net.
+    """
+    if cups_events.events_connected():
+        return Config.CUPS_FALLBACK_POLL_SECONDS
+    if active:
+        return Config.CUPS_ACTIVE_POLL_SECONDS
+    return min(max(interval, Config.CUPS_ACTIVE_POLL_SECONDS) * 2, Config.CUPS_IDLE_POLL_SECONDS)
+
+
+def monitor_cups_jobs(socketio, app):
+    """Background task to monitor CUPS job status and broadcast updates via WebSocket"""
+    from models.database import jobs
     
     print("\n" + "="*60)
     print("🔄 CUPS Monitor Background Task Started")
     print("="*60)
-    print("📊 Checking print jobs every 30 seconds...")
+    print(f"📊 Checking print jobs every {Config.CUPS_ACTIVE_POLL_SECONDS:g}s while printing, "
+          f"backing off to {Config.CUPS_IDLE_POLL_SECONDS:g}s when idle")
+    if cups_events.start_cups_event_listener(socketio, app):
+        print(f"📡 ...every {Config.CUPS_FALLBACK_POLL_SECONDS:g}s while CUPS job events are flowing")
     print("="*60 + "\n")
     
+    interval = Config.CUPS_ACTIVE_POLL_SECONDS
+    active_until = 0
+    
     while cups_monitor_running:
+        printing_jobs = []
         try:
-            # Get all jobs currently marked as 'printing'
-            con = sqlite3.connect(Config.DB_PATH)
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
-            
-            # Check if print_job_id column exists
-            cur.execute("PRAGMA table_info(jobs)")
-            columns = [col[1] for col in cur.fetchall()]
-            
-            if 'print_job_id' not in columns:
-                con.close()
-                # Sleep in smaller intervals to be responsive to shutdown
-                for _ in range(30):
-                    if not cups_monitor_running:
-                        break
-                    time.sleep(1)
-                continue
-            
-            cur.execute('''SELECT id, print_job_id, status, filename FROM jobs 
-                           WHERE status = 'printing' AND print_job_id IS NOT NULL''')
-            printing_jobs = cur.fetchall()
-            con.close()
-            
-            if len(printing_jobs) > 0:
-                print(f"\n{'='*60}")
-                print(f"🔍 CUPS Monitor Check - {datetime.now().strftime('%H:%M:%S')}")
-                print(f"{'='*60}")
-                print(f"📋 Found {len(printing_jobs)} job(s) in 'printing' status")
-            
-            # Check each printing job
-            for job in printing_jobs:
-                if not cups_monitor_running:
-                    break
-                    
-                job_id = job['id']
-                print_job_id = job['print_job_id']
-                old_status = job['status']
-                filename = job['filename']
-                
-                print(f"\n📄 Checking: {filename} (Job ID: {job_id[:8]}...)")
-                print(f"   CUPS Job: {print_job_id}")
-                print(f"   DB Status: {old_status}")
-                
-                # Check actual status from CUPS
-                actual_status = check_print_job_status(print_job_id)
-                
-                print(f"   CUPS Status: {actual_status}")
-                
-                # If status changed, update database and broadcast
-                if actual_status != old_status and actual_status != 'unknown':
-                    print(f"\n✅ Status Changed: {old_status} → {actual_status}")
-                    
-                    # Update database within app context
-                    with app.app_context():
-                        con = sqlite3.connect(Config.DB_PATH)
-                        cur = con.cursor()
-                        cur.execute('UPDATE jobs SET status = ? WHERE id = ?', (actual_status, job_id))
-                        con.commit()
-                        con.close()
-                        
-                        # Broadcast update
-                        print(f"📡 Broadcasting update to all connected clients...")
-                        broadcast_job_update(socketio, job_id, actual_status, f'status_changed_to_{actual_status}')
-                elif actual_status == old_status:
-                    print(f"   ℹ️  No change (still {actual_status})")
-            
-            if len(printing_jobs) > 0:
-                print(f"{'='*60}\n")
-            
+            with app.app_context():
+                printing_jobs = jobs.printing_jobs()
+                sync_printing_jobs(socketio, verbose=False, printing_jobs=printing_jobs)
         except Exception as e:
             print(f"\n❌ Error in CUPS monitor: {e}")
         
-        # Wait 30 seconds before next check, but check shutdown flag every second
-        for _ in range(30):
-            if not cups_monitor_running:
-                break
-            time.sleep(1)
+        interval = _next_interval(interval, bool(printing_jobs) or time.time() < active_until)
+        
+        # Sleep until the next poll, a wake-up or shutdown
+        if _wake.wait(interval):
+            _wake.clear()
+            active_until = time.time() + Config.CUPS_ACTIVE_GRACE_SECONDS
     
     print("\n🛑 CUPS Monitor Background Task Stopped\n")
 
@@ -117,6 +138,7 @@ def start_cups_monitor(socketio, app):
     
     if not cups_monitor_running:
         cups_monitor_running = True
+        _wake.clear()
         monitor_thread = threading.Thread(target=monitor_cups_jobs, args=(socketio, app), daemon=True)
         monitor_thread.start()
         print("✅ CUPS monitoring thread started")
@@ -126,4 +148,6 @@ def stop_cups_monitor():
     """Stop the CUPS monitoring background task"""
     global cups_monitor_running
     cups_monitor_running = False
+    cups_events.stop_cups_event_listener()
+    _wake.set()
     print("🛑 CUPS monitoring thread stopping...")
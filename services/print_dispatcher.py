@@ -0,0 +1,224 @@
+"""
+Background workers sending queued print jobs to CUPS
+
+Approving a job only records it in the print queue (models/print_queue.py);
+these threads submit it, store the CUPS job ID and broadcast the result, so a
+slow CUPS filter or a large PDF never holds up the admin's request.
+
+With Config.PRINT_HOLD_ON_PAYMENT the file is already spooled, held, when
+the customer pays, and approval just releases it.
+"""
+import os
+import threading
+import time
+from config import Config
+from models.database import (
+    print_queue, queue_print_jobs, get_job, update_job, update_job_status, update_job_print_id
+)
+from services.printer_pool import choose_printer
+from utils.print_utils import print_file, release_print_job, cancel_print_job, check_print_job_status
+
+# Global flag to control the worker threads
+dispatcher_running = False
+worker_threads = []
+
+# Set when jobs are queued, so idle workers pick them up at once
+_work = threading.Event()
+
+# Longest an idle worker sleeps before looking at the queue again
+_IDLE_WAIT_SECONDS = 60
+
+
+def enqueue_print_jobs(job_ids, action='print'):
+    """Queue a 'print', 'reprint', 'hold', 'release' or 'cancel' and wake an idle worker"""
+    queue_print_jobs(job_ids, action)
+    _work.set()
+
+
+def _retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base, ... capped"""
+    return min(Config.PRINT_RETRY_BASE_SECONDS * 2 ** (attempts - 1), Config.PRINT_RETRY_MAX_SECONDS)
+
+
+def _give_up(socketio, entry, error, mark_error=True):
+    """Drop an entry from the queue, marking its job as failed"""
+    from websocket.events import broadcast_job_update
+
+    print(f"❌ Giving up on {entry['action']} for {entry['job_id'][:8]}... "
+          f"after {entry['attempts']} attempt(s): {error}")
+    print_queue.complete(entry['id'], entry['action'])
+    if mark_error:
+        update_job_status(entry['job_id'], 'error')
+        if socketio:
+            broadcast_job_update(socketio, entry['job_id'], 'error', 'print_failed')
+
+
+def _failed(socketio, entry, error, mark_error=True):
+    """Retry later with backoff, or give up after PRINT_MAX_ATTEMPTS"""
+    if entry['attempts'] >= Config.PRINT_MAX_ATTEMPTS:
+        _give_up(socketio, entry, error, mark_error)
+    else:
+        delay = _retry_delay(entry['attempts'])
+        print(f"🔁 {entry['action'].capitalize()} attempt {entry['attempts']} for {entry['job_id'][:8]}... "
+              f"failed ({error}); retrying in {delay:g}s")
+        print_queue.retry(entry['id'], delay, error)
+
+
+def _sent(socketio, job_id):
+    """A job is now printing in CUPS: poll it and tell the clients"""
+    # Import here to avoid circular dependency
+    from websocket.events import broadcast_job_update
+    from services.cups_monitor import wake_cups_monitor
+
+    wake_cups_monitor()
+    if socketio:
+        broadcast_job_update(socketio, job_id, 'printing', 'print_dispatched')
+
+
+def _submit(socketio, entry, job, hold=False):
+    """Send the job's file to CUPS, held until approval when hold=True"""
+    if not os.path.exists(job['stored_path']):
+        # A failed hold is not an error yet; approving will report it
+        _give_up(socketio, entry, 'File not found', mark_error=not hold)
+        return
+
+    # Held jobs are routed at payment time; older queued jobs may have no printer
+    printer = job['printer'] or choose_printer(job.get('print_color', 'bw'),
+                                               (job['pages'] or 0) * (job.get('copies') or 1))
+    print(f"🖨️  {'Holding' if hold else 'Dispatching'} {job['filename']} on {printer} "
+          f"({entry['action']}, attempt {entry['attempts']})")
+    result = print_file(job['stored_path'],
+                        printer=printer,
+                        copies=job.get('copies', 1),
+                        orientation=job.get('orientation', 'portrait'),
+                        color_mode=job.get('print_color', 'bw'),
+                        hold=hold)
+    if not result['success']:
+        _failed(socketio, entry, result.get('error', 'Print failed'), mark_error=not hold)
+        return
+
+    update_job(job['id'], print_job_id=result.get('job_id'), printer=printer)
+
+    if hold:
+        # The admin may have decided while CUPS was spooling the file
+        job = get_job(job['id'])
+        if job is not None and job['status'] == 'printing':
+            _release(socketio, entry, job)
+            return
+        if job is not None and job['status'] in ('rejected', 'refunded'):
+            cancel_print_job(result.get('job_id'))
+    else:
+        _sent(socketio, job['id'])
+    print_queue.complete(entry['id'], entry['action'])
+
+
+def _release(socketio, entry, job):
+    """Let a held job print; resubmit it if CUPS no longer has it"""
+    result = release_print_job(job['print_job_id'])
+    if result['success']:
+        print_queue.complete(entry['id'], entry['action'])
+        _sent(socketio, job['id'])
+        return
+
+    cups_status = check_print_job_status(job['print_job_id'])
+    if cups_status in ('printing', 'completed'):
+        # Not held (any more): released by an earlier attempt
+        print_queue.complete(entry['id'], entry['action'])
+        _sent(socketio, job['id'])
+    elif cups_status in ('unknown', 'canceled', 'aborted'):
+        print(f"⚠️  Held job {job['print_job_id']} is gone ({cups_status}); sending the file again")
+        update_job_print_id(job['id'], None)
+        _submit(socketio, entry, get_job(job['id']))
+    else:
+        _failed(socketio, entry, result.get('error', 'Release failed'))
+
+
+def dispatch_entry(socketio, entry):
+    """Carry out one claimed queue entry against the job's current state
+
+    Entries are 'hold' (spool at payment, held), 'release' (approved held
+    job), 'cancel' (rejected/refunded held job) and 'print'/'reprint'. The
+    job row decides what is still needed, so an approval or rejection that
+    lands while its hold is being spooled is still honoured.
+    """
+    job = get_job(entry['job_id'])
+    status = job['status'] if job else None
+    held_job = job['print_job_id'] if job else None
+
+    if held_job and status in ('rejected', 'refunded'):
+        result = cancel_print_job(held_job)
+        print(f"🗑️  Canceled held CUPS job {held_job}" if result['success']
+              else f"⚠️  Could not cancel CUPS job {held_job}: {result.get('error')}")
+        print_queue.complete(entry['id'], entry['action'])
+    elif status == 'pending_approval' and not held_job and entry['action'] == 'hold':
+        _submit(socketio, entry, job, hold=True)
+    elif status == 'printing' and held_job and entry['action'] in ('release', 'print'):
+        # 'print' too: the job may have been approved while its hold was
+        # being spooled, before the admin route could see the CUPS job ID
+        _release(socketio, entry, job)
+    elif status == 'printing' and not held_job:
+        _submit(socketio, entry, job)
+    else:
+        # Deleted, decided otherwise while queued, or already sent before a
+        # restart interrupted the worker
+        print(f"⏭️  Dropping queued {entry['action']} for {entry['job_id'][:8]}... (nothing left to do)")
+        print_queue.complete(entry['id'], entry['action'])
+
+
+def _wait_for_work():
+    """Sleep until something is queued or the next retry is due"""
+    next_due = print_queue.next_due()
+    timeout = _IDLE_WAIT_SECONDS if next_due is None else max(0.0, next_due - time.time())
+    _work.wait(min(timeout, _IDLE_WAIT_SECONDS))
+
+
+def print_worker(socketio, app):
+    """Background task draining the print queue"""
+    while dispatcher_running:
+        # Cleared before looking, so a job queued meanwhile re-sets it
+        _work.clear()
+        entry = None
+        try:
+            entry = print_queue.claim()
+            if entry is not None:
+                with app.app_context():
+                    dispatch_entry(socketio, entry)
+                continue
+            _wait_for_work()
+        except Exception as e:
+            print(f"\n❌ Error in print dispatcher: {e}")
+            if entry is not None:
+                try:
+                    print_queue.retry(entry['id'], _retry_delay(entry['attempts']), str(e))
+                except Exception:
+                    pass
+            time.sleep(1)
+
+
+def start_print_dispatcher(socketio, app):
+    """Start the print worker pool, resuming whatever was queued before a restart"""
+    global dispatcher_running, worker_threads
+
+    if dispatcher_running:
+        return
+    dispatcher_running = True
+
+    released = print_queue.release_claimed()
+    if released:
+        print(f"🔄 Requeued {released} print job(s) interrupted by the last shutdown")
+
+    worker_threads = [
+        threading.Thread(target=print_worker, args=(socketio, app), daemon=True, name=f'print-worker-{n}')
+        for n in range(Config.PRINT_WORKERS)
+    ]
+    for thread in worker_threads:
+        thread.start()
+    print(f"✅ Print dispatcher started ({Config.PRINT_WORKERS} worker(s))")
+
+
+def stop_print_dispatcher():
+    """Stop the print workers (a job being sent finishes first)"""
+    global dispatcher_running
+    dispatcher_running = False
+    _work.set()
+    print("🛑 Print dispatcher stopping...")
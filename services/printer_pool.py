@@ -0,0 +1,107 @@
+"""
+Printer registry and load-balanced routing
+
+Printers come from Config.PRINTERS as comma-separated "name:mode:ppm" entries,
+e.g. "Canon_G3000_W:color:10,Brother_HL1110:bw:20" (mode 'color' can also
+print black & white). Without it, or when it names no printer, the pool is
+just Config.PRINTER_NAME.
+
+A job goes to the compatible printer expected to be free soonest: the pages
+still printing on it (from the jobs table) divided by its speed.
+"""
+import math
+from collections import namedtuple
+from config import Config
+
+Printer = namedtuple('Printer', 'name color ppm')
+
+DEFAULT_PPM = 10
+
+_parsed = (None, ())
+
+
+def _parse_ppm(name, ppm):
+    """Pages per minute of a printer entry; DEFAULT_PPM when missing or invalid"""
+    if not ppm.strip():
+        return float(DEFAULT_PPM)
+    try:
+        value = float(ppm)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value) or value <= 0:
+        print(f"⚠️  Printer {name}: invalid pages per minute '{ppm}', using {DEFAULT_PPM}")
+        return float(DEFAULT_PPM)
+    return value
+
+
+def get_printers():
+    """Every configured printer, in configuration order"""
+    global _parsed
+    spec = Config.PRINTERS or f'{Config.PRINTER_NAME}:color:{DEFAULT_PPM}'
+    if _parsed[0] != spec:
+        printers = []
+        for entry in spec.split(','):
+            name, _, rest = entry.strip().partition(':')
+            mode, _, ppm = rest.partition(':')
+            if not name:
+                continue
+            printers.append(Printer(name, mode.strip().lower() != 'bw', _parse_ppm(name, ppm)))
+        if not printers:
+            # e.g. PRINTERS="," - routing needs at least one printer
+            print(f"⚠️  PRINTERS '{spec}' names no printer, using {Config.PRINTER_NAME}")
+            printers.append(Printer(Config.PRINTER_NAME, True, float(DEFAULT_PPM)))
+        _parsed = (spec, tuple(printers))
+    return _parsed[1]
+
+
+def printer_names():
+    return [printer.name for printer in get_printers()]
+
+
+def compatible_printers(color_mode='bw'):
+    """Printers able to print in color_mode ('color' or 'bw')"""
+    printers = get_printers()
+    if color_mode == 'color':
+        return [printer for printer in printers if printer.color]
+    return list(printers)
+
+
+def _loads(loads):
+    if loads is None:
+        # Import here to avoid circular dependency
+        from models.database import get_printer_loads
+        loads = get_printer_loads()
+    return loads
+
+
+def choose_printer(color_mode='bw', pages=0, loads=None):
+    """Name of the compatible printer that would finish this job first
+
+    Pass the same `loads` dict (from get_printer_loads()) when routing several
+    jobs in a row: the chosen printer's entry is bumped so the next job sees
+    the queue it just joined. Falls back to the first printer when none can
+    print in color_mode.
+    """
+    loads = _loads(loads)
+    candidates = compatible_printers(color_mode) or list(get_printers())
+    best = min(candidates, key=lambda printer: (pages + loads.get(printer.name, (0, 0))[1]) / printer.ppm)
+    jobs, queued = loads.get(best.name, (0, 0))
+    loads[best.name] = (jobs + 1, queued + pages)
+    return best.name
+
+
+def get_printer_status():
+    """Per-printer queue state for the admin dashboard"""
+    loads = _loads(None)
+    status = []
+    for printer in get_printers():
+        jobs, pages = loads.get(printer.name, (0, 0))
+        status.append({
+            'name': printer.name,
+            'mode': 'color' if printer.color else 'bw',
+            'ppm': printer.ppm,
+            'jobs': jobs,
+            'pages': pages,
+            'wait_minutes': round(pages / printer.ppm, 1)
+        })
+    return status
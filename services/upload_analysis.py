@@ -0,0 +1,166 @@
+"""
+Background analysis of new uploads
+
+upload() and the resumable finalize only save the bytes: new content goes
+into the cart as an 'analyzing' job and the request returns. A small thread
+pool then checks the file, counts its pages, renders a first-page preview
+(with pdftoppm, when it is installed) and registers the blob, and pushes the
+result to the checkout page over SocketIO: 'upload_analyzed' to the room
+'upload:<job_id>', which the page joins with 'watch_uploads'.
+
+Uploads still analyzing when the app stopped are analyzed again on start.
+"""
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config import Config
+from models.database import (
+    add_upload_blob, release_upload_blob, get_job, update_job, delete_job, count_blob_jobs,
+    get_analyzing_uploads
+)
+from models.job import preview_image_path
+from utils.file_utils import count_pdf_pages
+from utils.upload_stream import SNIFF_BYTES, sniff_file_type
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Longest pdftoppm may take over a first page
+_PREVIEW_TIMEOUT_SECONDS = 30
+
+
+def _pool():
+    """The analysis thread pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.UPLOAD_ANALYSIS_WORKERS,
+                                           thread_name_prefix='upload-analysis')
+        return _executor
+
+
+def analyze_upload(job_id, path, sha256):
+    """Queue the analysis of a newly stored upload whose job is 'analyzing'"""
+    socketio = current_app.extensions.get('socketio')
+    _pool().submit(_analyze, socketio, job_id, path, sha256)
+
+
+def analysis_update(job_id):
+    """Payload of 'upload_analyzed' for a job ('invalid' once it is gone)"""
+    job = get_job(job_id)
+    if job is None:
+        return {'job_id': job_id, 'status': 'invalid', 'error': 'The file could not be read'}
+    return {
+        'job_id': job_id,
+        'status': job['status'],
+        'pages': job['pages'],
+        'cost': job['cost'],
+        'thumbnail_url': job['thumbnail_url']
+    }
+
+
+def _emit(socketio, update):
+    if socketio:
+        socketio.emit('upload_analyzed', update, room=f"upload:{update['job_id']}", namespace='/')
+
+
+def _inspect(path):
+    """(kind, pages) of a stored upload; pages is 0 when it cannot be printed"""
+    with open(path, 'rb') as f:
+        kind = sniff_file_type(f.read(SNIFF_BYTES))
+    if kind is None:
+        return None, 0
+    # Images print as single-page documents
+    return kind, count_pdf_pages(path) if kind == 'pdf' else 1
+
+
+def _render_preview(path):
+    """Render the first page of a PDF to preview_image_path(path)
+
+    Skipped without pdftoppm (poppler-utils); the checkout page then embeds
+    the PDF itself, as before.
+    """
+    preview = preview_image_path(path)
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None or os.path.exists(preview):
+        return
+
+    # pdftoppm adds '.png' to the output root; rename once complete
+    root = os.path.join(os.path.dirname(preview), '.' + os.path.basename(preview)[:-len('.png')])
+    try:
+        result = subprocess.run(
+            [pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1',
+             '-scale-to', str(Config.UPLOAD_PREVIEW_PIXELS), path, root],
+            capture_output=True, timeout=_PREVIEW_TIMEOUT_SECONDS
+        )
+        if result.returncode == 0:
+            os.replace(root + '.png', preview)
+        else:
+            print(f"⚠️  No preview for {os.path.basename(path)}: {result.stderr.decode(errors='replace').strip()}")
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️  No preview for {os.path.basename(path)}: {e}")
+
+
+def _reject(socketio, job_id, path, sha256, error):
+    """Drop an upload that cannot be printed and tell the checkout page"""
+    print(f"⚠️  Upload {job_id[:8]}... failed analysis: {error}")
+    delete_job(job_id)
+    # Other uploads of the same bytes still being analyzed share the file
+    # (unreadable content is never registered as a blob); the last one
+    # rejected removes it
+    if not count_blob_jobs(sha256):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _emit(socketio, {'job_id': job_id, 'status': 'invalid', 'error': error})
+
+
+def _analyze(socketio, job_id, path, sha256):
+    """Validate, count and preview one upload, then make its job payable"""
+    try:
+        try:
+            kind, pages = _inspect(path)
+        except FileNotFoundError:
+            kind, pages = None, 0
+        if pages <= 0:
+            error = 'Not a readable PDF' if kind == 'pdf' else 'Not a PDF or a supported image'
+            _reject(socketio, job_id, path, sha256, error)
+            return
+
+        if kind == 'pdf':
+            _render_preview(path)
+
+        # The job's reference to the blob (jobs.blob_sha256) is counted from here
+        add_upload_blob(sha256, path, os.path.getsize(path), kind, pages)
+        job = get_job(job_id)
+        if job is None:
+            release_upload_blob(sha256)
+            return
+        update_job(job_id, pages=pages, cost=pages * Config.COST_PER_PAGE * job['copies'],
+                   status='awaiting_payment')
+        print(f"🔎 Analyzed {job['filename']}: {pages} page(s)")
+        _emit(socketio, analysis_update(job_id))
+    except Exception as e:
+        # Left 'analyzing': retried on the next start
+        print(f"❌ Error analyzing upload {job_id[:8]}...: {e}")
+
+
+def start_upload_analysis(socketio):
+    """Analyze the uploads a restart interrupted"""
+    pending = get_analyzing_uploads()
+    for job_id, path, sha256 in pending:
+        _pool().submit(_analyze, socketio, job_id, path, sha256)
+    if pending:
+        print(f"🔄 Requeued {len(pending)} upload(s) still waiting for analysis")
+    print(f"✅ Upload analysis started ({Config.UPLOAD_ANALYSIS_WORKERS} worker(s))")
+
+
+def stop_upload_analysis():
+    """Drop queued analyses (they run again on the next start)"""
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        print("🛑 Upload analysis stopped")
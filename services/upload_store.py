@@ -0,0 +1,66 @@
+"""
+Content-addressed upload store
+
+Uploads are kept in Config.UPLOAD_FOLDER as '<sha256>.<ext>', one file per
+distinct content, and registered in the blobs table with their page count
+once services/upload_analysis.py has counted them. Uploading a file the
+store already holds only takes another reference to it: the spooled bytes
+are dropped and the pages are not counted again.
+"""
+import os
+from collections import namedtuple
+
+from config import Config
+from models.database import acquire_upload_blob, release_upload_blob
+from utils.upload_stream import spool_upload
+
+# Result of store_upload(); reused is True when the content was already
+# stored, pages is None for new content (not analyzed yet)
+StoredUpload = namedtuple('StoredUpload', 'path pages kind sha256 reused')
+
+# File extension of each sniffed type, where it differs from the type name
+_EXTENSIONS = {'jpeg': 'jpg', 'tiff': 'tif'}
+
+
+def blob_path(sha256, kind):
+    """Where the blob with this content hash is stored"""
+    return str(Config.UPLOAD_FOLDER / f"{sha256}.{_EXTENSIONS.get(kind, kind)}")
+
+
+def store_upload(file):
+    """Store an uploaded FileStorage by content; returns a StoredUpload
+
+    Returns None when the file is neither a PDF nor a supported image. For
+    reused content the caller holds one reference to the blob and must hand
+    it to a job (save_job(..., blob_sha256=...)) or give it back with
+    release_upload_blob(). New content is registered, with its reference,
+    when its analysis succeeds.
+    """
+    return store_spooled(spool_upload(file, Config.UPLOAD_FOLDER))
+
+
+def store_spooled(spooled):
+    """store_upload() for bytes already received
+
+    `spooled` is an UploadSink or a complete UploadSession; it is closed
+    either way.
+    """
+    try:
+        kind = spooled.kind
+        if kind is None:
+            return None
+
+        sha256 = spooled.sha256
+        blob = acquire_upload_blob(sha256)
+        if blob is not None:
+            if os.path.exists(blob['path']):
+                return StoredUpload(blob['path'], blob['pages'], blob['kind'], sha256, True)
+            # The file went missing behind the store's back: write it again
+            release_upload_blob(sha256)
+
+        path = blob_path(sha256, kind)
+        spooled.commit(path)
+        return StoredUpload(path, None, kind, sha256, False)
+    finally:
+        # Drops the received copy unless it was committed
+        spooled.close()
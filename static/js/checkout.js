@@ -1,32 +1,134 @@
-// Checkout page functionality
-let copies = 1;
-
-function changeCopies(delta) {
-    copies = Math.max(1, Math.min(99, copies + delta));
-    document.getElementById('copiesValue').textContent = copies;
-    document.getElementById('copiesInput').value = copies;
-    
-    // Get base values from data attributes
-    const form = document.getElementById('checkoutForm');
-    const baseCost = parseFloat(form.dataset.baseCost);
-    const basePages = parseInt(form.dataset.basePages);
-    
-    // Update totals
-    const totalPages = basePages * copies;
-    const totalCost = baseCost * copies;
-    
-    document.getElementById('totalPages').textContent = totalPages;
-    document.getElementById('totalCost').textContent = totalCost.toFixed(0);
-    
-    // Update button states
-    document.getElementById('decreaseBtn').disabled = copies <= 1;
-    document.getElementById('increaseBtn').disabled = copies >= 99;
+// Checkout uploads - resumable chunked uploads for large files on flaky links
+//
+// Protocol (routes/user_routes.py):
+//   POST /upload/sessions {filename, size}      -> {url, offset, chunk_size}
+//   PUT  <url>?offset=N  (chunk bytes)          -> {offset}   (409: resume from body.offset)
+//   GET  <url>                                  -> {offset}
+//   POST <url>/finalize                         -> {job_id, status, redirect}
+//
+// The session URL is remembered in localStorage, so picking the same file
+// again after a reload carries on where the last attempt stopped.
+//
+// New files reach the cart as 'analyzing' jobs; their page count and preview
+// arrive over SocketIO (services/upload_analysis.py).
+
+const UPLOAD_MAX_RETRIES = 30;        // failed requests in a row before giving up
+const UPLOAD_MAX_BACKOFF_MS = 30000;
+
+function uploadStorageKey(file) {
+    return `upload:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
 }
 
-function removeFile() {
-    if (confirm('Are you sure you want to remove this file?')) {
-        window.location.href = '/';
+function waitUntilOnline() {
+    if (navigator.onLine !== false) return Promise.resolve();
+    return new Promise(resolve => window.addEventListener('online', resolve, { once: true }));
+}
+
+async function uploadRequest(method, url, body) {
+    const options = { method: method, body: body };
+    if (body && !(body instanceof Blob)) {
+        options.headers = { 'Content-Type': 'application/json' };
+        options.body = JSON.stringify(body);
     }
+    const response = await fetch(url, options);
+    const data = await response.json().catch(() => ({}));
+    return { status: response.status, data: data };
+}
+
+async function openUploadSession(file) {
+    const key = uploadStorageKey(file);
+    const savedUrl = localStorage.getItem(key);
+    if (savedUrl) {
+        // Throws when offline, keeping the saved session for the next try
+        const { status, data } = await uploadRequest('GET', savedUrl);
+        if (status === 200) return data;
+        localStorage.removeItem(key);
+    }
+
+    const { status, data } = await uploadRequest('POST', '/upload/sessions', { filename: file.name, size: file.size });
+    if (status !== 201) {
+        throw new Error(data.error || 'Upload failed');
+    }
+    localStorage.setItem(key, data.url);
+    return data;
+}
+
+// Upload one file; onProgress(fraction) is called as chunks arrive.
+// Resolves with the finalize response ({job_id, status, pages, redirect}).
+async function uploadFileResumable(file, onProgress) {
+    const session = await openUploadSession(file);
+    let offset = session.offset;
+    let failures = 0;
+
+    while (true) {
+        if (onProgress) onProgress(file.size ? offset / file.size : 1);
+
+        try {
+            let result;
+            if (offset < file.size) {
+                const chunk = file.slice(offset, offset + session.chunk_size);
+                result = await uploadRequest('PUT', `${session.url}?offset=${offset}`, chunk);
+            } else {
+                result = await uploadRequest('POST', `${session.url}/finalize`);
+                if (result.status === 200) {
+                    localStorage.removeItem(uploadStorageKey(file));
+                    return result.data;
+                }
+            }
+
+            if (result.status === 200 || (result.status === 409 && result.data.offset !== offset)) {
+                // 409: the server has a different offset (e.g. a retried chunk) - continue from there
+                if (result.data.offset > offset) failures = 0;
+                offset = result.data.offset;
+                continue;
+            }
+            if (result.status === 404) {
+                localStorage.removeItem(uploadStorageKey(file));
+                if (offset >= file.size) {
+                    // Finalized by an earlier attempt whose response was lost
+                    return { redirect: '/checkout' };
+                }
+                throw new Error('Upload session expired');
+            }
+            if (result.status < 500 && result.status !== 409) {
+                localStorage.removeItem(uploadStorageKey(file));
+                throw new Error(result.data.error || 'Upload failed');
+            }
+            // 5xx, or the session is busy with a request that is still running: retry
+        } catch (error) {
+            if (!(error instanceof TypeError)) throw error;
+            // TypeError: the request never completed (connection dropped)
+        }
+
+        failures += 1;
+        if (failures > UPLOAD_MAX_RETRIES) {
+            throw new Error('Upload failed - connection lost');
+        }
+        await waitUntilOnline();
+        await sleep(Math.min(UPLOAD_MAX_BACKOFF_MS, 500 * 2 ** Math.min(failures, 6)));
+
+        // Ask how much arrived before carrying on
+        try {
+            const { status, data } = await uploadRequest('GET', session.url);
+            if (status === 200) offset = data.offset;
+        } catch (error) {
+            // Still offline; retried on the next pass
+        }
+    }
+}
+
+// Call onUpdate({job_id, status, pages, cost, thumbnail_url} or
+// {job_id, status: 'invalid', error}) as each job's analysis finishes
+function watchUploadAnalysis(jobIds, onUpdate) {
+    if (!jobIds.length || typeof io === 'undefined') return;
+    const socket = io();
+    // Also after a reconnect: results sent while disconnected are sent again
+    socket.on('connect', () => socket.emit('watch_uploads', { job_ids: jobIds }));
+    socket.on('upload_analyzed', onUpdate);
 }
 
 function triggerFileUpload() {
@@ -36,40 +138,28 @@ function triggerFileUpload() {
 function handleAdditionalFile(event) {
     const file = event.target.files[0];
     if (!file) return;
-    
-    // Create FormData and upload the file
-    const formData = new FormData();
-    formData.append('file', file);
-    
-    // Show loading indicator
+
+    // Show progress on the button
     const addFileBtn = document.querySelector('.add-files-btn');
     const originalContent = addFileBtn.innerHTML;
-    addFileBtn.innerHTML = '<span style="font-size: 0.9rem;">Uploading...</span>';
     addFileBtn.disabled = true;
-    
-    // Upload the file
-    fetch('/upload', {
-        method: 'POST',
-        body: formData
-    })
-    .then(response => {
-        if (response.redirected) {
-            // If successful, reload to show the new file
-            window.location.href = response.url;
-        } else {
-            throw new Error('Upload failed');
-        }
+
+    uploadFileResumable(file, fraction => {
+        addFileBtn.innerHTML = `<span style="font-size: 0.9rem;">Uploading ${Math.floor(fraction * 100)}%</span>`;
     })
-    .catch(error => {
-        console.error('Error uploading file:', error);
-        alert('Failed to upload file. Please try again.');
-        addFileBtn.innerHTML = originalContent;
-        addFileBtn.disabled = false;
-    });
+        .then(() => {
+            // Refresh cart widget before reload
+            if (window.refreshCart) {
+                window.refreshCart();
+            }
+            // Reload page to show new file in cart
+            window.location.reload();
+        })
+        .catch(error => {
+            console.error('Error uploading file:', error);
+            alert(`${error.message}. Please try again - the upload continues where it stopped.`);
+            addFileBtn.innerHTML = originalContent;
+            addFileBtn.disabled = false;
+            event.target.value = '';
+        });
 }
-
-// Initialize on page load
-document.addEventListener('DOMContentLoaded', function() {
-    // Initialize button states
-    document.getElementById('decreaseBtn').disabled = true;
-});
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the CUPS job event listener
+
+Runs services.cups_events.listen_for_cups_events() against the fakecups
+scheduler stub, with the relay to the database and WebSocket replaced by a
+recorder: the listener subscribes, relays a job's state changes, subscribes
+again after its lease has expired, and backs off (instead of retrying in a
+loop) on a printer the scheduler does not know.
+
+Usage:
+    python3 test_cups_events.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+from fakecups import FakeCupsServer
+from services import cups_events
+from utils.ipp_client import IPPClient
+
+PRINTER = 'Test_Printer'
+
+failures = []
+relayed = []  # statuses dicts (None for a catch-up pass)
+
+
+def check(name, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {name}{f' ({detail})' if detail and not ok else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def record(socketio, app, statuses):
+    relayed.append(statuses)
+
+
+def wait_until(condition, timeout):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def relayed_status(job_key):
+    """Last status relayed for a 'printer-id' job key"""
+    found = None
+    for statuses in relayed:
+        if statuses and job_key in statuses:
+            found = statuses[job_key]
+    return found
+
+
+def start_listener(printer):
+    thread = threading.Thread(target=cups_events.listen_for_cups_events, args=(None, None, printer), daemon=True)
+    thread.start()
+    return thread
+
+
+def run(cups, document):
+    client = IPPClient(cups.host, cups.port)
+    listener = start_listener(PRINTER)
+
+    # Subscribe
+    check('Listener subscribes', wait_until(lambda: PRINTER in cups_events._connected, 5))
+    first_subscription = max(cups.subscriptions)
+    check('Subscribing triggers a catch-up pass', None in relayed)
+
+    # Notification
+    job_id = client.print_job(PRINTER, document)['job-id']
+    check('Job completion is relayed', wait_until(lambda: relayed_status(f'{PRINTER}-{job_id}') == 'completed', 10),
+          relayed_status(f'{PRINTER}-{job_id}'))
+
+    # Expired lease: subscribe again at once and keep relaying
+    cups.expire_subscriptions()
+    check('Expired subscription is replaced',
+          wait_until(lambda: any(sid > first_subscription for sid in cups.subscriptions), 10))
+    job_id = client.print_job(PRINTER, document)['job-id']
+    check('Events flow on the new subscription',
+          wait_until(lambda: relayed_status(f'{PRINTER}-{job_id}') == 'completed', 10),
+          relayed_status(f'{PRINTER}-{job_id}'))
+
+    # Unknown printer: back off rather than retrying in a loop
+    before = cups.requests
+    unknown = start_listener('No_Such_Printer')
+    time.sleep(3)
+    # About one request for the known printer's long poll per second, plus
+    # three subscribe attempts (backing off 1s, then 2s) for the unknown one
+    extra = cups.requests - before
+    check('Unknown printer backs off', extra < 20, f'{extra} requests in 3s')
+    check('Unknown printer never counts as connected', 'No_Such_Printer' not in cups_events._connected)
+
+    cups_events.cups_events_running = False
+    listener.join(10)
+    unknown.join(10)
+    check('Listeners stop', not listener.is_alive() and not unknown.is_alive())
+    check('Subscription cancelled on shutdown', not cups.subscriptions, list(cups.subscriptions))
+    client.close()
+
+
+if __name__ == '__main__':
+    print(f"\n{'#'*60}")
+    print(f"# CUPS EVENT LISTENER TEST (fakecups)")
+    print(f"{'#'*60}\n")
+
+    with FakeCupsServer(printers=[PRINTER], seconds_per_job=0.5, notify_wait=1) as cups, \
+            tempfile.TemporaryDirectory() as tmp:
+        Config.CUPS_HOST, Config.CUPS_PORT = cups.host, cups.port
+        # Short lease: the listener pulls again within lease / 4 seconds
+        Config.CUPS_EVENT_LEASE_SECONDS = 8
+        cups_events._relay = record
+        cups_events.cups_events_running = True
+
+        document = os.path.join(tmp, 'test.pdf')
+        with open(document, 'wb') as f:
+            f.write(b'%PDF-1.4\n<< /Type /Page >>\n')
+        run(cups, document)
+
+    print(f"\n{'='*60}")
+    print(f"{'✅ All checks passed' if not failures else f'❌ {len(failures)} check(s) failed'}")
+    print(f"{'='*60}\n")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the native IPP client
+
+Runs utils.ipp_client.IPPClient - what the 'ipp' print backend uses -
+against the fakecups scheduler stub: submitting a job, reading its
+attributes, and holding, releasing and cancelling one. No printer or CUPS
+installation is needed.
+
+Usage:
+    python3 test_ipp_client.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+from fakecups import FakeCupsServer
+from utils.ipp_client import (
+    IPPClient, IPPError, STATUS_NOT_FOUND, STATUS_NOT_POSSIBLE, JOB_HELD, JOB_CANCELED
+)
+
+PRINTER = 'Test_Printer'
+
+failures = []
+
+
+def check(name, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {name}{f' ({detail})' if detail and not ok else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def wait_for_status(client, job_id, status, timeout=10):
+    """Poll Get-Job-Attributes until the job reaches status; the last attributes"""
+    deadline = time.time() + timeout
+    job = client.get_job_attributes(PRINTER, job_id)
+    while job and job['status'] != status and time.time() < deadline:
+        time.sleep(0.1)
+        job = client.get_job_attributes(PRINTER, job_id)
+    return job
+
+
+def run(client, document):
+    # Submit
+    job = client.print_job(PRINTER, document, copies=2, job_name='test.pdf')
+    job_id = job['job-id']
+    check('Print-Job returns the new job ID', isinstance(job_id, int))
+    check('A job on an idle printer starts printing', job['status'] == 'printing', job['status'])
+
+    # Get-Job-Attributes
+    attributes = client.get_job_attributes(PRINTER, job_id)
+    check('Get-Job-Attributes finds the job', attributes is not None and attributes['job-id'] == job_id)
+    check('Impressions count pages and copies', attributes['job-impressions'] == 6, attributes['job-impressions'])
+    check('Unknown job reads as None', client.get_job_attributes(PRINTER, 999999) is None)
+
+    # Hold, release, cancel
+    held = client.print_job(PRINTER, document, hold=True)
+    held_id = held['job-id']
+    check('hold=True keeps the job held', client.get_job_attributes(PRINTER, held_id)['job-state'] == JOB_HELD)
+    client.release_job(PRINTER, held_id)
+    released = client.get_job_attributes(PRINTER, held_id)
+    check('Release-Job queues it', released['job-state'] != JOB_HELD and released['status'] in ('pending', 'printing'),
+          released['status'])
+    try:
+        client.release_job(PRINTER, held_id)
+        check('Releasing twice is refused', False, 'no error')
+    except IPPError as e:
+        check('Releasing twice is refused', e.status_code == STATUS_NOT_POSSIBLE, hex(e.status_code))
+
+    client.cancel_job(PRINTER, held_id)
+    canceled = client.get_job_attributes(PRINTER, held_id)
+    check('Cancel-Job cancels it', canceled['job-state'] == JOB_CANCELED, canceled['status'])
+    try:
+        client.cancel_job(PRINTER, held_id)
+        check('Cancelling a finished job is refused', False, 'no error')
+    except IPPError as e:
+        check('Cancelling a finished job is refused', e.status_code == STATUS_NOT_POSSIBLE, hex(e.status_code))
+
+    # The first job runs to completion
+    finished = wait_for_status(client, job_id, 'completed')
+    check('The submitted job completes', finished['status'] == 'completed', finished['status'])
+    check('Get-Jobs lists it as completed',
+          job_id in [j['job-id'] for j in client.get_jobs(PRINTER, 'completed')])
+
+    try:
+        client.print_job('No_Such_Printer', document)
+        check('Unknown printer is reported', False, 'no error')
+    except IPPError as e:
+        check('Unknown printer is reported', e.status_code == STATUS_NOT_FOUND, hex(e.status_code))
+
+
+if __name__ == '__main__':
+    print(f"\n{'#'*60}")
+    print(f"# IPP CLIENT TEST (fakecups)")
+    print(f"{'#'*60}\n")
+
+    with FakeCupsServer(printers=[PRINTER], seconds_per_job=1.0) as cups, \
+            tempfile.TemporaryDirectory() as tmp:
+        document = os.path.join(tmp, 'test.pdf')
+        with open(document, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + b'<< /Type /Page >>\n' * 3)
+        client = IPPClient(cups.host, cups.port)
+        try:
+            run(client, document)
+        finally:
+            client.close()
+
+    print(f"\n{'='*60}")
+    print(f"{'✅ All checks passed' if not failures else f'❌ {len(failures)} check(s) failed'}")
+    print(f"{'='*60}\n")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the lpstat job listing parser
+
+Feeds utils.lpstat_parser canned `lpstat -l` output: job IDs are matched
+exactly, statuses come from the Status/Alerts lines, and LpstatHistory
+ignores unindented lines that are not job headers (lpstat warnings).
+
+Usage:
+    python3 test_lpstat_parser.py
+"""
+import sys
+
+from utils.lpstat_parser import parse_lpstat, LpstatHistory
+
+PRINTER = 'Canon_G3000_W'
+
+failures = []
+
+
+def check(name, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {name}{f' ({detail})' if detail and not ok else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def job(number, alerts, user='pi'):
+    return (f"{PRINTER}-{number}       {user}    1024   Sat 17 Oct 2026 10:00:00 AM IST\n"
+            f"        Alerts: {alerts}\n"
+            f"        queued for {PRINTER}\n")
+
+
+def test_parse_lpstat():
+    active = (f"{PRINTER}-12       pi    1024   Sat 17 Oct 2026 10:00:00 AM IST\n"
+              f"        Status: Waiting for printer to become available.\n"
+              f"        Alerts: job-hold-until-specified\n"
+              f"{PRINTER}-123      printing    2048   Sat 17 Oct 2026 10:01:00 AM IST\n"
+              f"        Status: Sending data to printer.\n"
+              f"        Alerts: job-printing\n")
+    jobs = parse_lpstat(active)
+    check('Both active jobs are indexed', set(jobs) == {f'{PRINTER}-12', f'{PRINTER}-123'}, sorted(jobs))
+    check('Job IDs match exactly', jobs[f'{PRINTER}-12'].status == 'pending', jobs[f'{PRINTER}-12'].status)
+    check('Status is not read from the user name', jobs[f'{PRINTER}-123'].user == 'printing'
+          and jobs[f'{PRINTER}-123'].status == 'printing')
+    check('Header fields are parsed', jobs[f'{PRINTER}-123'].size == 2048 and jobs[f'{PRINTER}-123'].printer == PRINTER)
+
+    history = parse_lpstat(job(1, 'job-completed-successfully') + job(2, 'job-canceled-by-user'), completed=True)
+    check('Completed history statuses', (history[f'{PRINTER}-1'].status, history[f'{PRINTER}-2'].status)
+          == ('completed', 'canceled'))
+
+
+def test_history():
+    index = LpstatHistory()
+    output = job(1, 'job-completed-successfully') + job(2, 'aborted-by-system')
+    check('First update indexes every job', index.update(output) == 2 and len(index.jobs) == 2)
+    check('Unchanged history adds nothing', index.update(output) == 0)
+
+    # A stray unindented line is not a job header
+    output += f"lpstat: warning something {PRINTER}\n" + job(3, 'job-canceled-by-user')
+    new = index.update(output)
+    check('Non-job lines are ignored', 'lpstat:' not in index.jobs, sorted(index.jobs))
+    check('Only the new job is added', new == 1 and set(index.jobs) == {f'{PRINTER}-{n}' for n in (1, 2, 3)},
+          sorted(index.jobs))
+    check('New job is parsed from its own section', index.get(f'{PRINTER}-3').status == 'canceled'
+          and index.get(f'{PRINTER}-3').user == 'pi', index.get(f'{PRINTER}-3'))
+
+    # A job ID that only appears inside another line is not its header
+    index.update(job(3, 'job-canceled-by-user') + f"        note: {PRINTER}-4 was merged\n")
+    check('Purged jobs are dropped', set(index.jobs) == {f'{PRINTER}-3'}, sorted(index.jobs))
+
+
+if __name__ == '__main__':
+    print(f"\n{'#'*60}")
+    print(f"# LPSTAT PARSER TEST")
+    print(f"{'#'*60}\n")
+
+    test_parse_lpstat()
+    test_history()
+
+    print(f"\n{'='*60}")
+    print(f"{'✅ All checks passed' if not failures else f'❌ {len(failures)} check(s) failed'}")
+    print(f"{'='*60}\n")
+    sys.exit(1 if failures else 0)
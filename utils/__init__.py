@@ -2,7 +2,11 @@
 Utility module initialization
 """
 from .file_utils import allowed_file, truncate_filename, count_pdf_pages
-from .print_utils import print_file, check_print_job_status
+from .print_utils import (
+    print_file, release_print_job, cancel_print_job,
+    check_print_job_status, check_print_job_statuses, get_print_job_snapshot,
+    cached_print_job_status, prime_print_job_statuses
+)
 from .notification_utils import send_push_notification, get_subscriptions_count, add_subscription, push_subscriptions
 
 __all__ = [
@@ -10,7 +14,13 @@ __all__ = [
     'truncate_filename', 
     'count_pdf_pages',
     'print_file',
+    'release_print_job',
+    'cancel_print_job',
     'check_print_job_status',
+    'check_print_job_statuses',
+    'get_print_job_snapshot',
+    'cached_print_job_status',
+    'prime_print_job_statuses',
     'send_push_notification',
     'get_subscriptions_count',
     'add_subscription',
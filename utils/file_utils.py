@@ -4,6 +4,7 @@ File handling utilities
 from pathlib import Path
 from PyPDF2 import PdfReader
 from config import Config
+from .pdf_pages import read_pdf_page_count
 
 
 def allowed_file(filename: str) -> bool:
@@ -35,7 +36,14 @@ def truncate_filename(filename: str, max_length: int = 20) -> str:
 
 
 def count_pdf_pages(pdf_path: str) -> int:
-    """Count pages in a PDF file using PyPDF2"""
+    """Count pages in a PDF file
+
+    Reads /Count of the page tree root (utils/pdf_pages.py); only files that
+    cannot be read that way are parsed in full by PyPDF2.
+    """
+    pages = read_pdf_page_count(pdf_path)
+    if pages is not None:
+        return pages
     try:
         reader = PdfReader(pdf_path)
         return len(reader.pages)
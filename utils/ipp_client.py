@@ -0,0 +1,462 @@
+"""
+Minimal IPP/1.1 client for the local CUPS scheduler
+
+Talks to cupsd over HTTP (localhost:631 by default) on one keep-alive
+connection instead of forking lp/lpstat and scraping their text output.
+Covers Print-Job, Cancel-Job, Release-Job, Get-Jobs, Get-Job-Attributes and
+the notify-pull subscription operations. The message codec is also used by the stub
+scheduler in fakecups/.
+"""
+import http.client
+import os
+import socket
+import struct
+import threading
+
+IPP_VERSION = (1, 1)
+
+# Operation IDs
+PRINT_JOB = 0x0002
+CANCEL_JOB = 0x0008
+GET_JOB_ATTRIBUTES = 0x0009
+GET_JOBS = 0x000A
+RELEASE_JOB = 0x000D
+CREATE_PRINTER_SUBSCRIPTIONS = 0x0016
+CREATE_JOB_SUBSCRIPTIONS = 0x0017
+RENEW_SUBSCRIPTION = 0x001A
+CANCEL_SUBSCRIPTION = 0x001B
+GET_NOTIFICATIONS = 0x001C
+
+# Delimiter tags
+OPERATION_ATTRIBUTES = 0x01
+JOB_ATTRIBUTES = 0x02
+END_OF_ATTRIBUTES = 0x03
+PRINTER_ATTRIBUTES = 0x04
+UNSUPPORTED_ATTRIBUTES = 0x05
+SUBSCRIPTION_ATTRIBUTES = 0x06
+EVENT_NOTIFICATION_ATTRIBUTES = 0x07
+
+# Value tags
+TAG_UNSUPPORTED = 0x10
+TAG_UNKNOWN = 0x12
+TAG_NO_VALUE = 0x13
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_OCTET_STRING = 0x30
+TAG_DATETIME = 0x31
+TAG_RESOLUTION = 0x32
+TAG_RANGE = 0x33
+TAG_BEGIN_COLLECTION = 0x34
+TAG_TEXT_WITH_LANGUAGE = 0x35
+TAG_NAME_WITH_LANGUAGE = 0x36
+TAG_END_COLLECTION = 0x37
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_URI_SCHEME = 0x46
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+TAG_MEMBER_NAME = 0x4A
+
+# Status codes
+STATUS_OK = 0x0000
+STATUS_NOT_POSSIBLE = 0x0404
+STATUS_NOT_FOUND = 0x0406
+STATUS_BAD_REQUEST = 0x0400
+STATUS_OPERATION_NOT_SUPPORTED = 0x0501
+STATUS_SERVICE_UNAVAILABLE = 0x0502
+
+# job-state enum (RFC 8011 5.3.7)
+JOB_PENDING = 3
+JOB_HELD = 4
+JOB_PROCESSING = 5
+JOB_STOPPED = 6
+JOB_CANCELED = 7
+JOB_ABORTED = 8
+JOB_COMPLETED = 9
+
+# job-state -> status names used by the app (same as check_print_job_status)
+JOB_STATE_STATUS = {
+    JOB_PENDING: 'pending',
+    JOB_HELD: 'pending',
+    JOB_PROCESSING: 'printing',
+    JOB_STOPPED: 'printing',
+    JOB_CANCELED: 'canceled',
+    JOB_ABORTED: 'aborted',
+    JOB_COMPLETED: 'completed',
+}
+
+_INTEGER_TAGS = (TAG_INTEGER, TAG_ENUM)
+_STRING_TAGS = (TAG_TEXT, TAG_NAME, TAG_KEYWORD, TAG_URI, TAG_URI_SCHEME,
+                TAG_CHARSET, TAG_LANGUAGE, TAG_MIME_TYPE, TAG_MEMBER_NAME)
+
+# Attributes requested for every job lookup
+JOB_STATUS_ATTRIBUTES = (
+    'job-id', 'job-state', 'job-state-reasons', 'job-name', 'job-printer-uri',
+    'time-at-creation', 'time-at-processing', 'time-at-completed',
+    'job-media-sheets-completed'
+)
+
+# Events relayed to the app
+JOB_EVENTS = ('job-created', 'job-state-changed', 'job-completed')
+
+
+class IPPError(Exception):
+    """The scheduler answered with a non-successful IPP status code"""
+
+    def __init__(self, status_code, message=''):
+        super().__init__(f'IPP status 0x{status_code:04x} {message}'.strip())
+        self.status_code = status_code
+
+
+# ---------- codec ----------
+
+def _encode_value(tag, value):
+    if tag in _INTEGER_TAGS:
+        return struct.pack('>i', value)
+    if tag == TAG_BOOLEAN:
+        return b'\x01' if value else b'\x00'
+    if tag in (TAG_NO_VALUE, TAG_UNKNOWN, TAG_UNSUPPORTED):
+        return b''
+    if tag == TAG_RANGE:
+        return struct.pack('>ii', *value)
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+def encode_message(code, request_id, groups, version=IPP_VERSION):
+    """Encode an IPP request or response
+
+    `code` is the operation ID (requests) or status code (responses). `groups`
+    is a list of (delimiter tag, [(name, value tag, value)]), where a list value
+    encodes a multi-valued attribute.
+    """
+    out = bytearray(struct.pack('>BBHI', version[0], version[1], code, request_id))
+    for group_tag, attributes in groups:
+        out.append(group_tag)
+        for name, tag, values in attributes:
+            if not isinstance(values, list):
+                values = [values]
+            for index, value in enumerate(values):
+                encoded_name = name.encode('ascii') if index == 0 else b''
+                encoded = _encode_value(tag, value)
+                out += struct.pack('>BH', tag, len(encoded_name)) + encoded_name
+                out += struct.pack('>H', len(encoded)) + encoded
+    out.append(END_OF_ATTRIBUTES)
+    return bytes(out)
+
+
+def _decode_value(tag, raw):
+    if tag in _INTEGER_TAGS:
+        return struct.unpack('>i', raw)[0]
+    if tag == TAG_BOOLEAN:
+        return raw != b'\x00'
+    if tag in _STRING_TAGS:
+        return raw.decode('utf-8', 'replace')
+    if tag in (TAG_TEXT_WITH_LANGUAGE, TAG_NAME_WITH_LANGUAGE):
+        # language length + language, then text length + text
+        language_length = struct.unpack('>H', raw[:2])[0]
+        text_start = 2 + language_length + 2
+        return raw[text_start:].decode('utf-8', 'replace')
+    if tag == TAG_RANGE:
+        return struct.unpack('>ii', raw)
+    if tag == TAG_RESOLUTION:
+        return struct.unpack('>iib', raw)
+    if tag in (TAG_NO_VALUE, TAG_UNKNOWN, TAG_UNSUPPORTED):
+        return None
+    return raw
+
+
+def decode_message(data):
+    """Decode an IPP message
+
+    Returns (version, code, request_id, groups, payload): groups is a list of
+    (delimiter tag, {name: [values]}) and payload is any document data that
+    follows the attributes.
+    """
+    if len(data) < 9:
+        raise ValueError('Truncated IPP message')
+    major, minor, code, request_id = struct.unpack('>BBHI', data[:8])
+    groups = []
+    attributes = None
+    collection_depth = 0
+    last_name = None
+    pos = 8
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        if tag == END_OF_ATTRIBUTES:
+            break
+        if tag < 0x10:
+            attributes = {}
+            groups.append((tag, attributes))
+            continue
+        if attributes is None or pos + 4 > len(data):
+            raise ValueError('Malformed IPP message')
+        name_length = struct.unpack('>H', data[pos:pos + 2])[0]
+        name = data[pos + 2:pos + 2 + name_length].decode('ascii', 'replace')
+        pos += 2 + name_length
+        value_length = struct.unpack('>H', data[pos:pos + 2])[0]
+        raw = data[pos + 2:pos + 2 + value_length]
+        pos += 2 + value_length
+
+        # Collections are skipped: no job operation used here needs them
+        if tag == TAG_BEGIN_COLLECTION:
+            if collection_depth == 0 and name:
+                last_name = name
+                attributes.setdefault(name, [])
+            collection_depth += 1
+            continue
+        if tag == TAG_END_COLLECTION:
+            collection_depth -= 1
+            continue
+        if collection_depth:
+            continue
+
+        if name:
+            last_name = name
+            attributes.setdefault(name, []).append(_decode_value(tag, raw))
+        elif last_name is not None:
+            # Additional value of the previous attribute
+            attributes[last_name].append(_decode_value(tag, raw))
+    return (major, minor), code, request_id, groups, data[pos:]
+
+
+def job_from_attributes(attributes):
+    """Flatten one job's attribute group into a plain dict"""
+    job = {}
+    for name, values in attributes.items():
+        job[name] = values if name == 'job-state-reasons' else (values[0] if values else None)
+    job['status'] = JOB_STATE_STATUS.get(job.get('job-state'), 'unknown')
+    return job
+
+
+# ---------- client ----------
+
+class IPPClient:
+    """Keep-alive IPP connection to one CUPS scheduler
+
+    Thread-safe: requests are serialized on the single connection, which is
+    reopened transparently if the scheduler closed it.
+    """
+
+    def __init__(self, host='localhost', port=631, user='rpiprint', timeout=10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.timeout = timeout
+        self._connection = None
+        self._request_id = 0
+        self._lock = threading.Lock()
+
+    def printer_uri(self, printer):
+        return f'ipp://{self.host}:{self.port}/printers/{printer}'
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def _operation_attributes(self, printer, extra=()):
+        return [
+            ('attributes-charset', TAG_CHARSET, 'utf-8'),
+            ('attributes-natural-language', TAG_LANGUAGE, 'en'),
+            ('printer-uri', TAG_URI, self.printer_uri(printer)),
+            ('requesting-user-name', TAG_NAME, self.user),
+            *extra
+        ]
+
+    def _connect(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        connection.connect()
+        # Small request/response pairs: don't let Nagle hold them back
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _send(self, path, body, document=None):
+        """POST one request; `document` is an open file streamed after the attributes"""
+        length = len(body)
+        if document is not None:
+            document_start = document.tell()
+            length += os.fstat(document.fileno()).st_size - document_start
+
+        for attempt in (1, 2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.putrequest('POST', path)
+                self._connection.putheader('Content-Type', 'application/ipp')
+                self._connection.putheader('Content-Length', str(length))
+                # Headers and attributes leave in one segment
+                self._connection.endheaders(body)
+                if document is not None:
+                    document.seek(document_start)
+                    while True:
+                        chunk = document.read(64 * 1024)
+                        if not chunk:
+                            break
+                        self._connection.send(chunk)
+                response = self._connection.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self._connection.close()
+                    self._connection = None
+                if response.status != 200:
+                    raise IPPError(STATUS_BAD_REQUEST, f'HTTP {response.status}')
+                return data
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    BrokenPipeError, ConnectionResetError):
+                # Idle keep-alive connection was dropped by the scheduler - reconnect once
+                self._connection.close()
+                self._connection = None
+                if attempt == 2:
+                    raise
+            except Exception:
+                if self._connection:
+                    self._connection.close()
+                    self._connection = None
+                raise
+
+    def request(self, operation, printer, attributes=(), groups=(), document=None):
+        """Send one operation and return the decoded response groups"""
+        with self._lock:
+            self._request_id += 1
+            body = encode_message(operation, self._request_id, [
+                (OPERATION_ATTRIBUTES, self._operation_attributes(printer, attributes)),
+                *groups
+            ])
+            data = self._send(f'/printers/{printer}', body, document)
+        _, status, _, response_groups, _ = decode_message(data)
+        if status >= 0x0400:
+            message = ''
+            for tag, group in response_groups:
+                if tag == OPERATION_ATTRIBUTES and group.get('status-message'):
+                    message = group['status-message'][0]
+            raise IPPError(status, message)
+        return response_groups
+
+    # ---------- operations ----------
+
+    def print_job(self, printer, file_path, copies=1, orientation='portrait',
+                  color_mode='bw', job_name=None, hold=False):
+        """Submit a file; returns the new job's attributes (job-id, job-state, ...)"""
+        job_attributes = [
+            ('copies', TAG_INTEGER, int(copies)),
+            # orientation-requested: 3 = portrait, 4 = landscape
+            ('orientation-requested', TAG_ENUM, 4 if orientation == 'landscape' else 3),
+            ('print-color-mode', TAG_KEYWORD, 'monochrome' if color_mode == 'bw' else 'color'),
+            # Same PPD option lp passed with -o
+            ('ColorModel', TAG_NAME, 'Gray' if color_mode == 'bw' else 'RGB'),
+        ]
+        if hold:
+            job_attributes.append(('job-hold-until', TAG_KEYWORD, 'indefinite'))
+        with open(file_path, 'rb') as document:
+            groups = self.request(PRINT_JOB, printer, [
+                ('job-name', TAG_NAME, job_name or os.path.basename(file_path)),
+                ('document-format', TAG_MIME_TYPE, 'application/octet-stream'),
+            ], groups=[(JOB_ATTRIBUTES, job_attributes)], document=document)
+        for tag, group in groups:
+            if tag == JOB_ATTRIBUTES:
+                return job_from_attributes(group)
+        raise IPPError(STATUS_BAD_REQUEST, 'No job attributes in Print-Job response')
+
+    def cancel_job(self, printer, job_id):
+        """Cancel a pending, held or printing job"""
+        self.request(CANCEL_JOB, printer, [('job-id', TAG_INTEGER, int(job_id))])
+
+    def release_job(self, printer, job_id):
+        """Let a job submitted with hold=True print"""
+        self.request(RELEASE_JOB, printer, [('job-id', TAG_INTEGER, int(job_id))])
+
+    def get_job_attributes(self, printer, job_id):
+        """Attributes of one job, or None if the scheduler does not know it"""
+        try:
+            groups = self.request(GET_JOB_ATTRIBUTES, printer, [
+                ('job-id', TAG_INTEGER, int(job_id)),
+                ('requested-attributes', TAG_KEYWORD, list(JOB_STATUS_ATTRIBUTES)),
+            ])
+        except IPPError as e:
+            if e.status_code == STATUS_NOT_FOUND:
+                return None
+            raise
+        for tag, group in groups:
+            if tag == JOB_ATTRIBUTES:
+                return job_from_attributes(group)
+        return None
+
+    def get_jobs(self, printer, which_jobs='not-completed', limit=None):
+        """Jobs of one printer: which_jobs is 'not-completed' or 'completed'"""
+        attributes = [
+            ('which-jobs', TAG_KEYWORD, which_jobs),
+            ('requested-attributes', TAG_KEYWORD, list(JOB_STATUS_ATTRIBUTES)),
+        ]
+        if limit:
+            attributes.append(('limit', TAG_INTEGER, int(limit)))
+        groups = self.request(GET_JOBS, printer, attributes)
+        return [job_from_attributes(group) for tag, group in groups if tag == JOB_ATTRIBUTES]
+
+    # ---------- notify-pull subscriptions (RFC 3995 / 3996 ippget) ----------
+
+    def _subscription_id(self, groups):
+        for tag, group in groups:
+            if tag == SUBSCRIPTION_ATTRIBUTES and group.get('notify-subscription-id'):
+                return group['notify-subscription-id'][0]
+        raise IPPError(STATUS_BAD_REQUEST, 'No subscription ID in response')
+
+    def create_printer_subscription(self, printer, events=JOB_EVENTS, lease_seconds=3600):
+        """Subscribe to events of every job on a printer; returns the subscription ID"""
+        return self._subscription_id(self.request(CREATE_PRINTER_SUBSCRIPTIONS, printer, groups=[
+            (SUBSCRIPTION_ATTRIBUTES, [
+                ('notify-pull-method', TAG_KEYWORD, 'ippget'),
+                ('notify-events', TAG_KEYWORD, list(events)),
+                ('notify-lease-duration', TAG_INTEGER, int(lease_seconds)),
+            ])
+        ]))
+
+    def create_job_subscription(self, printer, job_id, events=JOB_EVENTS):
+        """Subscribe to the events of one job (ends when the job does)"""
+        return self._subscription_id(self.request(CREATE_JOB_SUBSCRIPTIONS, printer, groups=[
+            (SUBSCRIPTION_ATTRIBUTES, [
+                ('notify-job-id', TAG_INTEGER, int(job_id)),
+                ('notify-pull-method', TAG_KEYWORD, 'ippget'),
+                ('notify-events', TAG_KEYWORD, list(events)),
+            ])
+        ]))
+
+    def renew_subscription(self, printer, subscription_id, lease_seconds=3600):
+        self.request(RENEW_SUBSCRIPTION, printer, [
+            ('notify-subscription-id', TAG_INTEGER, int(subscription_id)),
+        ], groups=[(SUBSCRIPTION_ATTRIBUTES, [
+            ('notify-lease-duration', TAG_INTEGER, int(lease_seconds)),
+        ])])
+
+    def cancel_subscription(self, printer, subscription_id):
+        self.request(CANCEL_SUBSCRIPTION, printer, [
+            ('notify-subscription-id', TAG_INTEGER, int(subscription_id)),
+        ])
+
+    def get_notifications(self, printer, subscription_id, sequence_number=1, wait=False):
+        """Events at or after sequence_number, as flattened dicts
+
+        With wait=True the scheduler holds the request open until an event
+        arrives or its wait time runs out, so one client should be dedicated
+        to this call. Returns (events, suggested seconds until the next call).
+        """
+        groups = self.request(GET_NOTIFICATIONS, printer, [
+            ('notify-subscription-ids', TAG_INTEGER, int(subscription_id)),
+            ('notify-sequence-numbers', TAG_INTEGER, int(sequence_number)),
+            ('notify-wait', TAG_BOOLEAN, bool(wait)),
+        ])
+        interval = None
+        events = []
+        for tag, group in groups:
+            if tag == OPERATION_ATTRIBUTES and group.get('notify-get-interval'):
+                interval = group['notify-get-interval'][0]
+            elif tag == EVENT_NOTIFICATION_ATTRIBUTES:
+                events.append(job_from_attributes(group))
+        return events, interval
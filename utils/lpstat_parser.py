@@ -0,0 +1,178 @@
+"""
+Parser for `lpstat -l` job listings
+
+`lpstat -l -o` (active queue) and `lpstat -W completed -l` (history) print
+one unindented header line per job followed by indented detail lines:
+
+    Canon_G3000_W-123       pi    1024   Mon 14 Oct 2024 10:00:00 AM IST
+            Status: Sending data to printer.
+            Alerts: job-printing
+            queued for Canon_G3000_W
+
+parse_lpstat() turns that into {cups_job_id: LpstatJob}, so lookups match
+job IDs exactly (Canon_G3000_W-12 is not Canon_G3000_W-123) and statuses are
+read from the Status/Alerts lines only, never from a file or user name.
+"""
+import re
+import time
+from collections import namedtuple
+
+# Unindented line starting with a job ID ('<printer>-<number>')
+_HEADER = re.compile(r'^(\S+-\d+)[ \t]', re.MULTILINE)
+
+# Date formats lpstat uses, depending on the locale (timezone name dropped)
+_DATE_FORMATS = (
+    '%a %d %b %Y %I:%M:%S %p',
+    '%a %d %b %Y %H:%M:%S',
+    '%a %b %d %H:%M:%S %Y',
+    '%a %b %d %I:%M:%S %p %Y',
+)
+
+# (drop timezone?, format) that matched last; every line uses the same one
+_date_format = None
+
+
+def _parse_date(text):
+    """Epoch seconds of a header date, or None if the locale is unfamiliar"""
+    global _date_format
+    words = text.split()
+    candidates = [(drop_zone, fmt) for drop_zone in (False, True) for fmt in _DATE_FORMATS]
+    if _date_format is not None:
+        candidates.insert(0, _date_format)
+    for drop_zone, fmt in candidates:
+        try:
+            timestamp = time.mktime(time.strptime(' '.join(words[:-1] if drop_zone else words), fmt))
+        except ValueError:
+            continue
+        _date_format = (drop_zone, fmt)
+        return timestamp
+    return None
+
+
+class LpstatJob(namedtuple('LpstatJob', 'job_id printer user size submitted status reason alerts')):
+    """One job from an lpstat listing; `submitted` is the header's date text"""
+
+    __slots__ = ()
+
+    @property
+    def submitted_ts(self):
+        """Submission time as epoch seconds (parsed on demand: strptime is slow)"""
+        return _parse_date(self.submitted) if self.submitted else None
+
+
+def _active_status(text):
+    """Status of a job in the active queue, from its Status/Alerts text"""
+    if 'printing' in text or 'processing' in text:
+        return 'printing'
+    if 'held' in text or 'hold' in text or 'pending' in text or 'waiting' in text:
+        return 'pending'
+    # Queued with nothing more specific to say - assume printing
+    return 'printing'
+
+
+def _completed_status(text):
+    """Status of a job in the completed history, from its Status/Alerts text"""
+    if 'canceled' in text or 'cancelled' in text:
+        return 'canceled'
+    if 'aborted' in text:
+        return 'aborted'
+    if 'error' in text or 'failed' in text:
+        return 'error'
+    return 'completed'
+
+
+def _parse_job(job_id, section, completed):
+    """LpstatJob from one job's header line and detail lines"""
+    header, *details = section.splitlines()
+    fields = header.split(None, 3)
+    user = fields[1] if len(fields) > 1 else None
+    size = int(fields[2]) if len(fields) > 2 and fields[2].isdigit() else None
+    submitted = fields[3].strip() if len(fields) > 3 else None
+
+    reason = ''
+    alerts = ()
+    printer = job_id.rpartition('-')[0]
+    for line in details:
+        line = line.strip()
+        key, _, value = line.partition(':')
+        key = key.lower()
+        if key == 'status':
+            reason = value.strip()
+        elif key == 'alerts':
+            alerts = tuple(alert for alert in value.split() if alert != 'none')
+        elif line.startswith('queued for '):
+            printer = line[len('queued for '):].strip() or printer
+
+    text = ' '.join((reason,) + alerts).lower()
+    status = _completed_status(text) if completed else _active_status(text)
+    return LpstatJob(job_id, printer, user, size, submitted, status, reason, alerts)
+
+
+def _sections(output):
+    """(job_id, start, end) of each job's lines in the output"""
+    headers = list(_HEADER.finditer(output))
+    for n, match in enumerate(headers):
+        end = headers[n + 1].start() if n + 1 < len(headers) else len(output)
+        yield match.group(1), match.start(), end
+
+
+def parse_lpstat(output, completed=False):
+    """{cups_job_id: LpstatJob} for every job in `lpstat -l` output
+
+    completed=True reads the output as `-W completed` history.
+    """
+    return {
+        job_id: _parse_job(job_id, output[start:end], completed)
+        for job_id, start, end in _sections(output)
+    }
+
+
+def _find_header(output, job_id):
+    """Offset of job_id's header line, or -1 (new jobs sit near the end of the history)"""
+    start = output.rfind(job_id)
+    while start >= 0:
+        if (start == 0 or output[start - 1] == '\n') and output[start + len(job_id):start + len(job_id) + 1] in (' ', '\t'):
+            return start
+        start = output.rfind(job_id, 0, start)
+    return -1
+
+
+class LpstatHistory:
+    """Completed-jobs index kept up to date from successive `lpstat -W completed -l` runs
+
+    A finished job never changes, so only jobs missing from the index are
+    parsed on each update; jobs CUPS has purged from its history are dropped.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def update(self, output):
+        """Merge fresh history output; returns how many jobs were new"""
+        # Header lines are unindented; only those are matched against _HEADER,
+        # so a stray unindented line (an lpstat warning) is not taken for a job
+        headers = (_HEADER.match(line) for line in output.splitlines() if line and not line[0].isspace())
+        present = {match.group(1) for match in headers if match}
+        missing = present.difference(self.jobs)
+        if len(missing) > 16:
+            # First read, or a busy spell: one pass over everything
+            new = {job_id: job for job_id, job in parse_lpstat(output, completed=True).items()
+                   if job_id in missing}
+        else:
+            new = {}
+            for job_id in missing:
+                start = _find_header(output, job_id)
+                if start < 0:
+                    continue
+                following = _HEADER.search(output, start + len(job_id))
+                end = following.start() if following else len(output)
+                new[job_id] = _parse_job(job_id, output[start:end], True)
+        if new or len(present) != len(self.jobs):
+            # Replaced rather than changed in place: readers may hold the old dict
+            jobs = {job_id: job for job_id, job in self.jobs.items() if job_id in present}
+            jobs.update(new)
+            self.jobs = jobs
+        return len(new)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
@@ -0,0 +1,388 @@
+"""
+Fast PDF page counting
+
+A PdfReader walks the whole page tree to count pages, parsing every page
+object of a large scan. The count is already stored in the document: the
+root node of the page tree carries /Count. read_pdf_page_count()
+memory-maps the file and reads only what leads there - startxref, the
+cross-reference sections (tables or streams, incremental updates included),
+the trailer's /Root catalog and its /Pages node - so its cost does not grow
+with the number of pages. Anything it does not understand returns None and
+the caller falls back to the full parser.
+"""
+import mmap
+import re
+import zlib
+from collections import namedtuple
+
+# How far from the end of the file startxref is looked for
+_TAIL_BYTES = 4096
+
+# Cross-reference sections followed through /Prev before giving up
+_MAX_SECTIONS = 64
+
+# One token after optional whitespace and comments. '(' starts a literal
+# string, which is skipped by hand (parentheses may nest)
+_DELIMITERS = rb'\s\x00/<>\[\]()%{}'
+_TOKEN = re.compile(
+    rb'(?:[\s\x00]|%[^\r\n]*)*'
+    rb'(<<|>>|[\[\]{}(]|<[0-9A-Fa-f\s]*>|/[^' + _DELIMITERS + rb']*|[^' + _DELIMITERS + rb']+)'
+)
+_OBJECT_HEADER = re.compile(rb'[\s\x00]*(\d+)[\s\x00]+(\d+)[\s\x00]+obj')
+_SUBSECTION = re.compile(rb'[\s\x00]*(\d+)[\s\x00]+(\d+)[ \t]*(?:\r\n|\r|\n)')
+_STARTXREF = re.compile(rb'startxref[\s\x00]+(\d+)')
+_STREAM = re.compile(rb'[\s\x00]*stream(?:\r\n|\n|\r)')
+# An array of numbers, names and references, skipped in one regex match
+_FLAT_ARRAY = re.compile(rb'\[[^\[\]()<>%]*\]')
+_NUMBER = re.compile(rb'[+-]?\d+$')
+
+Ref = namedtuple('Ref', 'num gen')
+
+
+def read_pdf_page_count(path):
+    """Page count from the page tree root of the PDF at path, or None"""
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _PdfFile(data).page_count()
+    except Exception:
+        # Malformed, or built in a way this reader does not cover
+        return None
+
+
+def _token(buf, pos):
+    match = _TOKEN.match(buf, pos)
+    if match is None:
+        raise ValueError(f'No PDF token at {pos}')
+    return match.group(1), match.end()
+
+
+def _skip_string(buf, pos):
+    """End of the literal string whose '(' ends just before pos"""
+    depth = 1
+    while depth:
+        char = buf[pos]
+        if char == 0x5c:  # backslash escapes the next byte
+            pos += 1
+        elif char == 0x28:
+            depth += 1
+        elif char == 0x29:
+            depth -= 1
+        pos += 1
+    return pos
+
+
+def _value(buf, pos):
+    """(value, end) of the object at pos: int, float, name (b'/...'), Ref,
+    list or dict; strings and other keywords come back as raw bytes"""
+    token, pos = _token(buf, pos)
+    if token == b'<<':
+        result = {}
+        while True:
+            key, pos = _token(buf, pos)
+            if key == b'>>':
+                return result, pos
+            if not key.startswith(b'/'):
+                raise ValueError(f'Dictionary key expected at {pos}')
+            result[key[1:]], pos = _value(buf, pos)
+    if token == b'[':
+        result = []
+        while True:
+            match = _TOKEN.match(buf, pos)
+            if match and match.group(1) == b']':
+                return result, match.end()
+            item, pos = _value(buf, pos)
+            result.append(item)
+    if token == b'(':
+        end = _skip_string(buf, pos)
+        return buf[pos - 1:end], end
+    if _NUMBER.match(token):
+        # "num gen R" is a reference
+        match = _TOKEN.match(buf, pos)
+        if match and _NUMBER.match(match.group(1)):
+            after = _TOKEN.match(buf, match.end())
+            if after and after.group(1) == b'R':
+                return Ref(int(token), int(match.group(1))), after.end()
+        return int(token), pos
+    if token.startswith(b'/') or token.startswith(b'<'):
+        return token, pos
+    try:
+        return float(token), pos
+    except ValueError:
+        # true, false, null and other keywords
+        return token, pos
+
+
+def _skip(buf, pos):
+    """End of the object at pos, without building it where avoidable"""
+    match = _TOKEN.match(buf, pos)
+    if match and match.group(1) == b'[':
+        # Arrays like a page tree's /Kids can be long; skip them in one go
+        flat = _FLAT_ARRAY.match(buf, match.start(1))
+        if flat:
+            return flat.end()
+    if match and match.group(1) == b'<<':
+        pos = match.end()
+        while True:
+            key, pos = _token(buf, pos)
+            if key == b'>>':
+                return pos
+            pos = _skip(buf, pos)
+    return _value(buf, pos)[1]
+
+
+def _dict_entries(buf, pos, wanted):
+    """({key: value} for the `wanted` keys, end) of the dictionary at pos"""
+    token, pos = _token(buf, pos)
+    if token != b'<<':
+        raise ValueError(f'Dictionary expected at {pos}')
+    found = {}
+    while True:
+        key, pos = _token(buf, pos)
+        if key == b'>>':
+            return found, pos
+        if not key.startswith(b'/'):
+            raise ValueError(f'Dictionary key expected at {pos}')
+        if key[1:] in wanted:
+            found[key[1:]], pos = _value(buf, pos)
+        else:
+            pos = _skip(buf, pos)
+
+
+def _unpredict(data, columns, predictor):
+    """Undo the PNG predictors of a FlateDecode stream (/Predictor >= 10)"""
+    if predictor < 10:
+        if predictor == 1:
+            return data
+        raise ValueError(f'Unsupported predictor {predictor}')
+    row_size = columns + 1
+    previous = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data) - row_size + 1, row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        if kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xff
+        elif kind == 2:
+            for i in range(columns):
+                row[i] = (row[i] + previous[i]) & 0xff
+        elif kind == 3:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xff
+        elif kind == 4:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                up_left = previous[i - 1] if i else 0
+                estimate = left + previous[i] - up_left
+                distances = (abs(estimate - left), abs(estimate - previous[i]), abs(estimate - up_left))
+                nearest = (left, previous[i], up_left)[distances.index(min(distances))]
+                row[i] = (row[i] + nearest) & 0xff
+        elif kind != 0:
+            raise ValueError(f'Unknown PNG predictor {kind}')
+        out += row
+        previous = row
+    return bytes(out)
+
+
+def _predictor(entries):
+    """(predictor, columns) from a stream's /DecodeParms"""
+    params = entries.get(b'DecodeParms')
+    params = params[0] if isinstance(params, list) and params else params
+    if not isinstance(params, dict):
+        return 1, 1
+    return params.get(b'Predictor', 1), params.get(b'Columns', 1)
+
+
+class _XrefTable:
+    """A classic 'xref' section, looked up in place without reading every entry"""
+
+    def __init__(self, data, pos):
+        self.data = data
+        self.subsections = []  # (first object number, count, entries position, entry size)
+        while True:
+            match = _SUBSECTION.match(data, pos)
+            if match is None:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            entry = match.end()
+            # Entries are 20 bytes; some writers end them with one byte only
+            size = 20 if count == 0 or data[entry + 18:entry + 20].isspace() else 19
+            self.subsections.append((first, count, entry, size))
+            pos = entry + count * size
+        token, pos = _token(data, pos)
+        if token != b'trailer':
+            raise ValueError('Cross-reference trailer not found')
+        self.trailer, _ = _dict_entries(data, pos, {b'Root', b'Prev', b'XRefStm'})
+
+    def find(self, num):
+        """('offset', pos) of an object, or None if this section does not have it"""
+        for first, count, entry, size in self.subsections:
+            if first <= num < first + count:
+                line = self.data[entry + (num - first) * size:entry + (num - first) * size + 18]
+                if line[17:18] == b'n':
+                    return ('offset', int(line[:10]))
+        return None
+
+
+class _XrefStream:
+    """A PDF 1.5 cross-reference stream (binary entries, maybe compressed)"""
+
+    def __init__(self, pdf, pos):
+        header = _OBJECT_HEADER.match(pdf.data, pos)
+        if header is None:
+            raise ValueError(f'No cross-reference at {pos}')
+        self.trailer, raw = pdf.stream(pdf.data, header.end(),
+                                       {b'Root', b'Prev', b'W', b'Index', b'Size'})
+        self.widths = self.trailer[b'W']
+        self.row_size = sum(self.widths)
+        index = self.trailer.get(b'Index') or [0, self.trailer[b'Size']]
+        self.ranges = list(zip(index[0::2], index[1::2]))
+
+        predictor, columns = _predictor(self.trailer)
+        self.rows = raw
+        self._up = False
+        if predictor >= 10 and columns == self.row_size:
+            stride = self.row_size + 1
+            if raw[0::stride].count(2) == len(raw) // stride:
+                # All rows use the Up predictor: a byte is the sum of its
+                # column so far, which _field() takes straight from raw
+                self._up = True
+            else:
+                self.rows = _unpredict(raw, columns, predictor)
+        elif predictor != 1:
+            self.rows = _unpredict(raw, columns, predictor)
+
+    def _field(self, row, n, default=0):
+        if not self.widths[n]:
+            return default
+        start = sum(self.widths[:n])
+        if self._up:
+            stride = self.row_size + 1
+            end = row * stride + stride
+            return int.from_bytes(bytes(sum(self.rows[1 + column:end:stride]) & 0xff
+                                        for column in range(start, start + self.widths[n])), 'big')
+        offset = row * self.row_size + start
+        return int.from_bytes(self.rows[offset:offset + self.widths[n]], 'big')
+
+    def find(self, num):
+        row = 0
+        for first, count in self.ranges:
+            if first <= num < first + count:
+                row += num - first
+                kind = self._field(row, 0, default=1)
+                if kind == 1:
+                    return ('offset', self._field(row, 1))
+                if kind == 2:
+                    return ('compressed', self._field(row, 1), self._field(row, 2))
+                return None
+            row += count
+        return None
+
+
+class _PdfFile:
+    """Just enough of a PDF reader to find /Count of the page tree root"""
+
+    def __init__(self, data):
+        self.data = data
+        self.sections = []
+        self._object_streams = {}
+
+        tail = data.rfind(b'startxref', max(0, len(data) - _TAIL_BYTES))
+        if tail < 0:
+            raise ValueError('startxref not found')
+        offset = int(_STARTXREF.match(data, tail).group(1))
+        self.root = None
+        seen = set()
+        while offset is not None and offset not in seen and len(seen) < _MAX_SECTIONS:
+            seen.add(offset)
+            section = self._read_section(offset)
+            self.sections.append(section)
+            if self.root is None:
+                self.root = section.trailer.get(b'Root')
+            # A hybrid file lists its compressed objects in an extra stream
+            if b'XRefStm' in section.trailer:
+                self.sections.append(_XrefStream(self, section.trailer[b'XRefStm']))
+            offset = section.trailer.get(b'Prev')
+
+    def _read_section(self, offset):
+        token, pos = _token(self.data, offset)
+        if token == b'xref':
+            return _XrefTable(self.data, pos)
+        return _XrefStream(self, offset)
+
+    def stream(self, buf, pos, wanted):
+        """(wanted dictionary entries, inflated data) of the stream object at pos
+
+        The predictor named in /DecodeParms (see _predictor()) is left to the
+        caller.
+        """
+        entries, pos = _dict_entries(buf, pos, wanted | {b'Length', b'Filter', b'DecodeParms'})
+        match = _STREAM.match(buf, pos)
+        if match is None:
+            raise ValueError(f'Stream expected at {pos}')
+        start = match.end()
+        length = entries.get(b'Length')
+        if not isinstance(length, int):
+            # An indirect /Length; the data ends at endstream
+            length = buf.find(b'endstream', start) - start
+        raw = buf[start:start + length]
+
+        filters = entries.get(b'Filter') or []
+        filters = filters if isinstance(filters, list) else [filters]
+        if filters not in ([], [b'/FlateDecode']):
+            raise ValueError(f'Unsupported stream filter {filters}')
+        if filters:
+            raw = zlib.decompressobj().decompress(raw)
+        return entries, raw
+
+    def locate(self, num):
+        """(buffer, position) of the value of object num"""
+        for section in self.sections:
+            where = section.find(num)
+            if where is None:
+                continue
+            if where[0] == 'offset':
+                header = _OBJECT_HEADER.match(self.data, where[1])
+                if header is None or int(header.group(1)) != num:
+                    raise ValueError(f'Object {num} is not at offset {where[1]}')
+                return self.data, header.end()
+            return self._in_object_stream(num, where[1], where[2])
+        raise ValueError(f'Object {num} not found')
+
+    def _in_object_stream(self, num, stream_num, index):
+        if stream_num not in self._object_streams:
+            buf, pos = self.locate(stream_num)
+            entries, decoded = self.stream(buf, pos, {b'N', b'First'})
+            predictor, columns = _predictor(entries)
+            if predictor != 1:
+                decoded = _unpredict(decoded, columns, predictor)
+            self._object_streams[stream_num] = (entries[b'First'], decoded)
+        first, decoded = self._object_streams[stream_num]
+        pos = 0
+        for _ in range(index + 1):
+            obj_num, pos = _value(decoded, pos)
+            offset, pos = _value(decoded, pos)
+        if obj_num != num:
+            raise ValueError(f'Object {num} is not in object stream {stream_num}')
+        return decoded, first + offset
+
+    def resolve(self, value):
+        """Follow a reference to a direct value"""
+        if isinstance(value, Ref):
+            buf, pos = self.locate(value.num)
+            return _value(buf, pos)[0]
+        return value
+
+    def page_count(self):
+        if not isinstance(self.root, Ref):
+            raise ValueError('Trailer has no /Root')
+        catalog, _ = _dict_entries(*self.locate(self.root.num), {b'Pages'})
+        pages = catalog[b'Pages']
+        if not isinstance(pages, Ref):
+            raise ValueError('Catalog has no /Pages reference')
+        tree, _ = _dict_entries(*self.locate(pages.num), {b'Type', b'Count'})
+        count = self.resolve(tree.get(b'Count'))
+        if tree.get(b'Type') != b'/Pages' or not isinstance(count, int) or count < 1:
+            raise ValueError('Page tree root without a usable /Count')
+        return count
@@ -3,10 +3,32 @@ CUPS printing utilities
 """
 import os
 import subprocess
+import threading
+from config import Config
+from .ipp_client import IPPClient, IPPError
+from .status_cache import JobStatusCache
+from .lpstat_parser import parse_lpstat, LpstatHistory
 
+# Recent CUPS job statuses shared by the API, the admin routes and the monitor
+status_cache = JobStatusCache(Config.CUPS_STATUS_CACHE_SECONDS)
 
-def print_file(file_path, printer="G3000-series", copies=1, orientation="portrait", color_mode="bw"):
-    """Send file to printer and return job ID if successful"""
+# Parsed `lpstat -W completed` history, extended with new jobs on each read
+_completed_history = LpstatHistory()
+_completed_history_lock = threading.Lock()
+
+
+def print_file(file_path, printer=None, copies=1, orientation="portrait", color_mode="bw", hold=False):
+    """Send file to printer (default: least loaded one that can print color_mode)
+    and return job ID if successful
+
+    With hold=True CUPS spools and filters the job but keeps it held until
+    release_print_job() is called.
+    """
+    if printer is None:
+        # Import here to avoid circular dependency
+        from services.printer_pool import choose_printer
+        printer = choose_printer(color_mode)
+    
     print(f"\n{'='*60}")
     print(f"🖨️  PRINT_FILE FUNCTION CALLED")
     print(f"{'='*60}")
@@ -15,6 +37,8 @@ def print_file(file_path, printer="G3000-series", copies=1, orientation="portrai
     print(f"📋 Copies: {copies}")
     print(f"📐 Orientation: {orientation}")
     print(f"🎨 Color Mode: {color_mode}")
+    if hold:
+        print(f"⏸️  Held until released")
     
     # Check if file exists
     if not os.path.exists(file_path):
@@ -24,6 +48,9 @@ def print_file(file_path, printer="G3000-series", copies=1, orientation="portrai
     
     print(f"✅ File exists, size: {os.path.getsize(file_path)} bytes")
     
+    if Config.PRINT_BACKEND == 'ipp':
+        return _print_file_ipp(file_path, printer, copies, orientation, color_mode, hold)
+    
     # Send the file to CUPS using lp with options
     cmd = ['lp', '-d', printer, '-n', str(copies)]
     
@@ -43,6 +70,9 @@ def print_file(file_path, printer="G3000-series", copies=1, orientation="portrai
         cmd.extend(['-o', 'ColorModel=RGB'])
         # cmd.extend(['-o', 'CNIJGrayScale=0'])
     
+    if hold:
+        cmd.extend(['-H', 'hold'])
+    
     cmd.append(file_path)
     
     print(f"💻 Executing command: {' '.join(cmd)}")
@@ -78,6 +108,34 @@ def print_file(file_path, printer="G3000-series", copies=1, orientation="portrai
         return {'success': False, 'job_id': None, 'error': error}
 
 
+def _run_job_command(cmd):
+    """Run an lp/cancel command on an existing job; returns {'success', 'error'}"""
+    print(f"💻 Running: {' '.join(cmd)}")
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        return {'success': False, 'error': str(e)}
+    if proc.returncode != 0:
+        return {'success': False, 'error': proc.stderr.strip() or f'exit status {proc.returncode}'}
+    return {'success': True}
+
+
+def release_print_job(job_id):
+    """Let a job submitted with print_file(hold=True) print"""
+    status_cache.invalidate(job_id)
+    if Config.PRINT_BACKEND == 'ipp':
+        return _ipp_job_operation('release_job', job_id)
+    return _run_job_command(['lp', '-i', job_id, '-H', 'resume'])
+
+
+def cancel_print_job(job_id):
+    """Cancel a held, queued or printing job"""
+    status_cache.invalidate(job_id)
+    if Config.PRINT_BACKEND == 'ipp':
+        return _ipp_job_operation('cancel_job', job_id)
+    return _run_job_command(['cancel', job_id])
+
+
 def check_print_job_status(job_id):
     """Check the status of a CUPS print job
     
@@ -89,100 +147,204 @@ def check_print_job_status(job_id):
         print(f"❌ No job ID provided")
         return 'unknown'
     
-    # First, check if job is in the ACTIVE queue (printing/pending)
-    cmd_active = ['lpstat', '-o']
-    print(f"💻 Running: {' '.join(cmd_active)}")
+    if Config.PRINT_BACKEND == 'ipp':
+        return _check_print_job_status_ipp(job_id)
     
-    proc_active = subprocess.run(cmd_active, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    
-    if proc_active.returncode != 0:
-        print(f"❌ lpstat failed with return code {proc_active.returncode}")
-        print(f"STDERR: {proc_active.stderr}")
+    # First, check if job is in the ACTIVE queue (printing/pending)
+    active = _read_active_queue()
+    if active is None:
         return 'unknown'
     
-    active_output = proc_active.stdout
-    print(f"📊 Active jobs output: {len(active_output)} chars")
-    
-    # Check if job is in active queue
-    if job_id in active_output:
-        print(f"✅ Job {job_id} found in ACTIVE queue")
-        
-        # Get detailed status with lpstat -l
-        cmd_detail = ['lpstat', '-l', '-o', job_id]
-        proc_detail = subprocess.run(cmd_detail, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        detail_output = proc_detail.stdout.lower()
-        
-        print(f"📋 Job details:\n{proc_detail.stdout}")
-        
-        # Check for specific status keywords
-        if 'processing' in detail_output or 'printing' in detail_output:
-            print(f"📋 Status: printing (actively processing)")
-            return 'printing'
-        elif 'pending' in detail_output or 'held' in detail_output or 'waiting' in detail_output:
-            print(f"📋 Status: pending (waiting in queue)")
-            return 'pending'
-        else:
-            # Job is in active queue but no specific status - assume printing
-            print(f"📋 Status: printing (in active queue)")
-            return 'printing'
+    job = active.get(job_id)
+    if job is not None:
+        print(f"✅ Job {job_id} found in ACTIVE queue ({job.reason or ', '.join(job.alerts) or 'queued'})")
+        print(f"📋 Status: {job.status}")
+        return job.status
     
     # Job not in active queue - check for completed/canceled/aborted
     print(f"❌ Job {job_id} NOT in active queue")
     
-    # Check completed jobs with detailed output
-    cmd_completed = ['lpstat', '-W', 'completed', '-l']
-    print(f"💻 Running: {' '.join(cmd_completed)}")
-    
-    proc_completed = subprocess.run(cmd_completed, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    
-    if proc_completed.returncode == 0:
-        completed_output = proc_completed.stdout
-        
-        # Check if this specific job is in the output
-        if job_id in completed_output:
-            print(f"✅ Job {job_id} found in COMPLETED history")
-            
-            # Parse the output to find this job's details
-            lines = completed_output.split('\n')
-            job_section = []
-            in_job = False
-            
-            for line in lines:
-                if job_id in line:
-                    in_job = True
-                    job_section.append(line)
-                elif in_job:
-                    # Continue collecting lines until next job or empty line
-                    if line and not line[0].isspace() and '-' in line:
-                        # Start of next job
-                        break
-                    job_section.append(line)
-            
-            job_details = '\n'.join(job_section).lower()
-            print(f"📋 Job section:\n{job_details}")
-            
-            # Analyze the job state
-            if 'canceled' in job_details or 'cancelled' in job_details:
-                print(f"📋 Status: canceled")
-                return 'canceled'
-            elif 'aborted' in job_details:
-                print(f"📋 Status: aborted")
-                return 'aborted'
-            elif 'error' in job_details or 'failed' in job_details:
-                print(f"📋 Status: error")
-                return 'error'
-            elif 'completed' in job_details or 'finished' in job_details:
-                print(f"📋 Status: completed")
-                return 'completed'
-            else:
-                # Found in completed queue but no clear status - assume completed
-                print(f"📋 Status: completed (found in history, no errors)")
-                return 'completed'
-        else:
-            print(f"ℹ️  Job {job_id} not found in completed history")
+    history = _read_completed_history()
+    job = history.get(job_id) if history is not None else None
+    if job is not None:
+        print(f"✅ Job {job_id} found in COMPLETED history ({', '.join(job.alerts) or job.reason})")
+        print(f"📋 Status: {job.status}")
+        return job.status
     
     # Job not found anywhere - might be very old or already purged
-    # Check if it's still pending somewhere
     print(f"ℹ️  Job {job_id} not found in any queue (might be purged)")
     print(f"📋 Status: unknown (job not found)")
     return 'unknown'
+
+
+def _read_active_queue():
+    """{cups_job_id: LpstatJob} from `lpstat -l -o`, or None if lpstat failed"""
+    proc = subprocess.run(['lpstat', '-l', '-o'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        print(f"❌ lpstat failed with return code {proc.returncode}")
+        print(f"STDERR: {proc.stderr}")
+        return None
+    return parse_lpstat(proc.stdout)
+
+
+def _read_completed_history():
+    """Completed-jobs index refreshed from `lpstat -W completed -l`, or None if lpstat failed
+
+    Only jobs that finished since the last call are parsed.
+    """
+    proc = subprocess.run(['lpstat', '-W', 'completed', '-l'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        return None
+    with _completed_history_lock:
+        _completed_history.update(proc.stdout)
+        return _completed_history.jobs
+
+
+def cached_print_job_status(job_id):
+    """check_print_job_status(), reusing a status seen in the last few seconds
+
+    Concurrent requests for the same job wait for a single CUPS lookup.
+    """
+    if not job_id:
+        return 'unknown'
+    return status_cache.get(job_id, check_print_job_status)
+
+
+def prime_print_job_statuses(statuses):
+    """Cache statuses learned elsewhere (a snapshot, CUPS job events)"""
+    status_cache.put(statuses)
+
+
+def get_print_job_snapshot():
+    """Statuses of every job CUPS knows about, from one pass over both queues
+
+    Runs `lpstat -l -o` (active) and `lpstat -W completed -l` (history) once
+    each, however many jobs are being tracked. Returns {cups_job_id: status},
+    or None if the active queue could not be read.
+    """
+    if Config.PRINT_BACKEND == 'ipp':
+        return _get_print_job_snapshot_ipp()
+    
+    active = _read_active_queue()
+    if active is None:
+        return None
+    
+    snapshot = {}
+    history = _read_completed_history()
+    if history is not None:
+        for job_id, job in history.items():
+            snapshot[job_id] = job.status
+    
+    # A job still in the active queue wins over a stale history entry
+    for job_id, job in active.items():
+        snapshot[job_id] = job.status
+    
+    print(f"📸 CUPS snapshot: {len(snapshot)} job(s)")
+    status_cache.put(snapshot)
+    return snapshot
+
+
+def check_print_job_statuses(job_ids, snapshot=None):
+    """Resolve several CUPS job IDs from a single snapshot
+
+    Returns {cups_job_id: status} with the same values as
+    check_print_job_status(); IDs CUPS no longer knows are 'unknown'.
+    """
+    job_ids = [job_id for job_id in job_ids if job_id]
+    if not job_ids:
+        return {}
+    if snapshot is None:
+        snapshot = get_print_job_snapshot()
+    if snapshot is None:
+        return {job_id: 'unknown' for job_id in job_ids}
+    statuses = {job_id: snapshot.get(job_id, 'unknown') for job_id in job_ids}
+    status_cache.put(statuses)
+    return statuses
+
+
+# ---------- IPP backend (Config.PRINT_BACKEND = 'ipp') ----------
+
+_ipp_client = None
+_ipp_client_lock = threading.Lock()
+
+
+def get_ipp_client():
+    """Shared keep-alive IPP connection to the local scheduler"""
+    global _ipp_client
+    if _ipp_client is None:
+        with _ipp_client_lock:
+            if _ipp_client is None:
+                _ipp_client = IPPClient(Config.CUPS_HOST, Config.CUPS_PORT)
+    return _ipp_client
+
+
+def _split_cups_job_id(cups_job_id):
+    """'Canon_G3000_W-123' -> ('Canon_G3000_W', 123), same ID format lp prints"""
+    printer, _, number = cups_job_id.rpartition('-')
+    if not printer or not number.isdigit():
+        raise ValueError(f'Invalid CUPS job ID: {cups_job_id!r}')
+    return printer, int(number)
+
+
+def _print_file_ipp(file_path, printer, copies, orientation, color_mode, hold=False):
+    """print_file() over IPP Print-Job"""
+    print(f"💻 IPP Print-Job → {Config.CUPS_HOST}:{Config.CUPS_PORT}/printers/{printer}")
+    try:
+        job = get_ipp_client().print_job(printer, file_path, copies=copies,
+                                         orientation=orientation, color_mode=color_mode, hold=hold)
+    except (IPPError, OSError) as e:
+        print(f"❌ PRINT FAILED!")
+        print(f"📥 IPP: {e}")
+        print(f"{'='*60}\n")
+        return {'success': False, 'job_id': None, 'error': str(e)}
+    
+    job_id = f"{printer}-{job['job-id']}"
+    print(f"✅ SUCCESS!")
+    print(f"🎫 CUPS Job ID: {job_id}")
+    print(f"{'='*60}\n")
+    return {'success': True, 'job_id': job_id}
+
+
+def _ipp_job_operation(operation, job_id):
+    """release_print_job() / cancel_print_job() over IPP"""
+    print(f"💻 IPP {operation} → {job_id}")
+    try:
+        printer, number = _split_cups_job_id(job_id)
+        getattr(get_ipp_client(), operation)(printer, number)
+    except (ValueError, IPPError, OSError) as e:
+        return {'success': False, 'error': str(e)}
+    return {'success': True}
+
+
+def _check_print_job_status_ipp(job_id):
+    """check_print_job_status() over IPP Get-Job-Attributes"""
+    try:
+        printer, number = _split_cups_job_id(job_id)
+        job = get_ipp_client().get_job_attributes(printer, number)
+    except (ValueError, IPPError, OSError) as e:
+        print(f"❌ IPP lookup failed: {e}")
+        return 'unknown'
+    
+    status = job['status'] if job else 'unknown'
+    print(f"📋 Status: {status}")
+    return status
+
+
+def _get_print_job_snapshot_ipp():
+    """get_print_job_snapshot() over IPP Get-Jobs (completed, then active)"""
+    # Import here to avoid circular dependency
+    from services.printer_pool import printer_names
+    client = get_ipp_client()
+    snapshot = {}
+    try:
+        for printer in printer_names():
+            for which_jobs in ('completed', 'not-completed'):
+                for job in client.get_jobs(printer, which_jobs):
+                    snapshot[f"{printer}-{job['job-id']}"] = job['status']
+    except (IPPError, OSError) as e:
+        print(f"❌ IPP Get-Jobs failed: {e}")
+        return None
+    
+    print(f"📸 CUPS snapshot: {len(snapshot)} job(s)")
+    status_cache.put(snapshot)
+    return snapshot
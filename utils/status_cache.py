@@ -0,0 +1,78 @@
+"""
+Short-lived cache of CUPS job statuses
+
+Every open success page polls /api/job-status for its printing jobs, and the
+admin dashboard and the monitor ask about the same jobs again. A status
+looked up within the last few seconds is reused, concurrent lookups of the
+same job share one CUPS call, and the monitor's snapshot (or the event
+listener) fills the cache for every job it saw.
+
+Every entry gets the same TTL, so the oldest write is always the first to
+expire: entries are kept in write order and trimmed from the front.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class JobStatusCache:
+    """Thread-safe {cups_job_id: status} with a TTL, a size bound and single-flight lookups"""
+
+    def __init__(self, ttl, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # cups_job_id -> (status, expires_at), oldest first
+        self._inflight = {}  # cups_job_id -> Event set when the lookup finishes
+        self._lock = threading.Lock()
+
+    def get(self, job_id, lookup):
+        """Cached status of job_id, calling lookup(job_id) at most once at a time"""
+        while True:
+            with self._lock:
+                entry = self._entries.get(job_id)
+                if entry is not None and entry[1] > time.monotonic():
+                    return entry[0]
+                done = self._inflight.get(job_id)
+                if done is None:
+                    done = self._inflight[job_id] = threading.Event()
+                    break
+            # Someone else is asking CUPS already; use their answer
+            done.wait()
+            with self._lock:
+                entry = self._entries.get(job_id)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            # Their lookup raised: try ourselves
+
+        try:
+            status = lookup(job_id)
+            self.put({job_id: status})
+            return status
+        finally:
+            with self._lock:
+                del self._inflight[job_id]
+            done.set()
+
+    def put(self, statuses):
+        """Store fresh statuses, e.g. from a snapshot of the whole queue"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for job_id, status in statuses.items():
+                self._entries[job_id] = (status, expires_at)
+                self._entries.move_to_end(job_id)
+            # Drop expired entries so finished jobs don't pile up, then the
+            # oldest ones if a snapshot alone is over the bound
+            now = time.monotonic()
+            while self._entries and next(iter(self._entries.values()))[1] <= now:
+                self._entries.popitem(last=False)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, job_id):
+        """Forget a job whose state was just changed from here"""
+        with self._lock:
+            self._entries.pop(job_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
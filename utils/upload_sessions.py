@@ -0,0 +1,189 @@
+"""
+Resumable chunked uploads
+
+For large files over flaky links: the browser creates a session, PUTs the
+file in chunks at increasing offsets, asks for the received offset after a
+dropped connection and carries on from there, then finalizes. Chunks are
+appended to a hidden '.<session>.upload' file in Config.UPLOAD_FOLDER, with
+the file name and size in a '.<session>.json' sidecar, so sessions survive
+an app restart. The part of a chunk that arrived before the connection
+dropped is kept.
+
+A complete session has the UploadSink interface (kind, sha256, size,
+commit(), close()) and is stored like any other upload.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from werkzeug.exceptions import RequestEntityTooLarge
+from .upload_stream import SNIFF_BYTES, sniff_file_type
+
+_SESSION_ID = re.compile(r'[0-9a-f]{32}')
+
+_WRITE_CHUNK = 64 * 1024
+
+# session id -> (offset, sha256 object) while chunks arrive in order, so
+# finalizing need not read the file again (lost on restart: it is re-read)
+_hashes = {}
+# session id -> Lock held while a chunk is written or the session finalized
+_locks = {}
+_registry_lock = threading.Lock()
+
+# How often create()/load() look for sessions that ended without close()
+_SWEEP_SECONDS = 60
+_last_sweep = 0.0
+
+
+def _session_lock(session_id):
+    with _registry_lock:
+        return _locks.setdefault(session_id, threading.Lock())
+
+
+def _forget_ended_sessions(folder):
+    """Drop the in-memory state of sessions whose sidecar is gone
+
+    Abandoned sessions never reach close(): cleanup_old_files.py, a separate
+    process, deletes their files, and their entries are dropped here.
+    """
+    global _last_sweep
+    with _registry_lock:
+        now = time.monotonic()
+        if now - _last_sweep < _SWEEP_SECONDS:
+            return
+        _last_sweep = now
+        session_ids = set(_hashes) | set(_locks)
+    for session_id in session_ids:
+        if not os.path.exists(os.path.join(folder, f'.{session_id}.json')):
+            _hashes.pop(session_id, None)
+            with _registry_lock:
+                _locks.pop(session_id, None)
+
+
+class UploadSession:
+    """One resumable upload, persisted in the upload folder"""
+
+    def __init__(self, folder, session_id, filename, size):
+        self.id = session_id
+        self.filename = filename
+        self.size = size
+        self.path = os.path.join(folder, f'.{session_id}.upload')
+        self.committed = False
+        self._meta_path = os.path.join(folder, f'.{session_id}.json')
+        self._lock = _session_lock(session_id)
+
+    @classmethod
+    def create(cls, folder, filename, size):
+        """Start a session for a file of `size` bytes"""
+        _forget_ended_sessions(folder)
+        # Files first: a session with a sidecar is never swept
+        session_id = uuid.uuid4().hex
+        open(os.path.join(folder, f'.{session_id}.upload'), 'wb').close()
+        with open(os.path.join(folder, f'.{session_id}.json'), 'w') as f:
+            json.dump({'filename': filename, 'size': size, 'created_ts': time.time()}, f)
+        session = cls(folder, session_id, filename, size)
+        _hashes[session.id] = (0, hashlib.sha256())
+        return session
+
+    @classmethod
+    def load(cls, folder, session_id):
+        """An existing session, or None if the id is unknown (or finished)"""
+        if not _SESSION_ID.fullmatch(session_id):
+            return None
+        _forget_ended_sessions(folder)
+        try:
+            with open(os.path.join(folder, f'.{session_id}.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(folder, session_id, meta['filename'], meta['size'])
+
+    @property
+    def offset(self):
+        """Bytes received so far"""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+    def acquire(self):
+        """Take the session for finalizing; False while a chunk is being written"""
+        return self._lock.acquire(blocking=False)
+
+    def release(self):
+        self._lock.release()
+
+    def append(self, offset, stream):
+        """Write a chunk read from stream at offset; returns the new offset
+
+        Returns None without reading anything when offset is not where the
+        received data ends or another request is writing to the session (the
+        client then asks for the offset and resumes from there).
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if offset != self.offset:
+                return None
+            received, digest = _hashes.get(self.id, (None, None))
+            if received != offset:
+                digest = None
+            try:
+                with open(self.path, 'ab') as f:
+                    for data in iter(lambda: stream.read(_WRITE_CHUNK), b''):
+                        if offset + len(data) > self.size:
+                            raise RequestEntityTooLarge(f'Upload is larger than the {self.size} bytes announced')
+                        f.write(data)
+                        offset += len(data)
+                        if digest is not None:
+                            digest.update(data)
+            finally:
+                # Also after a dropped connection: what arrived is kept
+                if digest is not None:
+                    _hashes[self.id] = (offset, digest)
+            return offset
+        finally:
+            self._lock.release()
+
+    # UploadSink interface, for storing the finished file
+
+    @property
+    def kind(self):
+        with open(self.path, 'rb') as f:
+            return sniff_file_type(f.read(SNIFF_BYTES))
+
+    @property
+    def sha256(self):
+        received, digest = _hashes.get(self.id, (None, None))
+        if received == self.size:
+            return digest.hexdigest()
+        digest = hashlib.sha256()
+        with open(self.path, 'rb') as f:
+            for data in iter(lambda: f.read(_WRITE_CHUNK), b''):
+                digest.update(data)
+        _hashes[self.id] = (self.size, digest)
+        return digest.hexdigest()
+
+    def commit(self, destination):
+        """Move the assembled file to destination (a rename, no copy)"""
+        os.replace(self.path, destination)
+        self.committed = True
+
+    def close(self):
+        """End the session, deleting the received data unless it was committed"""
+        paths = [self._meta_path] if self.committed else [self._meta_path, self.path]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        _hashes.pop(self.id, None)
+        with _registry_lock:
+            _locks.pop(self.id, None)
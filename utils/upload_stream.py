@@ -0,0 +1,161 @@
+"""
+Streaming ingestion of uploaded files
+
+Werkzeug normally spools each uploaded file to an anonymous temp file, which
+upload() then copied into uploads/. With UploadRequest as the app's request
+class, files posted to the upload endpoint are written once, chunk by chunk,
+into a hidden file in Config.UPLOAD_FOLDER while the multipart body is being
+parsed; on the way through the SHA-256 is computed, the first bytes are kept
+to tell the real file type and the size limit is enforced. The file is then
+either renamed into place or, when the upload store already holds the same
+content, dropped without being written again.
+"""
+import hashlib
+import os
+import uuid
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import Config
+
+# Bytes kept from the start of each file for type detection
+SNIFF_BYTES = 4096
+
+_COPY_CHUNK = 64 * 1024
+
+
+def sniff_file_type(head):
+    """Real type of a file from its first bytes: 'pdf', 'jpeg', 'png', ... or None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    # PDF readers accept up to 1 KB of junk before the header
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if text.startswith((b'<?xml', b'<svg', b'<!--', b'<!doctype svg')) and b'<svg' in text:
+        return 'svg'
+    return None
+
+
+class UploadSink:
+    """Writable, readable file Werkzeug streams one uploaded file into
+
+    Data lands in a hidden '.<uuid>.part' file next to its final location.
+    commit() renames it into place; closing without committing deletes it.
+    """
+
+    def __init__(self, folder, limit=None):
+        self.limit = limit
+        self.size = 0
+        self.path = os.path.join(folder, f'.{uuid.uuid4().hex}.part')
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limit and self.size > self.limit:
+            self.close()
+            raise RequestEntityTooLarge(f'File is larger than {self.limit // (1024 * 1024)} MB')
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    # Reading side, for FileStorage.save() and anything else using the stream
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def __iter__(self):
+        return iter(self._file)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    @property
+    def kind(self):
+        return sniff_file_type(self._head)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def commit(self, destination):
+        """Move the finished file to destination (a rename, no copy)"""
+        self._file.close()
+        os.replace(self.path, destination)
+        self.committed = True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class UploadRequest(Request):
+    """Request class streaming uploads of `streamed_endpoints` into UploadSinks"""
+
+    streamed_endpoints = frozenset({'user.upload'})
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in self.streamed_endpoints:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        sink = UploadSink(Config.UPLOAD_FOLDER, Config.MAX_UPLOAD_BYTES)
+        self.__dict__.setdefault('_upload_sinks', []).append(sink)
+        return sink
+
+    def close(self):
+        super().close()
+        # Files of a failed or partly consumed upload leave no .part behind
+        for sink in self.__dict__.get('_upload_sinks', ()):
+            sink.close()
+
+
+def spool_upload(file, folder):
+    """The UploadSink holding an uploaded FileStorage's bytes, not yet committed
+
+    Streamed uploads already are one. Anything else (another request class,
+    a test) is copied once into a sink in folder, with the same hashing,
+    sniffing and size limit.
+    """
+    stream = file.stream
+    if isinstance(stream, UploadSink):
+        return stream
+    stream.seek(0)
+    sink = UploadSink(folder, Config.MAX_UPLOAD_BYTES)
+    try:
+        for chunk in iter(lambda: stream.read(_COPY_CHUNK), b''):
+            sink.write(chunk)
+    except BaseException:
+        sink.close()
+        raise
+    return sink
+
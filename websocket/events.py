@@ -2,7 +2,9 @@
 WebSocket event handlers and broadcast functions
 """
 from flask import request
+from flask_socketio import join_room
 from models.database import get_job
+from services.upload_analysis import analysis_update
 from utils.notification_utils import push_subscriptions
 
 
@@ -32,6 +34,19 @@ def register_socketio_events(socketio):
             'connected': len(push_subscriptions) > 0,
             'count': len(push_subscriptions)
         }, room=request.sid)
+    
+    @socketio.on('watch_uploads')
+    def handle_watch_uploads(data):
+        """Checkout page: follow the analysis of its uploads (finished ones are sent now)"""
+        job_ids = (data or {}).get('job_ids') or []
+        for job_id in job_ids[:50]:
+            if not isinstance(job_id, str):
+                continue
+            # Joined first, so a result arriving meanwhile is not missed
+            join_room(f'upload:{job_id}')
+            update = analysis_update(job_id)
+            if update['status'] != 'analyzing':
+                socketio.emit('upload_analyzed', update, room=request.sid)
 
 
 def broadcast_subscription_status(socketio):